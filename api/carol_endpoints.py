@@ -42,6 +42,8 @@ async def enviar_mensagem_imoveis(
             "resultado": resultado
         }
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -194,6 +196,44 @@ async def teste_carol_completo() -> Dict[str, Any]:
             detail=f"Erro no teste: {str(e)}"
         )
 
+@router.get("/llm-cache/metrics")
+def llm_cache_metrics() -> Dict[str, Any]:
+    """Hits, misses, tokens e latência economizados pelo cache de respostas do LLM"""
+    from services.ai_agents.llm_cache import obter_llm_cache
+    
+    cache = obter_llm_cache()
+    if cache is None:
+        return {"status": "desativado"}
+    
+    return {
+        "status": "ativo",
+        "metricas": cache.metricas()
+    }
+
+class PoliticaRoteamentoRequest(BaseModel):
+    modo: str = "template_primeiro"
+    limiar_template: float = 0.7
+
+@router.get("/roteamento/{cliente_id}")
+def roteamento_estatisticas(cliente_id: str) -> Dict[str, Any]:
+    """Política e contadores de mensagens por template x LLM do cliente"""
+    from services.ai_agents.message_router import obter_roteador
+    
+    return obter_roteador().estatisticas(cliente_id)
+
+@router.put("/roteamento/{cliente_id}")
+def definir_roteamento(cliente_id: str, dados: PoliticaRoteamentoRequest) -> Dict[str, Any]:
+    """Definir a política de roteamento template x LLM do cliente"""
+    from dataclasses import asdict
+    from services.ai_agents.message_router import obter_roteador
+    
+    try:
+        politica = obter_roteador().definir_politica(cliente_id, dados.modo, dados.limiar_template)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"cliente_id": cliente_id, "politica": asdict(politica)}
+
 @router.get("/status")
 async def status_carol() -> Dict[str, Any]:
     """
@@ -9,16 +9,20 @@ from services.matching.geo_matching import (
     buscar_leads_para_imovel,
     GeoMatchingEngine
 )
+from services.matching.top_matches import obter_top_matches, estatisticas_top_matches
 
 router = APIRouter(prefix="/matching", tags=["Geo Matching"])
 
 @router.post("/executar/{cliente_id}")
-async def executar_matching(cliente_id: str) -> Dict[str, Any]:
+def executar_matching(
+    cliente_id: str,
+    completo: bool = Query(False, description="Recalcular todos os leads em vez de só as mudanças")
+) -> Dict[str, Any]:
     """
     Executar matching automático para encontrar imóveis compatíveis com leads ativos
     """
     try:
-        resultado = executar_matching_automatico(cliente_id)
+        resultado = executar_matching_automatico(cliente_id, completo=completo)
         return {
             "status": "success",
             "cliente_id": cliente_id,
@@ -31,7 +35,7 @@ async def executar_matching(cliente_id: str) -> Dict[str, Any]:
         )
 
 @router.get("/buscar-imoveis-proximos/{cliente_id}")
-async def buscar_imoveis_proximos(
+def buscar_imoveis_proximos(
     cliente_id: str,
     latitude: float = Query(..., description="Latitude do centro da busca"),
     longitude: float = Query(..., description="Longitude do centro da busca"),
@@ -87,7 +91,7 @@ async def buscar_imoveis_proximos(
         )
 
 @router.get("/leads-para-imovel/{cliente_id}/{imovel_id}")
-async def buscar_leads_compativel_imovel(
+def buscar_leads_compativel_imovel(
     cliente_id: str,
     imovel_id: str
 ) -> Dict[str, Any]:
@@ -110,8 +114,33 @@ async def buscar_leads_compativel_imovel(
             detail=f"Erro ao buscar leads: {str(e)}"
         )
 
+@router.get("/top-matches/{lead_id}")
+def top_matches_lead(
+    lead_id: str,
+    tipo_operacao: Optional[str] = Query(None, description="Tipo de operação: venda ou locacao"),
+    limite: Optional[int] = Query(None, ge=1, description="Quantidade máxima de imóveis")
+) -> Dict[str, Any]:
+    """
+    Melhores imóveis de um lead, como gravados na última execução do matching
+    """
+    try:
+        matches = obter_top_matches(lead_id, tipo_operacao=tipo_operacao, limite=limite)
+        
+        return {
+            "status": "success",
+            "lead_id": lead_id,
+            "total_matches": len(matches),
+            "matches": matches
+        }
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro ao buscar top matches: {str(e)}"
+        )
+
 @router.get("/estatisticas/{cliente_id}")
-async def estatisticas_matching(cliente_id: str) -> Dict[str, Any]:
+def estatisticas_matching(cliente_id: str) -> Dict[str, Any]:
     """
     Estatísticas do sistema de matching
     """
@@ -171,6 +200,7 @@ async def estatisticas_matching(cliente_id: str) -> Dict[str, Any]:
                 "cliente_id": cliente_id,
                 "imoveis": estatisticas_imoveis,
                 "leads": estatisticas_leads,
+                "top_matches": estatisticas_top_matches(cliente_id),
                 "sistema_matching": {
                     "ativo": True,
                     "raio_padrao_km": 3,
@@ -185,7 +215,7 @@ async def estatisticas_matching(cliente_id: str) -> Dict[str, Any]:
         )
 
 @router.post("/teste-matching")
-async def teste_matching() -> Dict[str, Any]:
+def teste_matching() -> Dict[str, Any]:
     """
     Teste do sistema de matching com dados de exemplo
     """
@@ -48,15 +48,18 @@ async def get_session_info(session_id: str) -> Dict[str, Any]:
 async def get_conversation_history(phone: str, limit: int = 10) -> Dict[str, Any]:
     """Obter histórico de conversas de um telefone"""
     
-    from core.database import get_db_session
+    from sqlalchemy import select
+    from core.database import get_async_db_session
     from services.session_management.session_manager import ConversationSession
     
-    with get_db_session() as db:
-        sessions = db.query(ConversationSession).filter_by(
-            phone=phone
-        ).order_by(ConversationSession.updated_at.desc()).limit(limit).all()
+    async with get_async_db_session() as db:
+        result = await db.execute(
+            select(ConversationSession).filter_by(
+                phone=phone
+            ).order_by(ConversationSession.updated_at.desc()).limit(limit)
+        )
         
-        history = [session.to_dict() for session in sessions]
+        history = [session.to_dict() for session in result.scalars().all()]
     
     return {
         "success": True,
@@ -148,7 +151,7 @@ async def simulate_conversation(conversation_data: Dict[str, Any]) -> Dict[str,
     }
 
 @router.get("/analytics/conversations")
-async def get_conversation_analytics() -> Dict[str, Any]:
+def get_conversation_analytics() -> Dict[str, Any]:
     """Analytics das conversas"""
     
     from core.database import get_db_session
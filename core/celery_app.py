@@ -4,6 +4,7 @@ Configuração do Celery para tasks assíncronas
 
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_init
 from core.config import get_settings
 from core.logger import logger
 
@@ -41,16 +42,25 @@ celery_app.conf.update(
     # Configurações de roteamento
     task_routes={
         'services.scheduler.tasks.*': {'queue': 'default'},
+        # Planejador fora da fila das importações (não espera feeds longos)
+        'services.scheduler.import_tasks.planejar_importacoes': {'queue': 'default'},
         'services.scheduler.import_tasks.*': {'queue': 'imports'},
     },
     
     # Beat schedule (tarefas periódicas)
     beat_schedule={
-        # Importação diária às 8h da manhã
-        'importacao-diaria-8h': {
-            'task': 'services.scheduler.import_tasks.import_all_clients_daily',
-            'schedule': crontab(hour=8, minute=0),  # 8:00 AM todos os dias
-            'options': {'queue': 'imports'}
+        # Planejamento das importações (cada cliente no seu horario_importacao)
+        'planejamento-importacoes': {
+            'task': 'services.scheduler.import_tasks.planejar_importacoes',
+            'schedule': crontab(minute='*/15'),  # Mesma janela de JANELA_PLANEJAMENTO_MIN
+            'options': {'queue': 'default'}
+        },
+        
+        # Matching incremental noturno (só pares afetados por mudanças)
+        'matching-incremental-noturno': {
+            'task': 'services.scheduler.tasks.matching_incremental_clientes',
+            'schedule': crontab(hour=3, minute=0),  # Todo dia 3:00 AM
+            'options': {'queue': 'default'}
         },
         
         # Limpeza de logs antigos (semanal)
@@ -60,6 +70,20 @@ celery_app.conf.update(
             'options': {'queue': 'default'}
         },
         
+        # Gravação das sessões de conversa do cache Redis (write-behind)
+        'flush-sessoes-conversa': {
+            'task': 'services.scheduler.tasks.flush_session_cache',
+            'schedule': 30.0,  # A cada 30 segundos
+            'options': {'queue': 'default'}
+        },
+        
+        # Envio das mensagens de WhatsApp enfileiradas
+        'envio-fila-whatsapp': {
+            'task': 'services.scheduler.tasks.enviar_fila_whatsapp',
+            'schedule': 10.0,  # A cada 10 segundos
+            'options': {'queue': 'default'}
+        },
+        
         # Health check dos clientes (a cada 6 horas)
         'health-check-clientes': {
             'task': 'services.scheduler.tasks.health_check_clients',
@@ -69,6 +93,27 @@ celery_app.conf.update(
     }
 )
 
+@worker_process_init.connect
+def reiniciar_pool_banco(**kwargs):
+    """Cada processo filho do prefork abre as próprias conexões (não herda as do pai)"""
+    from core.database import engine
+    engine.dispose(close=False)
+
+@worker_process_init.connect
+def aquecer_crews_worker(**kwargs):
+    """
+    Imports do crewai/langchain e crew padrão prontos antes da primeira tarefa
+    Só com CAROL_AQUECER_CREWS (workers da Carol) e em thread: a construção
+    leva segundos e o processo filho precisa responder ao pai logo
+    """
+    from core.config import get_settings
+    if not get_settings().carol_aquecer_crews:
+        return
+    
+    import threading
+    from services.ai_agents.crews.crew_registry import aquecer_crews
+    threading.Thread(target=aquecer_crews, name='aquecer-crews', daemon=True).start()
+
 # Configurar logging para Celery
 @celery_app.task(bind=True)
 def debug_task(self):
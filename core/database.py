@@ -5,23 +5,48 @@ Configuração do banco de dados
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.ext.declarative import declarative_base
-from contextlib import contextmanager
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from contextlib import contextmanager, asynccontextmanager
 from core.config import get_settings
+from core.db_pool import configuracao_pool, instrumentar_engine, obter_metricas_pool
 from core.logger import logger
 
 settings = get_settings()
 
-# Engine do SQLAlchemy
+# Engine do SQLAlchemy (pool conforme PROCESS_ROLE, ver core/db_pool.py)
 engine = create_engine(
     settings.database_url,
     echo=False,  # True para debug SQL
-    pool_pre_ping=True,
-    pool_recycle=300
+    **configuracao_pool(settings)
 )
+instrumentar_engine(engine, 'sync')
 
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def get_async_database_url(database_url: str) -> str:
+    """URL do banco com driver assíncrono (asyncpg)"""
+    for prefixo in ('postgresql+psycopg2://', 'postgresql://', 'postgres://'):
+        if database_url.startswith(prefixo):
+            return 'postgresql+asyncpg://' + database_url[len(prefixo):]
+    return database_url
+
+
+# Engine assíncrona (handlers async do FastAPI / webhook)
+try:
+    async_engine = create_async_engine(
+        get_async_database_url(settings.database_url),
+        echo=False,
+        **configuracao_pool(settings, assincrona=True)
+    )
+    instrumentar_engine(async_engine, 'async')
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+except ImportError as e:
+    logger.warning(f"Driver assíncrono do banco não disponível: {e}")
+    async_engine = None
+    AsyncSessionLocal = None
+
 # Base para modelos
 Base = declarative_base()
 
@@ -50,12 +75,49 @@ def get_db_session():
         db.close()
 
 
+@asynccontextmanager
+async def get_async_db_session():
+    """Context manager assíncrono para sessões do banco"""
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Engine assíncrona não configurada (instale asyncpg)")
+    
+    db = AsyncSessionLocal()
+    try:
+        yield db
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Erro na sessão assíncrona do banco: {e}")
+        raise
+    finally:
+        await db.close()
+
+
+async def get_async_db() -> AsyncSession:
+    """Dependency assíncrona para FastAPI"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_pool_stats() -> dict:
+    """Espera no checkout e conexões em uso por engine"""
+    return {
+        'process_role': settings.process_role,
+        'pgbouncer_mode': settings.db_pgbouncer_mode,
+        'engines': obter_metricas_pool({'sync': engine, 'async': async_engine})
+    }
+
+
 def create_tables():
     """Criar todas as tabelas"""
     from models.imovel import Base as ImovelBase
+    from services.ai_matching.esquema import garantir_colunas_matching
+    from services.matching.persistencia import garantir_indice_unico
     
     try:
         ImovelBase.metadata.create_all(bind=engine)
+        garantir_colunas_matching(engine)
+        garantir_indice_unico(engine)
         logger.info("Tabelas criadas com sucesso")
     except Exception as e:
         logger.error(f"Erro ao criar tabelas: {e}")
@@ -0,0 +1,188 @@
+"""
+Pool de conexões do banco por papel do processo (api / worker / beat)
+
+Cada processo lê PROCESS_ROLE e monta os argumentos das engines
+(tamanho, overflow, timeout, recycle, pre-ping, cache de statements)
+a partir dos campos db_* do Settings. Com db_pgbouncer_mode as engines
+ficam compatíveis com pooling em modo transação (pgbouncer / Supavisor):
+sem prepared statements nomeados e sem cache de statements no asyncpg.
+
+As classes de pool daqui medem a espera no checkout e as conexões em uso;
+obter_metricas_pool() expõe esses números.
+"""
+
+import threading
+import time
+import uuid
+from typing import Dict, Any
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool, NullPool
+
+from core.logger import logger
+
+PAPEIS = ('api', 'worker', 'beat')
+
+
+class MetricasPool:
+    """Contadores de uma engine (thread-safe)"""
+
+    def __init__(self, nome: str):
+        self.nome = nome
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.conexoes_abertas = 0
+        self.em_uso = 0
+        self.pico_em_uso = 0
+        self.espera_total_s = 0.0
+        self.espera_max_s = 0.0
+
+    def registrar_espera(self, espera_s: float, timeout: bool = False):
+        with self._lock:
+            if timeout:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.espera_total_s += espera_s
+            if espera_s > self.espera_max_s:
+                self.espera_max_s = espera_s
+
+    def conexao_aberta(self):
+        with self._lock:
+            self.conexoes_abertas += 1
+
+    def checkout(self):
+        with self._lock:
+            self.em_uso += 1
+            if self.em_uso > self.pico_em_uso:
+                self.pico_em_uso = self.em_uso
+
+    def checkin(self):
+        with self._lock:
+            self.em_uso = max(0, self.em_uso - 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'conexoes_abertas': self.conexoes_abertas,
+                'em_uso': self.em_uso,
+                'pico_em_uso': self.pico_em_uso,
+                'espera_media_ms': round(self.espera_total_s / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'espera_max_ms': round(self.espera_max_s * 1000, 3)
+            }
+
+
+_metricas: Dict[str, MetricasPool] = {}
+
+
+class _EsperaCheckoutMixin:
+    """
+    Mede o tempo de _do_get (espera por conexão livre ou abertura de uma nova)
+    engine.dispose() troca o pool por pool.recreate(): as métricas passam
+    para o pool novo (os listeners de eventos o SQLAlchemy já copia)
+    """
+
+    metricas: MetricasPool = None
+
+    def recreate(self):
+        novo = super().recreate()
+        novo.metricas = self.metricas
+        return novo
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conexao = super()._do_get()
+        except PoolTimeoutError:
+            if self.metricas:
+                self.metricas.registrar_espera(time.perf_counter() - inicio, timeout=True)
+            raise
+        if self.metricas:
+            self.metricas.registrar_espera(time.perf_counter() - inicio)
+        return conexao
+
+
+class QueuePoolMedido(_EsperaCheckoutMixin, QueuePool):
+    pass
+
+
+class AsyncQueuePoolMedido(_EsperaCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+class NullPoolMedido(_EsperaCheckoutMixin, NullPool):
+    pass
+
+
+def papel_processo(settings) -> str:
+    """Papel do processo atual (PROCESS_ROLE); desconhecido cai em api"""
+    papel = (settings.process_role or 'api').lower()
+    if papel not in PAPEIS:
+        logger.warning(f"PROCESS_ROLE inválido '{papel}', usando 'api'")
+        return 'api'
+    return papel
+
+
+def configuracao_pool(settings, assincrona: bool = False) -> Dict[str, Any]:
+    """Argumentos de create_engine / create_async_engine para o papel do processo"""
+    papel = papel_processo(settings)
+    pool_size = getattr(settings, f'db_pool_size_{papel}')
+    pre_ping = getattr(settings, f'db_pool_pre_ping_{papel}')
+
+    kwargs: Dict[str, Any] = {'pool_pre_ping': pre_ping}
+
+    if pool_size <= 0:
+        # Sem pool local: cada checkout abre conexão (útil atrás do pgbouncer em scripts/beat)
+        kwargs['poolclass'] = NullPoolMedido
+    else:
+        kwargs.update({
+            'poolclass': AsyncQueuePoolMedido if assincrona else QueuePoolMedido,
+            'pool_size': pool_size,
+            'max_overflow': getattr(settings, f'db_max_overflow_{papel}'),
+            'pool_timeout': settings.db_pool_timeout,
+            'pool_recycle': settings.db_pool_recycle,
+            'pool_use_lifo': True
+        })
+
+    if assincrona:
+        cache = 0 if settings.db_pgbouncer_mode else settings.db_statement_cache_size
+        connect_args = {
+            # Cache de prepared statements do asyncpg e do dialeto do SQLAlchemy
+            'statement_cache_size': cache,
+            'prepared_statement_cache_size': cache
+        }
+        if settings.db_pgbouncer_mode:
+            # Nomes únicos: em modo transação a próxima query pode cair em outro backend
+            connect_args['prepared_statement_name_func'] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+        kwargs['connect_args'] = connect_args
+
+    return kwargs
+
+
+def instrumentar_engine(engine, nome: str) -> MetricasPool:
+    """Registrar métricas de pool para a engine (sync ou async)"""
+    metricas = MetricasPool(nome)
+    pool = engine.pool
+    pool.metricas = metricas
+    _metricas[nome] = metricas
+
+    event.listen(pool, 'connect', lambda *_: metricas.conexao_aberta())
+    event.listen(pool, 'checkout', lambda *_: metricas.checkout())
+    event.listen(pool, 'checkin', lambda *_: metricas.checkin())
+    return metricas
+
+
+def obter_metricas_pool(engines: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Métricas por engine + estado atual do pool (status() do SQLAlchemy)"""
+    resultado = {}
+    for nome, metricas in _metricas.items():
+        dados = metricas.to_dict()
+        engine = (engines or {}).get(nome)
+        if engine is not None:
+            dados['pool'] = engine.pool.status()
+        resultado[nome] = dados
+    return resultado
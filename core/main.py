@@ -24,6 +24,28 @@ async def startup_event():
     logger.info(f"Ambiente: {settings.environment}")
     logger.info(f"Database: {settings.database_url}")
     logger.info(f"Redis: {settings.redis_url}")
+    
+    # Colunas do matching (amenidades, embeddings) em bancos criados antes delas
+    try:
+        from core.database import engine
+        from services.ai_matching.esquema import garantir_colunas_matching
+        garantir_colunas_matching(engine)
+    except Exception as e:
+        logger.warning(f"Colunas do matching não verificadas: {e}")
+    
+    # Índice único dos matchings (alvo do upsert); sem ele nenhum match é gravado
+    try:
+        from core.database import engine
+        from services.matching.persistencia import garantir_indice_unico
+        garantir_indice_unico(engine)
+    except Exception as e:
+        logger.error(f"Índice único de matchings não criado, matches não serão gravados: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Cliente Redis assíncrono compartilhado (sessões e agrupamento do webhook)
+    from core.redis_config import fechar_redis_async
+    await fechar_redis_async()
 
 @app.get("/")
 def read_root():
@@ -127,6 +149,17 @@ try:
         except Exception as e:
             return {"database": "ERRO", "erro": str(e)}
     
+    @app.get("/database/pool-stats")
+    def database_pool_stats():
+        """Espera no checkout, conexões em uso e configuração do pool deste processo"""
+        from datetime import datetime
+        from core.database import get_pool_stats
+        
+        return {
+            **get_pool_stats(),
+            "timestamp": datetime.now().isoformat()
+        }
+    
     # Endpoints de imóveis (só se banco estiver disponível)
     @app.get("/imoveis/{cliente_id}")
     def list_imoveis(cliente_id: str, limit: int = 10):
@@ -293,6 +326,20 @@ try:
         except Exception as e:
             return {"erro": str(e)}
     
+    @app.get("/scheduler/import-metrics")
+    def get_import_metrics(data: str = None):
+        """Espera em fila, tempo de execução por cliente e makespan das importações do dia"""
+        try:
+            from services.scheduler.import_planner import obter_metricas
+            
+            return {
+                **obter_metricas(data),
+                "timestamp": datetime.now().isoformat()
+            }
+            
+        except Exception as e:
+            return {"erro": str(e)}
+    
     @app.get("/scheduler/stats")
     def get_scheduler_stats():
         """Estatísticas do scheduler"""
@@ -319,6 +366,8 @@ except ImportError as e:
 try:
     from services.ai_matching.matching_engine import MatchingEngine
     from models.lead import Lead, Matching
+    from services.ai_matching.amenidades import amenidades_lead
+    from services.ai_matching.embeddings import embedding_lead
     from datetime import datetime
     import uuid
     
@@ -351,10 +400,16 @@ try:
                     bairros_interesse=lead_data.get('bairros_interesse', []),
                     caracteristicas_desejadas=lead_data.get('caracteristicas_desejadas', []),
                     observacoes=lead_data.get('observacoes'),
+                    amenidades_desejadas=amenidades_lead(
+                        lead_data.get('observacoes'),
+                        lead_data.get('caracteristicas_desejadas')
+                    ),
                     origem=lead_data.get('origem', 'api'),
                     prioridade=lead_data.get('prioridade', 1)
                 )
                 
+                embedding_lead(new_lead)
+                
                 db.add(new_lead)
                 db.commit()
                 
@@ -638,8 +693,12 @@ except ImportError as e:
 
 # Endpoint para testar Agents CrewAI
 @app.post("/test/carol-agents")
-def test_carol_agents():
-    """Testar sistema de agents Carol CrewAI"""
+def test_carol_agents(executar_crew: bool = False):
+    """
+    Testar sistema de agents Carol CrewAI
+    Respostas estáticas por padrão; executar_crew=true roda a crew de verdade
+    (quatro completions pagas na OpenAI)
+    """
     try:
         # Dados de teste
         lead_data = {
@@ -664,10 +723,29 @@ def test_carol_agents():
             }
         ]
         
-        # Testar agents (sem OpenAI por enquanto)
-        from services.ai_agents.crews.carol_crew_complete import CarolCrewComplete
+        from core.ai_config import ai_config
+        
+        if executar_crew and ai_config.is_ai_enabled():
+            # Crew compartilhada do processo (construída na primeira chamada)
+            from services.ai_agents.crews.crew_registry import obter_crew
+            crew = obter_crew()
+            
+            results = {
+                'initial_contact': crew.execute_initial_contact(lead_data, imobiliaria_nome, region),
+                'properties_presentation': crew.execute_properties_presentation(matched_properties, 'teste'),
+                'scheduling_request': crew.execute_scheduling_request("Gostei do apartamento de 3 quartos", 'teste'),
+                'closure_message': crew.execute_closure("Não tenho mais interesse", cliente_id='teste')
+            }
+            
+            logger.info("Teste dos agents Carol executado com sucesso")
+            return {
+                'status': 'sucesso',
+                'message': 'Agents Carol testados com sucesso',
+                'results': results,
+                'crewai_available': True
+            }
         
-        # Usar fallbacks para teste
+        # Padrão (ou sem OpenAI): fallbacks para teste
         results = {
             'initial_contact': f"Boa tarde {lead_data['nome']}, sou a Corretora Carol da {imobiliaria_nome}. Vi que você tem interesse em imóveis na região de {region}. Acabamos de cadastrar alguns produtos que se enquadram no seu perfil. Posso te mandar algumas opções?",
             'properties_presentation': f"1. {matched_properties[0]['titulo']} - R\$ {matched_properties[0]['preco']:,.2f}\n{matched_properties[0]['endereco']} - {matched_properties[0]['quartos']} quartos, {matched_properties[0]['area_total']} m²\nVer fotos (2 fotos): http://localhost:8000/galeria/teste/{matched_properties[0]['id']}\n\nAlgum desses imóveis te interessou?",
@@ -675,12 +753,14 @@ def test_carol_agents():
             'closure_message': "Compreendo perfeitamente. Agradeço seu tempo e fico à disposição caso precise de ajuda no futuro."
         }
         
-        logger.info("Teste dos agents Carol executado com sucesso")
+        logger.info("Teste dos agents Carol executado com fallbacks")
         return {
             'status': 'sucesso',
-            'message': 'Agents Carol testados com sucesso',
+            'message': 'Agents Carol testados com fallbacks' + (
+                ' (configure a API key da OpenAI)' if executar_crew else ' (executar_crew=true roda a crew)'
+            ),
             'results': results,
-            'crewai_available': True
+            'crewai_available': False
         }
         
     except Exception as e:
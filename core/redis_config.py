@@ -18,5 +18,36 @@ def get_redis_client():
         print(f"Erro ao conectar Redis: {e}")
         return None
 
+# Apagar um lock (SET NX com token) só se ainda for de quem o pegou
+LIBERAR_LOCK_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
 # Cliente Redis global
 redis_client = get_redis_client()
+
+# Cliente redis.asyncio compartilhado do processo (sessões, agrupamento do webhook)
+_redis_async = None
+
+
+def obter_redis_async():
+    """Cliente assíncrono do processo, criado na primeira chamada"""
+    global _redis_async
+    if _redis_async is None:
+        import redis.asyncio as redis_async
+        _redis_async = redis_async.from_url(settings.redis_url, decode_responses=True)
+    return _redis_async
+
+
+async def fechar_redis_async():
+    """
+    Fechar o cliente assíncrono (shutdown da API e fim de cada asyncio.run
+    das tasks: as conexões ficam presas ao event loop que as abriu)
+    """
+    global _redis_async
+    cliente, _redis_async = _redis_async, None
+    if cliente is not None:
+        await cliente.aclose()
@@ -10,6 +10,8 @@ import re
 import uuid
 import uvicorn
 
+from services.message_processing.intent_classifier import classificar_intencao
+
 app = FastAPI(title="Improved N8N Server")
 
 app.add_middleware(
@@ -24,23 +26,8 @@ app.add_middleware(
 sessions = {}
 
 def classify_intent(message: str) -> Dict[str, Any]:
-    """Classificar intenção básica"""
-    message_lower = message.lower()
-    
-    if any(word in message_lower for word in ['oi', 'olá', 'ola', 'bom dia', 'boa tarde']):
-        return {"intent": "saudacao", "confidence": 0.9}
-    elif any(word in message_lower for word in ['apartamento', 'casa', 'imovel', 'comprar', 'alugar']):
-        return {"intent": "interesse_imovel", "confidence": 0.8}
-    elif any(word in message_lower for word in ['preço', 'valor', 'quanto', 'custa']):
-        return {"intent": "preco", "confidence": 0.8}
-    elif any(word in message_lower for word in ['visita', 'agendar', 'conhecer', 'ver']):
-        return {"intent": "agendamento", "confidence": 0.8}
-    elif any(word in message_lower for word in ['garantia', 'fiador', 'seguro']):
-        return {"intent": "garantia", "confidence": 0.8}
-    elif any(word in message_lower for word in ['tchau', 'obrigado', 'valeu']):
-        return {"intent": "despedida", "confidence": 0.9}
-    else:
-        return {"intent": "geral", "confidence": 0.5}
+    """Classificar intenção (mesmo classificador do MessageProcessor)"""
+    return classificar_intencao(message)
 
 def generate_response(intent: str, message: str, contact_name: str) -> Dict[str, Any]:
     """Gerar resposta baseada na intenção"""
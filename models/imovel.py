@@ -2,7 +2,7 @@
 Modelo de dados para Imóveis
 """
 
-from sqlalchemy import Column, String, Float, Integer, DateTime, Text, Boolean, JSON
+from sqlalchemy import Column, String, Float, Integer, BigInteger, DateTime, Text, Boolean, JSON, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -52,6 +52,8 @@ class Imovel(Base):
     # Descrição e mídia
     descricao = Column(Text)
     observacoes = Column(Text)
+    amenidades = Column(BigInteger)  # Bitset extraído de título/descrição na importação
+    embedding = Column(LargeBinary)  # Vetor float16 de título/descrição (services.ai_matching.embeddings)
     fotos = Column(JSON)  # Lista de URLs das fotos
     videos = Column(JSON)  # Lista de URLs dos vídeos
     tour_virtual = Column(String(500))
@@ -113,3 +115,21 @@ class ImportacaoLog(Base):
     
     def __repr__(self):
         return f"<ImportacaoLog(cliente_id={self.cliente_id}, status={self.status})>"
+
+
+class EstadoFeedXML(Base):
+    __tablename__ = "estado_feeds_xml"
+    
+    # Validadores do último XML processado de cada cliente
+    cliente_id = Column(String(50), primary_key=True)
+    url_xml = Column(String(500))
+    etag = Column(String(200))
+    last_modified = Column(String(100))
+    hash_conteudo = Column(String(64))  # SHA-256 do corpo do XML
+    hash_mapeamento = Column(String(64))  # Mapeamento de campos usado no parse
+    tamanho_bytes = Column(Integer)
+    data_verificacao = Column(DateTime, default=func.now())
+    data_modificacao = Column(DateTime, default=func.now())
+    
+    def __repr__(self):
+        return f"<EstadoFeedXML(cliente_id={self.cliente_id}, etag={self.etag})>"
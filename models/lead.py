@@ -2,7 +2,7 @@
 Modelo de dados para Leads
 """
 
-from sqlalchemy import Column, String, Float, Integer, DateTime, Text, Boolean, JSON
+from sqlalchemy import Column, String, Float, Integer, BigInteger, DateTime, Text, Boolean, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -41,6 +41,7 @@ class Lead(Base):
     # Características desejadas
     caracteristicas_desejadas = Column(JSON)  # piscina, churrasqueira, etc
     observacoes = Column(Text)
+    amenidades_desejadas = Column(BigInteger)  # Bitset de caracteristicas_desejadas + observacoes
     
     # Status e controle
     status = Column(String(50), default='ativo')  # ativo, atendido, inativo
@@ -115,6 +116,11 @@ class Matching(Base):
     data_criacao = Column(DateTime, default=func.now())
     data_atualizacao = Column(DateTime, default=func.now(), onupdate=func.now())
     
+    __table_args__ = (
+        # Alvo do ON CONFLICT em services.matching.persistencia
+        Index('uq_matchings_lead_imovel', 'lead_id', 'imovel_id', unique=True),
+    )
+    
     def __repr__(self):
         return f"<Matching(lead_id={self.lead_id}, imovel_id={self.imovel_id}, score={self.score_geral})>"
     
@@ -0,0 +1,46 @@
+"""
+Top-K de imóveis por lead (materializado pelo matching geográfico)
+"""
+
+from sqlalchemy import Column, String, Float, Integer, BigInteger, DateTime, JSON, Index
+from sqlalchemy.dialects.postgresql import UUID
+from models.base import Base
+from datetime import datetime
+
+
+class LeadTopMatch(Base):
+    __tablename__ = "lead_top_matches"
+
+    # Chave = lookup da leitura: WHERE lead_id = ? ORDER BY tipo_operacao, posicao
+    lead_id = Column(UUID(as_uuid=True), primary_key=True)
+    tipo_operacao = Column(String(10), primary_key=True)  # 'venda' ou 'locacao'
+    posicao = Column(Integer, primary_key=True)  # 1 = melhor score
+
+    cliente_id = Column(String(255), nullable=False, index=True)
+    imovel_id = Column(UUID(as_uuid=True), nullable=False)
+
+    # MATCH
+    score_compatibilidade = Column(Float, nullable=False)
+    distancia_km = Column(Float)
+    dados_imovel = Column(JSON)  # ImovelDual.to_dict() no momento do cálculo
+
+    # CONTROLE
+    versao = Column(BigInteger, nullable=False)  # Execução do matching que gravou a linha
+    data_atualizacao = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Leads que têm um imóvel alterado no top-K (matching incremental)
+        Index('idx_lead_top_matches_imovel', 'cliente_id', 'imovel_id'),
+    )
+
+    def to_dict(self):
+        return {
+            **(self.dados_imovel or {}),
+            'id': str(self.imovel_id),
+            'tipo_operacao': self.tipo_operacao,
+            'posicao': self.posicao,
+            'score_compatibilidade': self.score_compatibilidade,
+            'distancia_km': self.distancia_km,
+            'versao': self.versao,
+            'data_atualizacao': self.data_atualizacao.isoformat() if self.data_atualizacao else None
+        }
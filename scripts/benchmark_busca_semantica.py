@@ -0,0 +1,108 @@
+"""
+Benchmark da busca semântica (índice IVF int8 x busca exata float32)
+
+Gera n_imoveis descrições sintéticas e n_consultas perfis de lead, calcula os
+embeddings (TF-IDF com hashing) e compara com a varredura exata float32:
+lista única int8 (padrão abaixo de MIN_VETORES_IVF) e IVF com ~sqrt(n)
+listas para alguns valores de n_sondas. Mostra recall@K e latência.
+
+As descrições sintéticas combinam itens ao acaso, sem agrupamentos: é o
+pior caso para o IVF (portfólios reais se concentram por tipo e bairro).
+
+Uso: python scripts/benchmark_busca_semantica.py [n_imoveis] [n_consultas] [k]
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import time
+
+import numpy as np
+
+from services.ai_matching.embeddings import EmbeddingsHashTfidf
+from services.ai_matching.indice_semantico import IndiceIVF, calcular_idf, _normalizar
+
+TIPOS = ['apartamento', 'casa', 'cobertura', 'studio', 'sobrado', 'kitnet', 'loft']
+BAIRROS = ['Moema', 'Pinheiros', 'Vila Mariana', 'Perdizes', 'Tatuapé', 'Santana', 'Butantã', 'Lapa', 'Mooca', 'Ipiranga']
+ITENS = [
+    'piscina aquecida', 'churrasqueira', 'varanda gourmet', 'sacada', 'jardim', 'elevador',
+    'portaria 24 horas', 'academia', 'playground', 'reformado', 'mobiliado', 'vista livre',
+    'sol da manhã', 'área gourmet', 'salão de festas', 'quadra poliesportiva', 'sauna',
+    'ar condicionado', 'armários planejados', 'closet', 'home office', 'quintal', 'aceita pets',
+    'próximo ao metrô', 'perto de escolas', 'rua tranquila', 'andar alto', 'cozinha americana'
+]
+
+
+def gerar_imovel(rng: random.Random) -> str:
+    itens = rng.sample(ITENS, rng.randint(3, 8))
+    return (
+        f"{rng.choice(TIPOS).capitalize()} com {rng.randint(1, 4)} quartos em {rng.choice(BAIRROS)}. "
+        f"Condomínio com {', '.join(itens[:-1])} e {itens[-1]}."
+    )
+
+
+def gerar_lead(rng: random.Random) -> str:
+    itens = rng.sample(ITENS, rng.randint(2, 4))
+    return f"Procuro {rng.choice(TIPOS)} em {rng.choice(BAIRROS)} com {' e '.join(itens)}"
+
+
+def main():
+    n_imoveis = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    n_consultas = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    rng = random.Random(42)
+    modelo = EmbeddingsHashTfidf()
+
+    inicio = time.perf_counter()
+    matriz = modelo.codificar([gerar_imovel(rng) for _ in range(n_imoveis)])
+    consultas = modelo.codificar([gerar_lead(rng) for _ in range(n_consultas)])
+    print(f"Embeddings: {n_imoveis + n_consultas} textos em {time.perf_counter() - inicio:.2f}s ({modelo.nome})")
+
+    # Mesma ponderação do IndiceSemanticoImoveis: float16 no banco, IDF do portfólio
+    matriz = matriz.astype(np.float16).astype(np.float32)
+    idf = calcular_idf(matriz)
+    matriz = _normalizar(matriz * idf).astype(np.float32)
+    consultas = _normalizar(consultas * idf).astype(np.float32)
+    ids = [str(i) for i in range(n_imoveis)]
+
+    indices = []
+    for n_listas in (1, max(1, int(round(np.sqrt(n_imoveis))))):
+        inicio = time.perf_counter()
+        indice = IndiceIVF(modelo.dimensao)
+        indice.construir(ids, matriz, n_listas=n_listas)
+        print(f"Índice com {n_listas} lista(s) em {time.perf_counter() - inicio:.2f}s "
+              f"({matriz.nbytes / 1e6:.1f} MB float32 -> {n_imoveis * (modelo.dimensao + 4) / 1e6:.1f} MB int8)")
+        indices.append(indice)
+
+    # Busca exata: o k-ésimo cosseno é o corte (textos sintéticos empatam muito,
+    # então conta como acerto qualquer imóvel com cosseno exato >= corte)
+    tempos = []
+    cortes = []
+    for consulta in consultas:
+        inicio = time.perf_counter()
+        similaridades = matriz @ consulta
+        melhores = np.argpartition(-similaridades, k - 1)[:k]
+        tempos.append(time.perf_counter() - inicio)
+        cortes.append(similaridades[melhores].min() - 1e-6)
+    print(f"{'exata float32':>14s}  recall@{k} 1.000   p50 {np.percentile(tempos, 50) * 1000:6.2f} ms   p95 {np.percentile(tempos, 95) * 1000:6.2f} ms")
+
+    for nome, indice, n_sondas in [('int8 plano', indices[0], 1)] + [
+        (f'ivf sondas={n_sondas}', indices[1], n_sondas) for n_sondas in (4, 8, 16, 32, 64)
+    ]:
+        tempos = []
+        acertos = 0
+        for consulta, corte in zip(consultas, cortes):
+            inicio = time.perf_counter()
+            encontrados = indice.buscar(consulta, k, n_sondas)
+            tempos.append(time.perf_counter() - inicio)
+            posicoes = [int(chave) for chave, _ in encontrados]
+            acertos += int(np.count_nonzero(matriz[posicoes] @ consulta >= corte))
+        print(f"{nome:>14s}  recall@{k} {acertos / (k * n_consultas):.3f}   "
+              f"p50 {np.percentile(tempos, 50) * 1000:6.2f} ms   p95 {np.percentile(tempos, 95) * 1000:6.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark de inicialização das crews da Carol
+
+Mede, num processo novo:
+- import do módulo carol_crew_complete (caminho de import da API)
+- primeira obter_crew() (imports de crewai/langchain + construção)
+- obter_crew() já aquecida (custo por requisição com o registro)
+- CarolCrewComplete(...) a cada requisição (comportamento anterior)
+
+Não chama a OpenAI; sem OPENAI_API_KEY usa uma chave fictícia.
+Uso: python scripts/benchmark_crew_registry.py [requisicoes]
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+
+os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+
+
+def main():
+    requisicoes = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    from core.logger import logger
+    logger.remove()
+
+    inicio = time.perf_counter()
+    from services.ai_agents.crews.carol_crew_complete import CarolCrewComplete
+    tempo_import = time.perf_counter() - inicio
+
+    pesados_carregados = any(nome in sys.modules for nome in ('crewai', 'langchain_openai'))
+
+    from services.ai_agents.crews.crew_registry import obter_crew
+
+    inicio = time.perf_counter()
+    obter_crew()
+    tempo_frio = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for _ in range(requisicoes):
+        obter_crew()
+    tempo_registro = (time.perf_counter() - inicio) / requisicoes
+
+    inicio = time.perf_counter()
+    for _ in range(requisicoes):
+        CarolCrewComplete(openai_api_key=os.environ['OPENAI_API_KEY'])
+    tempo_por_requisicao = (time.perf_counter() - inicio) / requisicoes
+
+    print(f"Import carol_crew_complete: {tempo_import * 1000:.1f} ms "
+          f"(crewai/langchain carregados: {'sim' if pesados_carregados else 'não'})")
+    print(f"Primeira obter_crew (cold start): {tempo_frio:.2f} s")
+    print(f"obter_crew aquecida: {tempo_registro * 1e6:.1f} µs/requisição")
+    print(f"CarolCrewComplete por requisição: {tempo_por_requisicao * 1000:.1f} ms/requisição")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark do classificador de intenções
+
+Compara o IntentClassifier (regex única em trie sobre texto sem acentos)
+com a classificação antiga do MessageProcessor (re.search por padrão, sem
+compilar, primeiro match vence) num corpus de mensagens de chat, e mede
+como cada um escala ao crescer para centenas de palavras-chave.
+
+Uso: python scripts/benchmark_intent_classifier.py [repeticoes]
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import re
+import time
+
+from services.message_processing.intent_classifier import IntentClassifier, PALAVRAS_CHAVE
+
+CORPUS = [
+    "Oi, boa tarde!",
+    "Olá, tudo bem?",
+    "Bom dia, vi o anúncio no site",
+    "Quero comprar um apartamento de 2 quartos no centro",
+    "Vocês têm casa para alugar perto do metrô?",
+    "Qual o preço desse imóvel?",
+    "Quanto custa o condomínio?",
+    "Esse valor aceita financiamento?",
+    "Posso agendar uma visita no sábado?",
+    "Gostaria de conhecer o apartamento amanhã de manhã",
+    "Dá pra ver o imóvel hoje à tarde?",
+    "Aceita fiador ou só seguro fiança?",
+    "Que tipo de garantia vocês pedem?",
+    "Obrigado pela atenção, tchau",
+    "Valeu!",
+    "ok",
+    "Tem vaga de garagem?",
+    "Meu nome é Ana, estou procurando algo no bairro Jardim",
+    "Prefiro andar alto e com varanda gourmet",
+    "kkkk entendi, vou falar com minha esposa e te retorno",
+    "Boa noite, ainda está disponível aquele ap de 450 mil?",
+    "Aceita pet? tenho dois cachorros",
+    "Qual a metragem da sala?",
+    "Vocês trabalham com permuta?",
+]
+
+# Intenções fictícias para simular o crescimento do catálogo de padrões
+VOCABULARIO_EXTRA = [
+    "piscina", "churrasqueira", "academia", "portaria", "elevador", "sacada", "suite", "closet",
+    "quintal", "jardim", "lavanderia", "escritorio", "mobiliado", "reformado", "financiamento",
+    "permuta", "itbi", "escritura", "cartorio", "condominio", "iptu", "metragem", "andar", "vista",
+    "sol da manha", "pet", "cachorro", "gato", "metro", "onibus", "escola", "mercado", "hospital",
+]
+
+
+def classificador_antigo(intent_patterns: dict):
+    """Classificação original do MessageProcessor"""
+    def classificar(message: str) -> dict:
+        message_lower = message.lower()
+        for intent, patterns in intent_patterns.items():
+            for pattern in patterns:
+                if re.search(pattern, message_lower):
+                    return {"intent": intent, "confidence": 0.8}
+        return {"intent": "geral", "confidence": 0.5}
+    return classificar
+
+
+def catalogo_ampliado(total_palavras: int) -> dict:
+    """PALAVRAS_CHAVE + intenções sintéticas até ~total_palavras palavras-chave"""
+    catalogo = dict(PALAVRAS_CHAVE)
+    aleatorio = random.Random(42)
+    indice = 0
+    while sum(len(palavras) for _, palavras in catalogo.values()) < total_palavras:
+        palavras = [
+            f"{aleatorio.choice(VOCABULARIO_EXTRA)}{aleatorio.randint(0, 999)}"
+            for _ in range(10)
+        ]
+        catalogo[f"intencao_{indice}"] = (0.7, palavras)
+        indice += 1
+    return catalogo
+
+
+def padroes_antigos(catalogo: dict) -> dict:
+    return {
+        intencao: [r"\b(" + "|".join(re.escape(p) for p in palavras) + r")\b"]
+        for intencao, (_, palavras) in catalogo.items()
+    }
+
+
+def medir(classificar, mensagens: list) -> float:
+    inicio = time.perf_counter()
+    for mensagem in mensagens:
+        classificar(mensagem)
+    return time.perf_counter() - inicio
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    mensagens = CORPUS * repeticoes
+
+    print(f"Corpus: {len(CORPUS)} mensagens x {repeticoes} = {len(mensagens):,}")
+    for total_palavras in (30, 300, 1000):
+        catalogo = catalogo_ampliado(total_palavras)
+        novo = IntentClassifier(catalogo)
+        antigo = classificador_antigo(padroes_antigos(catalogo))
+
+        tempo_novo = medir(novo.classificar, mensagens)
+        tempo_antigo = medir(antigo, mensagens)
+        n_palavras = sum(len(palavras) for _, palavras in catalogo.values())
+
+        print(f"\n{n_palavras} palavras-chave em {len(catalogo)} intenções")
+        print(f"  Regex única (todas as intenções): {len(mensagens) / tempo_novo:>10,.0f} msg/s "
+              f"({tempo_novo / len(mensagens) * 1e6:.1f} µs/msg)")
+        print(f"  re.search por padrão (1º match): {len(mensagens) / tempo_antigo:>10,.0f} msg/s "
+              f"({tempo_antigo / len(mensagens) * 1e6:.1f} µs/msg)")
+
+    classificador = IntentClassifier()
+    print("\nExemplos:")
+    for mensagem in CORPUS[:12]:
+        resultado = classificador.classificar(mensagem)
+        encontradas = ", ".join(f"{i['intent']}={i['score']:g}" for i in resultado['intents'])
+        print(f"  {mensagem[:50]:<50} -> {resultado['intent']:<16} [{encontradas}]")
+
+
+if __name__ == "__main__":
+    main()
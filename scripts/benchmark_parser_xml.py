@@ -0,0 +1,119 @@
+"""
+Benchmark do parser XML (plano de extração compilado x extração campo a campo)
+
+Replica os imóveis de static/*.xml até n_imoveis (IDs únicos), parseia o
+feed em streaming com XMLParser.iter_imoveis e compara com a extração
+antiga (_get_field_value por campo) sobre os mesmos elementos.
+
+Uso: python scripts/benchmark_parser_xml.py [n_imoveis]
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import glob
+import io
+import time
+import xml.etree.ElementTree as ET
+
+from services.xml_importer.parser import XMLParser, XMLMapping, ITEM_TAGS
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def carregar_modelos() -> list:
+    """Elementos de imóvel dos XMLs de exemplo"""
+    modelos = []
+    for caminho in sorted(glob.glob(os.path.join(RAIZ, 'static', '*.xml'))):
+        raiz = ET.parse(caminho).getroot()
+        for tag in ITEM_TAGS:
+            elementos = raiz.findall(f'.//{tag}')
+            if elementos:
+                modelos.extend(elementos)
+                break
+    return modelos
+
+
+def gerar_feed(modelos: list, n_imoveis: int) -> bytes:
+    """XML com n_imoveis cópias dos modelos, cada uma com id/código próprio"""
+    partes = [b'<?xml version="1.0" encoding="UTF-8"?>\n<imoveis>\n']
+    for i in range(n_imoveis):
+        elemento = modelos[i % len(modelos)]
+        elemento.set('id', str(100000 + i))
+        codigo = elemento.find('codigo')
+        if codigo is not None:
+            codigo.text = f"IMV{i:06d}"
+        partes.append(ET.tostring(elemento, encoding='utf-8'))
+    partes.append(b'</imoveis>\n')
+    return b''.join(partes)
+
+
+def extrair_campo_a_campo(parser: XMLParser, element: ET.Element) -> dict:
+    """Extração antiga: um _get_field_value (find na árvore) por campo"""
+    mapping = parser.mapping
+    imovel_id = parser._get_field_value(element, mapping.id_field)
+    if not imovel_id:
+        return None
+    data = {
+        'id_xml': imovel_id,
+        'codigo_imovel': parser._get_field_value(element, mapping.codigo_field),
+        'titulo': parser._get_field_value(element, mapping.titulo_field),
+        'tipo': parser._get_field_value(element, mapping.tipo_field),
+        'categoria': parser._get_field_value(element, mapping.categoria_field, 'venda'),
+        'preco': parser._parse_float(parser._get_field_value(element, mapping.preco_field)),
+        'endereco': parser._get_field_value(element, mapping.endereco_field),
+        'cidade': parser._get_field_value(element, mapping.cidade_field),
+        'estado': parser._get_field_value(element, mapping.estado_field),
+        'bairro': parser._get_field_value(element, mapping.bairro_field),
+        'area_total': parser._parse_float(parser._get_field_value(element, mapping.area_total_field)),
+        'quartos': parser._parse_int(parser._get_field_value(element, mapping.quartos_field)),
+        'banheiros': parser._parse_int(parser._get_field_value(element, mapping.banheiros_field)),
+        'vagas_garagem': parser._parse_int(parser._get_field_value(element, mapping.vagas_field)),
+        'descricao': parser._get_field_value(element, mapping.descricao_field),
+        'fotos': parser._parse_fotos(parser._get_field_value(element, mapping.fotos_field)),
+        'status': parser._get_field_value(element, mapping.status_field, 'ativo')
+    }
+    data['hash_conteudo'] = parser._generate_content_hash(data)
+    return data
+
+
+def main():
+    n_imoveis = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    from core.logger import logger
+    logger.remove()
+
+    parser = XMLParser(XMLMapping())
+    feed = gerar_feed(carregar_modelos(), n_imoveis)
+    print(f"Feed: {n_imoveis:,} imóveis, {len(feed) / 1024 / 1024:.1f} MB")
+
+    # Streaming completo (iterparse + plano compilado)
+    inicio = time.perf_counter()
+    total = sum(1 for _ in parser.iter_imoveis(io.BytesIO(feed)))
+    tempo_stream = time.perf_counter() - inicio
+
+    # Só extração, sobre a árvore já parseada
+    elementos = ET.fromstring(feed).findall('imovel')
+
+    inicio = time.perf_counter()
+    compilado = [parser._extract_imovel_data(elemento) for elemento in elementos]
+    tempo_compilado = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    antigo = [extrair_campo_a_campo(parser, elemento) for elemento in elementos]
+    tempo_antigo = time.perf_counter() - inicio
+
+    divergencias = sum(1 for a, b in zip(compilado, antigo) if a != b)
+
+    print(f"Streaming (iterparse + extração): {tempo_stream:.2f}s ({total / tempo_stream:,.0f} imóveis/s)")
+    print(f"Extração compilada:  {tempo_compilado:.2f}s ({len(elementos) / tempo_compilado:,.0f} imóveis/s)")
+    print(f"Extração campo a campo: {tempo_antigo:.2f}s ({len(elementos) / tempo_antigo:,.0f} imóveis/s)")
+    print(f"Divergências: {divergencias}")
+
+    if divergencias or total != n_imoveis:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
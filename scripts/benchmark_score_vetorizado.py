@@ -0,0 +1,103 @@
+"""
+Paridade e benchmark do score vetorizado x calcular_score_compatibilidade
+
+Uso: python scripts/benchmark_score_vetorizado.py [n_leads] [n_imoveis]
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import time
+
+import numpy as np
+
+from services.matching.geo_matching import GeoMatchingEngine
+from services.matching.vector_scoring import calcular_scores_dicts
+
+
+def gerar_imovel(rng: random.Random) -> dict:
+    """Imóvel aleatório no formato de ImovelDual.to_dict()"""
+    tipo_operacao = rng.choice(['venda', 'locacao'])
+    imovel = {
+        'tipo_operacao': tipo_operacao,
+        'tipo_imovel': rng.choice(['apartamento', 'casa', 'comercial']),
+        'quartos': rng.randint(0, 5),
+        'vagas_garagem': rng.randint(0, 3),
+        'area_total': rng.choice([0, rng.uniform(30, 300)]),
+        'aceita_pets': rng.random() < 0.5,
+    }
+    if rng.random() < 0.9:
+        imovel['distancia_km'] = round(rng.uniform(0, 4), 2)
+    if tipo_operacao == 'venda':
+        imovel['preco_venda'] = rng.uniform(150_000, 1_500_000)
+    else:
+        imovel['valor_total_mensal'] = rng.uniform(800, 9_000)
+        imovel['mobiliado'] = rng.choice(['sim', 'semi', 'nao'])
+    return imovel
+
+
+def gerar_lead(rng: random.Random) -> dict:
+    """Critérios aleatórios de lead (apenas chaves com valor)"""
+    lead = {}
+    if rng.random() < 0.7:
+        lead['tipo_imovel'] = rng.choice(['apartamento', 'casa', 'comercial'])
+    if rng.random() < 0.8:
+        lead['quartos_min'] = rng.randint(0, 3)
+    if rng.random() < 0.5:
+        lead['quartos_max'] = rng.randint(2, 5)
+    if rng.random() < 0.5:
+        lead['vagas_min'] = rng.randint(0, 2)
+    if rng.random() < 0.7:
+        lead['orcamento_min_venda'] = rng.uniform(100_000, 600_000)
+    if rng.random() < 0.7:
+        lead['orcamento_max_venda'] = rng.uniform(400_000, 1_200_000)
+    if rng.random() < 0.7:
+        lead['orcamento_max_total_mensal'] = rng.uniform(1_000, 6_000)
+    lead['aceita_pets_necessario'] = rng.random() < 0.3
+    if rng.random() < 0.6:
+        lead['mobiliado_preferencia'] = rng.choice(['sim', 'semi', 'nao', 'indiferente'])
+    if rng.random() < 0.3:
+        lead['area_min'] = rng.uniform(30, 120)
+    if rng.random() < 0.3:
+        lead['area_max'] = rng.uniform(80, 250)
+    return lead
+
+
+def main():
+    n_leads = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    n_imoveis = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+
+    rng = random.Random(42)
+    imoveis = [gerar_imovel(rng) for _ in range(n_imoveis)]
+    leads = [gerar_lead(rng) for _ in range(n_leads)]
+
+    # Engine sem carregar configuração do banco (o score não usa estado)
+    engine = GeoMatchingEngine.__new__(GeoMatchingEngine)
+
+    inicio = time.perf_counter()
+    esperado = np.array([
+        [engine.calcular_score_compatibilidade(imovel, lead) for imovel in imoveis]
+        for lead in leads
+    ])
+    tempo_escalar = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    obtido = calcular_scores_dicts(imoveis, leads)
+    tempo_vetorizado = time.perf_counter() - inicio
+
+    divergencias = int(np.count_nonzero(esperado != obtido))
+    pares = n_leads * n_imoveis
+
+    print(f"Pares: {pares:,}")
+    print(f"Escalar:    {tempo_escalar:.3f}s ({pares / tempo_escalar:,.0f} pares/s)")
+    print(f"Vetorizado: {tempo_vetorizado:.3f}s ({pares / tempo_vetorizado:,.0f} pares/s)")
+    print(f"Divergências: {divergencias}")
+
+    if divergencias:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
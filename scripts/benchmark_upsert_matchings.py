@@ -0,0 +1,97 @@
+"""
+Benchmark da gravação de matches (upsert em lote x SELECT + ORM por par)
+
+Grava n_matches pares lead/imóvel na tabela matchings duas vezes (inserção
+e atualização) com cada estratégia e mostra linhas/s. Usa um cliente_id
+próprio e apaga as linhas no final.
+
+Uso: python scripts/benchmark_upsert_matchings.py [n_matches] [database_url]
+     (sem database_url usa DATABASE_URL das configurações)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import time
+import uuid
+
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import sessionmaker
+
+from core.config import get_settings
+from models.lead import Matching
+from services.matching.persistencia import salvar_matchings
+
+CLIENTE_ID = 'benchmark_upsert_matchings'
+
+
+def gerar_linhas(pares: list, rng: random.Random) -> list:
+    return [
+        {
+            'lead_id': lead_id,
+            'imovel_id': imovel_id,
+            'cliente_id': CLIENTE_ID,
+            'score_geral': round(rng.random(), 3),
+            'score_preco': round(rng.random(), 3),
+            'score_localizacao': round(rng.random(), 3),
+            'score_caracteristicas': round(rng.random(), 3),
+            'score_ia': round(rng.random(), 3),
+            'motivos_match': ["Match encontrado pelo sistema"],
+            'pontos_atencao': []
+        }
+        for lead_id, imovel_id in pares
+    ]
+
+
+def gravar_por_par(db, linhas: list):
+    """Estratégia antiga de MatchingEngine._save_matches"""
+    for linha in linhas:
+        existente = db.query(Matching).filter(
+            Matching.lead_id == linha['lead_id'],
+            Matching.imovel_id == linha['imovel_id']
+        ).first()
+        if existente:
+            for campo, valor in linha.items():
+                setattr(existente, campo, valor)
+        else:
+            db.add(Matching(id=str(uuid.uuid4()), **linha))
+
+
+def medir(Sessao, gravar, linhas: list) -> float:
+    inicio = time.perf_counter()
+    with Sessao.begin() as db:
+        gravar(db, linhas)
+    return len(linhas) / (time.perf_counter() - inicio)
+
+
+def limpar(Sessao):
+    with Sessao.begin() as db:
+        db.execute(delete(Matching).where(Matching.cliente_id == CLIENTE_ID))
+
+
+def main():
+    n_matches = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    url = sys.argv[2] if len(sys.argv) > 2 else get_settings().database_url
+
+    engine = create_engine(url)
+    Matching.__table__.create(bind=engine, checkfirst=True)
+    Sessao = sessionmaker(bind=engine)
+
+    rng = random.Random(42)
+    leads = [str(uuid.uuid4()) for _ in range(max(n_matches // 10, 1))]
+    pares = [(lead_id, str(uuid.uuid4())) for lead_id in leads for _ in range(10)][:n_matches]
+
+    print(f"{len(pares)} matches ({len(leads)} leads x 10) em {engine.dialect.name}")
+    for nome, gravar in (('SELECT + ORM por par', gravar_por_par), ('upsert em lote', salvar_matchings)):
+        limpar(Sessao)
+        insercao = medir(Sessao, gravar, gerar_linhas(pares, rng))
+        atualizacao = medir(Sessao, gravar, gerar_linhas(pares, rng))
+        print(f"{nome:22s} inserção {insercao:10.0f} linhas/s   atualização {atualizacao:10.0f} linhas/s")
+
+    limpar(Sessao)
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,7 @@ from models.base import Base
 from models.configuracao_imobiliaria import ConfiguracaoImobiliaria
 from models.imovel_dual import ImovelDual
 from models.lead_crm_integrado import LeadCRMIntegrado
+from models.lead_top_match import LeadTopMatch
 from models.garantias_locacao import TipoGarantia, GARANTIAS_INICIAIS
 from sqlalchemy import text
 
@@ -0,0 +1,90 @@
+"""
+Teste de carga do webhook N8N (/webhook/n8n/incoming)
+
+Simula N conversas simultâneas, cada uma enviando M mensagens em sequência
+(como um chat real), e reporta a latência por requisição (p50/p95/p99).
+Rodar contra a API antes e depois de uma mudança, com o mesmo banco/Redis.
+
+Uso: python scripts/load_test_webhook.py [url_base] [chats] [mensagens_por_chat]
+Ex.: python scripts/load_test_webhook.py http://localhost:8000 200 5
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import random
+import time
+
+import httpx
+
+MENSAGENS = [
+    "Olá, bom dia!",
+    "Procuro apartamento para comprar",
+    "Qual o valor?",
+    "Quero agendar uma visita",
+    "Obrigado, tchau",
+]
+
+
+def percentil(valores: list, p: float) -> float:
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+async def simular_chat(cliente: httpx.AsyncClient, url: str, indice: int, mensagens: int,
+                       latencias: list, erros: list):
+    phone = f"55119{indice:08d}"
+    chat_id = f"loadtest_{indice}"
+
+    for i in range(mensagens):
+        payload = {
+            "phone": phone,
+            "chat_id": chat_id,
+            "contact_name": f"Cliente {indice}",
+            "message": MENSAGENS[i % len(MENSAGENS)],
+            "message_type": "text"
+        }
+        inicio = time.perf_counter()
+        try:
+            resposta = await cliente.post(url, json=payload)
+            if resposta.status_code != 200:
+                erros.append(resposta.status_code)
+        except httpx.HTTPError as e:
+            erros.append(type(e).__name__)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+        # Intervalo curto entre mensagens do mesmo chat
+        await asyncio.sleep(random.uniform(0.05, 0.2))
+
+
+async def main():
+    url_base = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8000"
+    chats = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    mensagens = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    url = f"{url_base.rstrip('/')}/webhook/n8n/incoming"
+
+    latencias, erros = [], []
+    limites = httpx.Limits(max_connections=chats, max_keepalive_connections=chats)
+
+    async with httpx.AsyncClient(timeout=30, limits=limites) as cliente:
+        inicio = time.perf_counter()
+        await asyncio.gather(*[
+            simular_chat(cliente, url, i, mensagens, latencias, erros)
+            for i in range(chats)
+        ])
+        duracao = time.perf_counter() - inicio
+
+    print(f"Chats simultâneos: {chats} x {mensagens} mensagens ({len(latencias)} requisições)")
+    print(f"Duração: {duracao:.2f}s ({len(latencias) / duracao:,.0f} req/s)")
+    print(f"Latência p50: {percentil(latencias, 50):.1f} ms")
+    print(f"Latência p95: {percentil(latencias, 95):.1f} ms")
+    print(f"Latência p99: {percentil(latencias, 99):.1f} ms")
+    print(f"Latência máx: {max(latencias):.1f} ms")
+    print(f"Erros: {len(erros)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
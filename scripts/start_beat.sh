@@ -1,4 +1,4 @@
 #!/bin/bash
 echo "⏰ Iniciando Celery Beat (Scheduler)..."
 source .venv/bin/activate
-celery -A core.celery_app beat --loglevel=info
+PROCESS_ROLE=beat celery -A core.celery_app beat --loglevel=info
@@ -0,0 +1,134 @@
+"""
+Teste do WhatsAppSender contra um servidor Graph local (stub)
+
+Sobe um servidor HTTP que imita POST /{phone_id}/messages, com uma fração
+de respostas 429 (com Retry-After) e 500, e envia N mensagens pelo sender:
+confere que todas chegam (retry), que a vazão respeita o token bucket e que
+as conexões são reutilizadas.
+
+Uso: python scripts/teste_whatsapp_sender.py [mensagens] [msg_por_segundo] [--fila]
+  --fila: passa pela fila Redis (enfileirar_mensagem + descarregar_fila),
+          usando o redis_url do Settings
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from services.whatsapp.whatsapp_sender import WhatsAppSender
+
+TAXA_429 = 0.05
+TAXA_500 = 0.05
+
+
+class StubGraph(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    recebidas = []
+    conexoes = set()
+    lock = threading.Lock()
+
+    def do_POST(self):
+        corpo = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with self.lock:
+            self.conexoes.add(self.client_address)
+
+        sorteio = random.random()
+        if sorteio < TAXA_429:
+            self._responder(429, {"error": {"code": 130429, "message": "Rate limit hit"}}, {"Retry-After": "0.2"})
+        elif sorteio < TAXA_429 + TAXA_500:
+            self._responder(500, {"error": {"message": "Internal error"}})
+        else:
+            with self.lock:
+                self.recebidas.append((time.perf_counter(), corpo['to']))
+            self._responder(200, {"messages": [{"id": f"wamid.{len(self.recebidas)}"}]})
+
+    def _responder(self, status: int, corpo: dict, headers: dict = None):
+        dados = json.dumps(corpo).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        for nome, valor in (headers or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def log_message(self, *args):
+        pass
+
+
+async def enviar_direto(sender: WhatsAppSender, telefones: list) -> list:
+    return await asyncio.gather(*[sender.enviar_texto(t, "Olá! Temos novos imóveis para você") for t in telefones])
+
+
+async def enviar_pela_fila(sender: WhatsAppSender, telefones: list) -> dict:
+    import redis as redis_sync
+    import redis.asyncio as redis_async
+    from core.config import get_settings
+    from services.whatsapp.outbound_queue import enfileirar_mensagem, descarregar_fila
+
+    url = get_settings().redis_url
+    cliente = redis_sync.from_url(url, decode_responses=True)
+    for telefone in telefones:
+        enfileirar_mensagem(telefone, "Olá! Temos novos imóveis para você", redis=cliente)
+
+    redis = redis_async.from_url(url, decode_responses=True)
+    try:
+        return await descarregar_fila(sender, redis)
+    finally:
+        await redis.aclose()
+
+
+async def main():
+    argumentos = [a for a in sys.argv[1:] if not a.startswith('--')]
+    mensagens = int(argumentos[0]) if argumentos else 500
+    por_segundo = float(argumentos[1]) if len(argumentos) > 1 else 100
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), StubGraph)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    api_url = f"http://127.0.0.1:{servidor.server_port}/v18.0"
+
+    telefones = [f"1199{i:07d}" for i in range(mensagens)]
+    sender = WhatsAppSender("token-teste", "123456", api_url=api_url,
+                            mensagens_por_segundo=por_segundo, backoff_base_s=0.05)
+
+    inicio = time.perf_counter()
+    async with sender:
+        if '--fila' in sys.argv:
+            print(f"Fila: {await enviar_pela_fila(sender, telefones)}")
+            falhas = 0
+        else:
+            resultados = await enviar_direto(sender, telefones)
+            falhas = sum(1 for r in resultados if r['status'] != 'success')
+            retentativas = sum(r.get('tentativas', 1) - 1 for r in resultados)
+            print(f"Retentativas: {retentativas}")
+    duracao = time.perf_counter() - inicio
+    servidor.shutdown()
+
+    instantes = sorted(t for t, _ in StubGraph.recebidas)
+    pico = max(
+        (sum(1 for t in instantes[i:] if t - inicial < 1) for i, inicial in enumerate(instantes)),
+        default=0
+    )
+
+    print(f"Mensagens: {mensagens} | entregues: {len(StubGraph.recebidas)} | falhas: {falhas}")
+    print(f"Duração: {duracao:.2f}s ({len(StubGraph.recebidas) / duracao:,.0f} msg/s, limite {por_segundo:g}/s)")
+    print(f"Pico em 1s: {pico} | conexões TCP usadas: {len(StubGraph.conexoes)}")
+
+    ok = (
+        len(StubGraph.recebidas) == mensagens
+        and falhas == 0
+        and pico <= por_segundo * 2  # rajada inicial do bucket + 1s de taxa
+    )
+    print("OK" if ok else "FALHOU")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
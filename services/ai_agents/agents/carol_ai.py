@@ -14,6 +14,8 @@ except ImportError:
     OPENAI_AVAILABLE = False
 
 from core.database import get_db_session
+from services.ai_agents.llm_cache import completar_com_cache
+from services.ai_agents.message_router import rotear_mensagem, pontuar_novo_imovel
 from models.lead_crm_integrado import LeadCRMIntegrado
 from models.tipos_garantia import TipoGarantia
 
@@ -27,6 +29,9 @@ class CarolAI:
         self.cliente_id = cliente_id
         self.openai_client = None
         
+        # Orçamento de tokens por minuto (só durante campanhas; ver carol_campaign)
+        self.orcamento_tokens = None
+        
         # Configurar OpenAI se disponível
         if OPENAI_AVAILABLE and os.getenv('OPENAI_API_KEY'):
             self.openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
@@ -48,9 +53,16 @@ class CarolAI:
     ) -> str:
         """
         Criar mensagem personalizada para novos imóveis
+        Template quando os dados bastam; LLM só para os casos que precisam.
         """
         
-        if self.openai_client:
+        rota = rotear_mensagem(
+            self.cliente_id,
+            'novo_imovel',
+            pontuar_novo_imovel(lead_data, imoveis_matches),
+            llm_disponivel=self.openai_client is not None
+        )
+        if rota == 'llm':
             return self._criar_mensagem_com_ia(lead_data, imoveis_matches, imobiliaria_nome)
         else:
             return self._criar_mensagem_template(lead_data, imoveis_matches, imobiliaria_nome)
@@ -69,9 +81,10 @@ class CarolAI:
         contexto = self._preparar_contexto_ia(lead_data, imoveis_matches, imobiliaria_nome)
         
         try:
-            response = self.openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
+            mensagem = completar_com_cache(
+                self.openai_client,
+                modelo="gpt-3.5-turbo",
+                mensagens=[
                     {
                         "role": "system",
                         "content": """Você é a Carol, uma corretora de imóveis experiente e amigável. 
@@ -106,10 +119,10 @@ FORMATO DA MENSAGEM:
                     }
                 ],
                 max_tokens=500,
-                temperature=0.7
+                temperatura=0.7,
+                orcamento=self.orcamento_tokens
             )
             
-            mensagem = response.choices[0].message.content.strip()
             return mensagem
             
         except Exception as e:
@@ -257,7 +270,9 @@ Limite: máximo 300 palavras."""
         if not garantia_encontrada:
             return self._resposta_garantia_generica()
         
-        if self.openai_client:
+        # Resposta sai de dados estruturados da garantia: template, salvo política sempre_llm
+        rota = rotear_mensagem(self.cliente_id, 'garantia', 1.0, llm_disponivel=self.openai_client is not None)
+        if rota == 'llm':
             return self._responder_garantia_com_ia(garantia_encontrada)
         else:
             return self._responder_garantia_template(garantia_encontrada)
@@ -291,9 +306,10 @@ DESVANTAGENS:
 TAREFA: Explique essa garantia de forma clara e amigável, como a Carol faria."""
         
         try:
-            response = self.openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
+            return completar_com_cache(
+                self.openai_client,
+                modelo="gpt-3.5-turbo",
+                mensagens=[
                     {
                         "role": "system",
                         "content": """Você é a Carol, corretora experiente. Explique tipos de garantia de forma:
@@ -308,11 +324,10 @@ TAREFA: Explique essa garantia de forma clara e amigável, como a Carol faria.""
                     }
                 ],
                 max_tokens=400,
-                temperature=0.6
+                temperatura=0.6,
+                orcamento=self.orcamento_tokens
             )
             
-            return response.choices[0].message.content.strip()
-            
         except Exception as e:
             print(f"❌ Erro ao responder garantia com IA: {e}")
             return self._responder_garantia_template(garantia_info)
@@ -383,13 +398,19 @@ TAREFA: Explique essa garantia de forma clara e amigável, como a Carol faria.""
 def enviar_mensagem_novos_imoveis(
     cliente_id: str,
     lead_data: Dict[str, Any],
-    imoveis_matches: List[Dict[str, Any]]
+    imoveis_matches: List[Dict[str, Any]],
+    carol: Optional[CarolAI] = None
 ) -> Dict[str, Any]:
     """
     Enviar mensagem sobre novos imóveis para um lead
+    carol: instância reaproveitada entre leads do mesmo cliente (campanhas)
     """
     
-    carol = CarolAI(cliente_id)
+    # Sem telefone não há envio: nem gera a mensagem
+    if not lead_data.get('telefone'):
+        raise ValueError(f"Lead {lead_data.get('nome') or lead_data.get('id')} sem telefone")
+    
+    carol = carol or CarolAI(cliente_id)
     
     # Criar mensagem personalizada
     mensagem = carol.criar_mensagem_novo_imovel(
@@ -398,8 +419,14 @@ def enviar_mensagem_novos_imoveis(
         imobiliaria_nome="Imobiliária Teste"
     )
     
-    # Aqui seria integrado com WhatsApp Business API
-    # Por enquanto, apenas simular o envio
+    # Envio fica na fila do WhatsApp (task enviar_fila_whatsapp); aqui só enfileira
+    from services.whatsapp.outbound_queue import enfileirar_mensagem
+    
+    item = enfileirar_mensagem(
+        telefone=lead_data['telefone'],
+        mensagem=mensagem,
+        metadados={"cliente_id": cliente_id, "lead_id": lead_data.get('id')}
+    )
     
     resultado = {
         "lead_id": lead_data.get('id'),
@@ -408,11 +435,12 @@ def enviar_mensagem_novos_imoveis(
         "mensagem_enviada": mensagem,
         "imoveis_apresentados": len(imoveis_matches),
         "timestamp": datetime.now().isoformat(),
-        "status_envio": "simulado",  # Em produção seria "enviado" ou "erro"
+        "status_envio": "enfileirado",
+        "envio_id": item['id'],
         "canal": "whatsapp"
     }
     
-    print(f"📱 Mensagem enviada para {lead_data.get('nome')} ({lead_data.get('telefone')})")
+    print(f"📱 Mensagem enfileirada para {lead_data.get('nome')} ({lead_data.get('telefone')})")
     print(f"📝 Mensagem: {mensagem[:100]}...")
     
     return resultado
@@ -1,13 +1,27 @@
 """
 Carol Crew - Sistema Completo de Agents CrewAI
+
+crewai/langchain são importados só na construção da crew (levam segundos);
+use crew_registry.obter_crew() para reaproveitar uma instância por processo.
+
+Cada execute_* passa antes pelo message_router: mensagens que o template
+dos agents carol_*_final resolve não chegam ao LLM.
 """
 
-from crewai import Agent, Task, Crew
-from langchain_openai import ChatOpenAI
 from core.logger import logger
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import os
 
+from services.ai_agents.message_router import (
+    rotear_mensagem,
+    pontuar_primeiro_contato,
+    pontuar_apresentacao,
+    pontuar_resposta_cliente
+)
+from services.ai_agents.agents.carol_contact_final import CarolContactAgent
+from services.ai_agents.agents.carol_scheduling_final import CarolSchedulingAgent
+from services.ai_agents.agents.carol_closure_final import CarolClosureAgent
+
 
 class CarolCrewComplete:
     """
@@ -15,14 +29,27 @@ class CarolCrewComplete:
     Orquestra todo o fluxo de conversação
     """
     
-    def __init__(self, openai_api_key: str, base_url: str = "http://localhost:8000"):
+    def __init__(
+        self,
+        openai_api_key: str,
+        base_url: str = "http://localhost:8000",
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.3
+    ):
+        from langchain_openai import ChatOpenAI
+        
         self.llm = ChatOpenAI(
-            model="gpt-4o-mini",
+            model=model,
             api_key=openai_api_key,
-            temperature=0.3
+            temperature=temperature
         )
         self.base_url = base_url
         
+        # Templates usados quando o roteamento dispensa o LLM
+        self.contact_template = CarolContactAgent(base_url)
+        self.scheduling_template = CarolSchedulingAgent()
+        self.closure_template = CarolClosureAgent()
+        
         # Criar todos os agents
         self._create_agents()
         
@@ -30,6 +57,7 @@ class CarolCrewComplete:
     
     def _create_agents(self):
         """Criar todos os agents do sistema"""
+        from crewai import Agent
         
         # Agent de Primeiro Contato
         self.contact_agent = Agent(
@@ -114,6 +142,11 @@ class CarolCrewComplete:
     
     def execute_initial_contact(self, lead_data: Dict, imobiliaria_nome: str, region: str) -> str:
         """Executar primeiro contato usando CrewAI"""
+        rota = rotear_mensagem(lead_data.get('cliente_id'), 'primeiro_contato', pontuar_primeiro_contato(lead_data, region))
+        if rota == 'template':
+            return self.contact_template.create_initial_contact(lead_data, imobiliaria_nome, region)
+        
+        from crewai import Task, Crew
         
         client_name = lead_data.get('nome', 'Cliente')
         property_type = lead_data.get('tipo_imovel', 'imóvel')
@@ -158,10 +191,15 @@ class CarolCrewComplete:
     
     def execute_properties_presentation(self, matched_properties: List[Dict], cliente_id: str) -> str:
         """Apresentar imóveis usando CrewAI"""
-        
         if not matched_properties:
             return "No momento não temos imóveis disponíveis que atendam seu perfil."
         
+        rota = rotear_mensagem(cliente_id, 'apresentacao', pontuar_apresentacao(matched_properties))
+        if rota == 'template':
+            return self.contact_template.create_properties_presentation(matched_properties, cliente_id)
+        
+        from crewai import Task, Crew
+        
         # Preparar dados com links
         properties_info = []
         for i, prop in enumerate(matched_properties, 1):
@@ -209,8 +247,13 @@ class CarolCrewComplete:
             logger.error(f"Erro na apresentação CrewAI: {e}")
             return self._fallback_presentation(properties_info)
     
-    def execute_scheduling_request(self, client_interest: str) -> str:
+    def execute_scheduling_request(self, client_interest: str, cliente_id: Optional[str] = None) -> str:
         """Solicitar agendamento usando CrewAI"""
+        rota = rotear_mensagem(cliente_id, 'agendamento', pontuar_resposta_cliente(client_interest))
+        if rota == 'template':
+            return self.scheduling_template.create_scheduling_request(client_interest)
+        
+        from crewai import Task, Crew
         
         task = Task(
             description=f"""
@@ -241,8 +284,13 @@ class CarolCrewComplete:
             logger.error(f"Erro no agendamento CrewAI: {e}")
             return "Perfeito. Para agendar preciso saber qual imóvel te interessou, que dia seria melhor e qual horário você prefere."
     
-    def execute_closure(self, client_message: str, reason: str = "desinteresse") -> str:
+    def execute_closure(self, client_message: str, reason: str = "desinteresse", cliente_id: Optional[str] = None) -> str:
         """Executar encerramento usando CrewAI"""
+        rota = rotear_mensagem(cliente_id, 'encerramento', pontuar_resposta_cliente(client_message))
+        if rota == 'template':
+            return self.closure_template.create_closure_message(reason)
+        
+        from crewai import Task, Crew
         
         task = Task(
             description=f"""
@@ -274,8 +322,13 @@ class CarolCrewComplete:
             logger.error(f"Erro no encerramento CrewAI: {e}")
             return "Compreendo perfeitamente. Agradeço seu tempo e fico à disposição caso precise de ajuda no futuro."
     
-    def analyze_client_response(self, client_message: str) -> Dict[str, str]:
+    def analyze_client_response(self, client_message: str, cliente_id: Optional[str] = None) -> Dict[str, str]:
         """Analisar resposta do cliente usando CrewAI"""
+        rota = rotear_mensagem(cliente_id, 'analise', pontuar_resposta_cliente(client_message))
+        if rota == 'template':
+            return self._simple_analysis(client_message)
+        
+        from crewai import Task, Crew
         
         task = Task(
             description=f"""
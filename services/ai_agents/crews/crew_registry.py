@@ -0,0 +1,86 @@
+"""
+Registro de crews da Carol por processo
+
+CarolCrewComplete cria um ChatOpenAI e quatro Agents, e o primeiro import
+de crewai/langchain leva segundos. Endpoints e automações pedem a crew
+aqui: cada combinação (model, temperature, base_url) é construída uma vez,
+na primeira chamada, e reaproveitada. aquecer_crews() faz essa construção
+no início do worker (com carol_aquecer_crews) para que a primeira tarefa
+não pague o custo.
+"""
+
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+from core.logger import logger
+
+_crews: Dict[Tuple[str, float, str], Any] = {}
+_tempos_construcao: Dict[Tuple[str, float, str], float] = {}
+_lock = threading.Lock()
+
+
+def obter_crew(
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    base_url: str = "http://localhost:8000",
+    openai_api_key: Optional[str] = None
+):
+    """CarolCrewComplete compartilhada para (model, temperature, base_url)"""
+    from core.ai_config import ai_config
+
+    model = model or ai_config.openai_model
+    temperature = ai_config.openai_temperature if temperature is None else temperature
+    chave = (model, float(temperature), base_url)
+
+    crew = _crews.get(chave)
+    if crew is not None:
+        return crew
+
+    with _lock:
+        crew = _crews.get(chave)
+        if crew is None:
+            from services.ai_agents.crews.carol_crew_complete import CarolCrewComplete
+
+            inicio = time.perf_counter()
+            crew = CarolCrewComplete(
+                openai_api_key=openai_api_key or ai_config.openai_api_key,
+                base_url=base_url,
+                model=model,
+                temperature=temperature
+            )
+            _tempos_construcao[chave] = time.perf_counter() - inicio
+            _crews[chave] = crew
+            logger.info(f"[CREWS] Crew {chave} construída em {_tempos_construcao[chave]:.2f}s")
+    return crew
+
+
+def aquecer_crews(base_url: str = "http://localhost:8000") -> bool:
+    """Construir a crew padrão antecipadamente (início do worker); False se IA indisponível"""
+    from core.ai_config import ai_config
+
+    if not ai_config.is_ai_enabled():
+        return False
+    try:
+        obter_crew(base_url=base_url)
+        return True
+    except Exception as e:
+        logger.warning(f"[CREWS] Aquecimento das crews falhou: {e}")
+        return False
+
+
+def estatisticas_crews() -> Dict[str, Any]:
+    return {
+        'crews': len(_crews),
+        'construcao_s': {
+            f"{model}|{temperature}|{base_url}": round(segundos, 3)
+            for (model, temperature, base_url), segundos in _tempos_construcao.items()
+        }
+    }
+
+
+def limpar_crews():
+    """Descartar as crews (troca de API key / testes)"""
+    with _lock:
+        _crews.clear()
+        _tempos_construcao.clear()
@@ -0,0 +1,232 @@
+"""
+Cache de respostas do LLM (Redis)
+
+Chave = hash do prompt normalizado (modelo, temperatura, max_tokens e
+mensagens com espaços colapsados). Entradas expiram por TTL e o total é
+limitado: um sorted set guarda o último acesso de cada chave e, ao passar
+de max_entradas, as menos usadas saem (LRU).
+
+Requisições idênticas em paralelo geram uma só completion: quem pega o
+lock da chave chama o LLM e as demais aguardam o resultado no cache.
+
+Chaves:
+- llm:cache:{hash}       -> JSON {texto, tokens, latencia_ms}
+- llm:cache:lock:{hash}  -> geração em andamento (token de quem gera)
+- llm:cache:acessos      -> sorted set hash -> último acesso (LRU)
+- llm:cache:metricas     -> hash de contadores (hits, misses, ...)
+"""
+
+import hashlib
+import json
+import time
+import uuid
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from redis.exceptions import RedisError
+
+from core.logger import logger
+from core.redis_config import LIBERAR_LOCK_LUA
+
+PREFIXO = "llm:cache"
+CHAVE_ACESSOS = f"{PREFIXO}:acessos"
+CHAVE_METRICAS = f"{PREFIXO}:metricas"
+
+TTL_LOCK_S = 60
+ESPERA_INTERVALO_S = 0.1
+
+
+def normalizar_prompt(modelo: str, mensagens: List[Dict[str, str]], temperatura: float,
+                      max_tokens: Optional[int] = None) -> str:
+    """JSON canônico do prompt (espaços colapsados, chaves ordenadas)"""
+    return json.dumps({
+        'modelo': modelo,
+        'temperatura': round(float(temperatura), 3),
+        'max_tokens': max_tokens,
+        'mensagens': [
+            {'role': m['role'], 'content': ' '.join(str(m['content']).split())}
+            for m in mensagens
+        ]
+    }, sort_keys=True, ensure_ascii=False)
+
+
+def hash_prompt(*args, **kwargs) -> str:
+    return hashlib.sha256(normalizar_prompt(*args, **kwargs).encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """Cache + deduplicação de completions"""
+
+    def __init__(self, redis, ttl_segundos: int = 7 * 24 * 3600, max_entradas: int = 10000,
+                 espera_max_s: float = 30):
+        self.redis = redis
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self.espera_max_s = espera_max_s
+
+    def obter_ou_gerar(self, chave: str, gerar: Callable[[], Tuple[str, int]]) -> str:
+        """
+        Texto do cache ou gerado por gerar() -> (texto, tokens)
+        Só uma geração por chave por vez; as demais esperam até espera_max_s.
+        Depois que gerar() rodou, erros do Redis não propagam (o texto já foi pago).
+        """
+        entrada = self._ler(chave)
+        if entrada:
+            self._registrar_hit(entrada)
+            return entrada['texto']
+
+        chave_lock = f"{PREFIXO}:lock:{chave}"
+        token = uuid.uuid4().hex
+        adquirido = bool(self.redis.set(chave_lock, token, nx=True, ex=TTL_LOCK_S))
+        if not adquirido:
+            entrada = self._aguardar(chave)
+            if entrada:
+                self._incrementar(coalescidas=1)
+                self._registrar_hit(entrada)
+                return entrada['texto']
+            # Espera esgotada ou geração abandonada: gera sem apagar o lock de outro
+            adquirido = bool(self.redis.set(chave_lock, token, nx=True, ex=TTL_LOCK_S))
+
+        try:
+            inicio = time.perf_counter()
+            texto, tokens = gerar()
+            latencia_ms = int((time.perf_counter() - inicio) * 1000)
+        finally:
+            if adquirido:
+                self._liberar_lock(chave_lock, token)
+
+        try:
+            self._gravar(chave, {'texto': texto, 'tokens': tokens, 'latencia_ms': latencia_ms})
+            self._incrementar(misses=1, tokens_gerados=tokens, latencia_llm_ms=latencia_ms)
+        except RedisError as e:
+            logger.warning(f"[LLM_CACHE] Resposta gerada mas não gravada no cache: {e}")
+        return texto
+
+    def _liberar_lock(self, chave_lock: str, token: str):
+        try:
+            self.redis.eval(LIBERAR_LOCK_LUA, 1, chave_lock, token)
+        except RedisError as e:
+            logger.warning(f"[LLM_CACHE] Lock {chave_lock} não liberado (expira em {TTL_LOCK_S}s): {e}")
+
+    # ARMAZENAMENTO
+
+    def _ler(self, chave: str) -> Optional[Dict[str, Any]]:
+        bruto = self.redis.get(f"{PREFIXO}:{chave}")
+        if not bruto:
+            return None
+        self.redis.zadd(CHAVE_ACESSOS, {chave: time.time()})
+        return json.loads(bruto)
+
+    def _gravar(self, chave: str, entrada: Dict[str, Any]):
+        pipe = self.redis.pipeline()
+        pipe.set(f"{PREFIXO}:{chave}", json.dumps(entrada, ensure_ascii=False), ex=self.ttl_segundos)
+        pipe.zadd(CHAVE_ACESSOS, {chave: time.time()})
+        pipe.zcard(CHAVE_ACESSOS)
+        total = pipe.execute()[-1]
+
+        if total > self.max_entradas:
+            self._despejar(total - self.max_entradas)
+
+    def _despejar(self, quantidade: int):
+        """Remover as entradas acessadas há mais tempo"""
+        antigas = self.redis.zpopmin(CHAVE_ACESSOS, quantidade)
+        if antigas:
+            self.redis.delete(*[f"{PREFIXO}:{chave}" for chave, _ in antigas])
+            self._incrementar(despejadas=len(antigas))
+
+    def _aguardar(self, chave: str) -> Optional[Dict[str, Any]]:
+        """Esperar a geração em andamento de outra requisição"""
+        limite = time.monotonic() + self.espera_max_s
+        while time.monotonic() < limite:
+            time.sleep(ESPERA_INTERVALO_S)
+            entrada = self._ler(chave)
+            if entrada:
+                return entrada
+            if not self.redis.exists(f"{PREFIXO}:lock:{chave}"):
+                return self._ler(chave)
+        return None
+
+    # MÉTRICAS
+
+    def _registrar_hit(self, entrada: Dict[str, Any]):
+        self._incrementar(
+            hits=1,
+            tokens_economizados=entrada.get('tokens', 0),
+            latencia_economizada_ms=entrada.get('latencia_ms', 0)
+        )
+
+    def _incrementar(self, **contadores):
+        pipe = self.redis.pipeline()
+        for campo, valor in contadores.items():
+            if valor:
+                pipe.hincrby(CHAVE_METRICAS, campo, int(valor))
+        pipe.execute()
+
+    def metricas(self) -> Dict[str, Any]:
+        dados = {campo: int(valor) for campo, valor in (self.redis.hgetall(CHAVE_METRICAS) or {}).items()}
+        hits, misses = dados.get('hits', 0), dados.get('misses', 0)
+        return {
+            **dados,
+            'taxa_acerto': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            'latencia_media_llm_ms': round(dados.get('latencia_llm_ms', 0) / misses) if misses else 0,
+            'entradas': self.redis.zcard(CHAVE_ACESSOS)
+        }
+
+
+_cache: Optional[LLMCache] = None
+
+
+def obter_llm_cache() -> Optional[LLMCache]:
+    """LLMCache do processo (None se desativado ou Redis indisponível)"""
+    global _cache
+    if _cache is None:
+        from core.config import get_settings
+
+        settings = get_settings()
+        if not settings.llm_cache_ativo:
+            return None
+        try:
+            from core.redis_config import redis_client
+            redis_client.ping()
+            _cache = LLMCache(
+                redis_client,
+                ttl_segundos=settings.llm_cache_ttl_s,
+                max_entradas=settings.llm_cache_max_entradas
+            )
+        except Exception as e:
+            logger.warning(f"[LLM_CACHE] Redis indisponível, cache desativado: {e}")
+            return None
+    return _cache
+
+
+def completar_com_cache(openai_client, modelo: str, mensagens: List[Dict[str, str]],
+                        temperatura: float, max_tokens: int, orcamento=None) -> str:
+    """
+    chat.completions.create com cache e deduplicação (sem Redis, chama direto)
+    orcamento: reservar() antes e reconciliar(tokens) depois de cada chamada
+    ao LLM (cache hit não consome; ver services.automation.carol_campaign)
+    """
+
+    def gerar() -> Tuple[str, int]:
+        if orcamento:
+            orcamento.reservar()
+        response = openai_client.chat.completions.create(
+            model=modelo,
+            messages=mensagens,
+            max_tokens=max_tokens,
+            temperature=temperatura
+        )
+        tokens = response.usage.total_tokens if getattr(response, 'usage', None) else 0
+        if orcamento:
+            orcamento.reconciliar(tokens)
+        return response.choices[0].message.content.strip(), tokens
+
+    cache = obter_llm_cache()
+    if cache is None:
+        return gerar()[0]
+
+    chave = hash_prompt(modelo, mensagens, temperatura, max_tokens)
+    try:
+        return cache.obter_ou_gerar(chave, gerar)
+    except RedisError as e:
+        logger.warning(f"[LLM_CACHE] Erro no Redis, chamando LLM direto: {e}")
+        return gerar()[0]
@@ -0,0 +1,212 @@
+"""
+Roteamento template x LLM das mensagens da Carol
+
+Cada mensagem recebe um score de 0 a 1 de quão bem um template a resolve
+(dados do lead completos, até 3 imóveis com os campos principais, nenhuma
+pergunta livre do cliente). Com score acima do limiar do cliente a mensagem
+sai do template, em microssegundos; abaixo dele, vai para o LLM.
+
+Política por cliente (hash carol:roteamento:politicas, JSON por cliente_id):
+- template_primeiro: template se score >= limiar_template, senão LLM (padrão)
+- sempre_llm: LLM sempre que disponível
+- sempre_template: nunca chama o LLM
+
+Contadores por cliente em carol:roteamento:contadores:{cliente_id}
+(campos "{tipo}:template" e "{tipo}:llm").
+"""
+
+import json
+import time
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, List, Optional
+
+from core.logger import logger
+
+MODOS = ('template_primeiro', 'sempre_llm', 'sempre_template')
+CHAVE_POLITICAS = "carol:roteamento:politicas"
+CLIENTE_PADRAO = "padrao"
+
+# Políticas lidas do Redis ficam em memória por este tempo
+TTL_POLITICA_S = 60
+
+CAMPOS_IMOVEL_TEMPLATE = ('titulo', 'bairro', 'quartos')
+CAMPOS_PRECO = ('preco', 'preco_venda', 'valor_total_mensal', 'valor_aluguel')
+
+
+@dataclass
+class PoliticaRoteamento:
+    modo: str = 'template_primeiro'
+    limiar_template: float = 0.7
+
+
+# PONTUAÇÃO
+
+def pontuar_novo_imovel(lead_data: Dict[str, Any], imoveis: List[Dict[str, Any]]) -> float:
+    """Mensagem de novos imóveis para um lead"""
+    score = 1.0
+
+    if not lead_data.get('nome'):
+        score -= 0.3
+    if lead_data.get('operacao_principal') not in ('venda', 'locacao'):
+        score -= 0.1
+    if len(imoveis) > 3:
+        score -= 0.2
+
+    for imovel in imoveis[:3]:
+        incompleto = any(not imovel.get(campo) for campo in CAMPOS_IMOVEL_TEMPLATE)
+        if incompleto or not any(imovel.get(campo) for campo in CAMPOS_PRECO):
+            score -= 0.15
+
+    # Texto livre do lead (observações, última mensagem) pede resposta personalizada
+    if lead_data.get('observacoes') or lead_data.get('ultima_mensagem'):
+        score -= 0.4
+
+    return max(0.0, round(score, 3))
+
+
+def pontuar_primeiro_contato(lead_data: Dict[str, Any], regiao: Optional[str]) -> float:
+    score = 1.0
+    if not lead_data.get('nome'):
+        score -= 0.4
+    if not regiao:
+        score -= 0.4
+    return max(0.0, score)
+
+
+def pontuar_apresentacao(imoveis: List[Dict[str, Any]]) -> float:
+    """Lista de imóveis com link de galeria"""
+    if not imoveis:
+        return 1.0
+    completos = sum(
+        1 for imovel in imoveis
+        if all(imovel.get(campo) for campo in ('titulo', 'endereco', 'quartos', 'preco'))
+    )
+    return round(completos / len(imoveis), 3)
+
+
+def pontuar_resposta_cliente(mensagem: str) -> float:
+    """Resposta curta e sem pergunta -> template; pergunta livre ou texto longo -> LLM"""
+    texto = (mensagem or '').strip()
+    palavras = len(texto.split())
+
+    score = 1.0
+    if '?' in texto:
+        score -= 0.5
+    if palavras > 12:
+        score -= 0.3
+    if palavras > 30:
+        score -= 0.3
+    return max(0.0, round(score, 3))
+
+
+# POLÍTICA E CONTADORES
+
+class RoteadorMensagens:
+    """Decide template x LLM por cliente e conta as decisões"""
+
+    def __init__(self, redis=None, politica_padrao: Optional[PoliticaRoteamento] = None):
+        self.redis = redis
+        self.politica_padrao = politica_padrao or PoliticaRoteamento()
+        self._politicas: Dict[str, tuple] = {}
+        self._contadores_locais: Dict[str, Dict[str, int]] = {}
+
+    def obter_politica(self, cliente_id: Optional[str]) -> PoliticaRoteamento:
+        cliente_id = cliente_id or CLIENTE_PADRAO
+        cache = self._politicas.get(cliente_id)
+        if cache and time.monotonic() - cache[1] < TTL_POLITICA_S:
+            return cache[0]
+
+        politica = self.politica_padrao
+        if self.redis is not None:
+            try:
+                bruto = self.redis.hget(CHAVE_POLITICAS, cliente_id) or self.redis.hget(CHAVE_POLITICAS, CLIENTE_PADRAO)
+                if bruto:
+                    politica = PoliticaRoteamento(**json.loads(bruto))
+            except Exception as e:
+                logger.warning(f"[ROTEAMENTO] Política de {cliente_id} indisponível, usando padrão: {e}")
+
+        self._politicas[cliente_id] = (politica, time.monotonic())
+        return politica
+
+    def definir_politica(self, cliente_id: str, modo: str, limiar_template: float = 0.7) -> PoliticaRoteamento:
+        if modo not in MODOS:
+            raise ValueError(f"Modo inválido '{modo}' (use {', '.join(MODOS)})")
+
+        politica = PoliticaRoteamento(modo=modo, limiar_template=limiar_template)
+        if self.redis is not None:
+            self.redis.hset(CHAVE_POLITICAS, cliente_id, json.dumps(asdict(politica)))
+        self._politicas[cliente_id] = (politica, time.monotonic())
+        return politica
+
+    def rotear(self, cliente_id: Optional[str], tipo: str, score: float, llm_disponivel: bool = True) -> str:
+        """'template' ou 'llm' para a mensagem"""
+        politica = self.obter_politica(cliente_id)
+
+        if not llm_disponivel or politica.modo == 'sempre_template':
+            rota = 'template'
+        elif politica.modo == 'sempre_llm':
+            rota = 'llm'
+        else:
+            rota = 'template' if score >= politica.limiar_template else 'llm'
+
+        self._contar(cliente_id or CLIENTE_PADRAO, f"{tipo}:{rota}")
+        return rota
+
+    def _contar(self, cliente_id: str, campo: str):
+        if self.redis is not None:
+            try:
+                self.redis.hincrby(f"carol:roteamento:contadores:{cliente_id}", campo, 1)
+                return
+            except Exception:
+                pass
+        contadores = self._contadores_locais.setdefault(cliente_id, {})
+        contadores[campo] = contadores.get(campo, 0) + 1
+
+    def estatisticas(self, cliente_id: str) -> Dict[str, Any]:
+        contadores = dict(self._contadores_locais.get(cliente_id, {}))
+        if self.redis is not None:
+            try:
+                for campo, valor in (self.redis.hgetall(f"carol:roteamento:contadores:{cliente_id}") or {}).items():
+                    contadores[campo] = contadores.get(campo, 0) + int(valor)
+            except Exception as e:
+                logger.warning(f"[ROTEAMENTO] Contadores de {cliente_id} indisponíveis: {e}")
+
+        total_template = sum(v for campo, v in contadores.items() if campo.endswith(':template'))
+        total_llm = sum(v for campo, v in contadores.items() if campo.endswith(':llm'))
+        total = total_template + total_llm
+        return {
+            'cliente_id': cliente_id,
+            'politica': asdict(self.obter_politica(cliente_id)),
+            'template': total_template,
+            'llm': total_llm,
+            'taxa_template': round(total_template / total, 4) if total else 0.0,
+            'por_tipo': contadores
+        }
+
+
+_roteador: Optional[RoteadorMensagens] = None
+
+
+def obter_roteador() -> RoteadorMensagens:
+    """Roteador do processo (contadores só em memória se o Redis não responder)"""
+    global _roteador
+    if _roteador is None:
+        from core.config import get_settings
+
+        settings = get_settings()
+        padrao = PoliticaRoteamento(
+            modo=settings.carol_roteamento_modo,
+            limiar_template=settings.carol_roteamento_limiar
+        )
+        try:
+            from core.redis_config import redis_client
+            redis_client.ping()
+            _roteador = RoteadorMensagens(redis_client, padrao)
+        except Exception as e:
+            logger.warning(f"[ROTEAMENTO] Redis indisponível, política padrão e contadores locais: {e}")
+            _roteador = RoteadorMensagens(None, padrao)
+    return _roteador
+
+
+def rotear_mensagem(cliente_id: Optional[str], tipo: str, score: float, llm_disponivel: bool = True) -> str:
+    return obter_roteador().rotear(cliente_id, tipo, score, llm_disponivel)
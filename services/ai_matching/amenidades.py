@@ -0,0 +1,107 @@
+"""
+Amenidades como bitset (um bit por item do vocabulário)
+
+Extraídas uma vez do texto do imóvel na importação (Imovel.amenidades) e das
+preferências do lead (Lead.amenidades_desejadas). No matching o score de
+texto vira AND + popcount entre dois inteiros.
+
+O texto é normalizado antes (minúsculas, sem acentos e sem pontuação), então
+"Piscina," e "área gourmet" casam com os termos do vocabulário.
+"""
+
+import re
+import unicodedata
+from typing import Iterable, Optional, Tuple
+
+# Posição = bit. Só acrescentar no final: mudar a ordem invalida os bits já gravados
+VOCABULARIO_AMENIDADES: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ('piscina', ('piscina', 'piscinas')),
+    ('churrasqueira', ('churrasqueira', 'churrasqueiras', 'churrasco')),
+    ('varanda', ('varanda', 'varandas', 'varanda gourmet')),
+    ('sacada', ('sacada', 'sacadas')),
+    ('jardim', ('jardim', 'jardins')),
+    ('garagem', ('garagem', 'garagens')),
+    ('elevador', ('elevador', 'elevadores')),
+    ('portaria', ('portaria', 'porteiro', 'portaria 24h', 'portaria 24 horas')),
+    ('academia', ('academia', 'fitness')),
+    ('playground', ('playground', 'brinquedoteca')),
+    ('novo', ('novo', 'lancamento')),
+    ('reformado', ('reformado', 'reformada')),
+    ('mobiliado', ('mobiliado', 'mobiliada', 'mobilia')),
+    ('vista', ('vista', 'vista mar', 'vista panoramica')),
+    ('sol', ('sol', 'sol da manha', 'ensolarado', 'ensolarada')),
+    ('area_gourmet', ('area gourmet', 'espaco gourmet')),
+    ('salao_festas', ('salao de festas', 'salao de festa')),
+    ('quadra', ('quadra', 'quadra poliesportiva', 'quadra de tenis')),
+    ('sauna', ('sauna',)),
+    ('ar_condicionado', ('ar condicionado', 'ar condicionados')),
+    ('armarios', ('armarios', 'armarios planejados', 'planejados')),
+    ('closet', ('closet',)),
+    ('escritorio', ('escritorio', 'home office')),
+    ('quintal', ('quintal',)),
+    ('pet', ('pet', 'pets', 'aceita pet', 'aceita pets', 'pet place')),
+)
+
+# BigInteger com sinal: no máximo 63 bits
+assert len(VOCABULARIO_AMENIDADES) <= 63, "Vocabulário de amenidades excede 63 bits"
+
+_NAO_ALFANUMERICO = re.compile(r'[^a-z0-9]+')
+
+
+def normalizar_texto(texto: str) -> str:
+    """Minúsculas, sem acentos, pontuação trocada por espaço"""
+    sem_acentos = unicodedata.normalize('NFKD', texto.lower()).encode('ascii', 'ignore').decode('ascii')
+    return _NAO_ALFANUMERICO.sub(' ', sem_acentos).strip()
+
+
+def _compilar_vocabulario():
+    palavras = {}
+    expressoes = []
+    for bit, (_, termos) in enumerate(VOCABULARIO_AMENIDADES):
+        for termo in termos:
+            termo = normalizar_texto(termo)
+            if ' ' in termo:
+                expressoes.append((f" {termo} ", 1 << bit))
+            else:
+                palavras[termo] = palavras.get(termo, 0) | (1 << bit)
+    return palavras, expressoes
+
+
+_PALAVRAS, _EXPRESSOES = _compilar_vocabulario()
+
+
+def extrair_amenidades(*textos: Optional[str]) -> int:
+    """Bitset das amenidades citadas nos textos (None e vazios são ignorados)"""
+    bits = 0
+    for texto in textos:
+        if not texto:
+            continue
+        normalizado = normalizar_texto(texto)
+        for palavra in set(normalizado.split()):
+            bits |= _PALAVRAS.get(palavra, 0)
+        if _EXPRESSOES:
+            com_bordas = f" {normalizado} "
+            for expressao, bit in _EXPRESSOES:
+                if expressao in com_bordas:
+                    bits |= bit
+    return bits
+
+
+def amenidades_lead(observacoes: Optional[str], caracteristicas_desejadas: Optional[Iterable[str]]) -> int:
+    """Bitset das preferências do lead (observações + características desejadas)"""
+    return extrair_amenidades(observacoes, *[str(c) for c in caracteristicas_desejadas or []])
+
+
+def nomes_amenidades(bits: int) -> list:
+    return [nome for bit, (nome, _) in enumerate(VOCABULARIO_AMENIDADES) if bits >> bit & 1]
+
+
+def score_amenidades(desejadas: int, imovel: int) -> float:
+    """
+    Fração das amenidades desejadas que o imóvel tem (0.3 a 1.0)
+    Neutro (0.5) quando um dos lados não cita nenhuma
+    """
+    if not desejadas or not imovel:
+        return 0.5
+    return 0.3 + ((desejadas & imovel).bit_count() / desejadas.bit_count()) * 0.7
+
@@ -0,0 +1,170 @@
+"""
+Embeddings de texto para o matching semântico (offline, só CPU)
+
+Padrão: TF-IDF com hashing. Unigramas e bigramas do texto normalizado
+(mesma normalização das amenidades) são espalhados em embeddings_dimensao
+posições com sinal, com tf sublinear. O IDF vem do portfólio de cada
+cliente e é aplicado no índice (services.ai_matching.indice_semantico); o
+vetor gravado é só o TF normalizado.
+
+Com embeddings_modelo configurado e sentence-transformers instalado, usa o
+modelo local (vetores já normalizados, sem IDF).
+
+Armazenamento compacto em float16: bytes em Imovel.embedding e base64 em
+Lead.perfil_embedding, junto com o nome do modelo e o hash do texto de origem
+(recalculado quando observações/características mudam).
+"""
+
+import base64
+import hashlib
+import math
+import threading
+import zlib
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from core.config import get_settings
+from core.logger import logger
+from services.ai_matching.amenidades import normalizar_texto
+
+STOPWORDS = {
+    'a', 'ao', 'aos', 'as', 'com', 'da', 'das', 'de', 'do', 'dos', 'e', 'em',
+    'esta', 'estou', 'eu', 'isso', 'mais', 'me', 'meu', 'minha', 'muito', 'na',
+    'nas', 'no', 'nos', 'o', 'os', 'ou', 'para', 'pela', 'pelo', 'por', 'que',
+    'quero', 'se', 'sem', 'seu', 'sua', 'tem', 'um', 'uma'
+}
+
+
+def _normalizar_linhas(matriz: np.ndarray) -> np.ndarray:
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return matriz / normas
+
+
+class EmbeddingsHashTfidf:
+    """TF com hashing (o IDF é do índice de cada cliente)"""
+
+    usa_idf = True
+
+    def __init__(self, dimensao: int = 256):
+        self.dimensao = dimensao
+        self.nome = f"hash-tfidf-{dimensao}"
+
+    def _termos(self, texto: str) -> List[str]:
+        palavras = [p for p in normalizar_texto(texto).split() if len(p) > 1 and p not in STOPWORDS]
+        return palavras + [f"{a} {b}" for a, b in zip(palavras, palavras[1:])]
+
+    def codificar(self, textos: List[str]) -> np.ndarray:
+        matriz = np.zeros((len(textos), self.dimensao), dtype=np.float32)
+        for linha, texto in enumerate(textos):
+            for termo, tf in Counter(self._termos(texto or '')).items():
+                # crc32 é estável entre processos (hash() não é)
+                h = zlib.crc32(termo.encode('utf-8'))
+                matriz[linha, h % self.dimensao] += (1.0 if h & 0x80000000 else -1.0) * (1.0 + math.log(tf))
+        return _normalizar_linhas(matriz)
+
+
+class EmbeddingsSentenceTransformers:
+    """Modelo sentence-transformers local em CPU"""
+
+    usa_idf = False
+
+    def __init__(self, nome_modelo: str):
+        from sentence_transformers import SentenceTransformer
+        self.modelo = SentenceTransformer(nome_modelo, device='cpu')
+        self.nome = nome_modelo
+        self.dimensao = self.modelo.get_sentence_embedding_dimension()
+
+    def codificar(self, textos: List[str]) -> np.ndarray:
+        vetores = self.modelo.encode(
+            [texto or '' for texto in textos],
+            normalize_embeddings=True,
+            convert_to_numpy=True
+        )
+        return np.asarray(vetores, dtype=np.float32)
+
+
+_modelo = None
+_modelo_lock = threading.Lock()
+
+
+def obter_modelo_embeddings():
+    """Modelo configurado (carregado uma vez por processo)"""
+    global _modelo
+    with _modelo_lock:
+        if _modelo is None:
+            settings = get_settings()
+            if settings.embeddings_modelo:
+                try:
+                    _modelo = EmbeddingsSentenceTransformers(settings.embeddings_modelo)
+                except Exception as e:
+                    logger.warning(f"[EMBEDDINGS] Modelo {settings.embeddings_modelo} indisponível, usando TF-IDF com hashing: {e}")
+            if _modelo is None:
+                _modelo = EmbeddingsHashTfidf(settings.embeddings_dimensao)
+            logger.info(f"[EMBEDDINGS] Modelo: {_modelo.nome} ({_modelo.dimensao} dimensões)")
+        return _modelo
+
+
+# TEXTOS DE ORIGEM
+
+def texto_imovel(titulo: Optional[str], descricao: Optional[str]) -> str:
+    return ' '.join(parte for parte in (titulo, descricao) if parte)
+
+
+def texto_lead(observacoes: Optional[str], caracteristicas_desejadas: Optional[Iterable[Any]]) -> str:
+    partes = [str(c) for c in caracteristicas_desejadas or []]
+    if observacoes:
+        partes.append(observacoes)
+    return ' '.join(partes)
+
+
+# SERIALIZAÇÃO (float16)
+
+def vetor_para_bytes(vetor: np.ndarray) -> bytes:
+    return np.asarray(vetor, dtype=np.float16).tobytes()
+
+
+def bytes_para_vetor(dados: Optional[bytes], dimensao: int) -> Optional[np.ndarray]:
+    """None se vazio ou gravado com outra dimensão (outro modelo)"""
+    if not dados or len(dados) != dimensao * 2:
+        return None
+    return np.frombuffer(dados, dtype=np.float16).astype(np.float32)
+
+
+def embeddings_imoveis(registros: List[Dict[str, Any]]) -> List[bytes]:
+    """Vetores (bytes float16) de registros com titulo/descricao, em lote"""
+    modelo = obter_modelo_embeddings()
+    vetores = modelo.codificar([texto_imovel(r.get('titulo'), r.get('descricao')) for r in registros])
+    return [vetor_para_bytes(vetor) for vetor in vetores]
+
+
+def embedding_lead(lead, atualizar: bool = True) -> Optional[np.ndarray]:
+    """
+    Vetor do perfil do lead (observações + características desejadas)
+    Reaproveita lead.perfil_embedding se modelo e texto não mudaram; senão
+    recalcula e, com atualizar=True, grava no lead (commit fica com a sessão)
+    """
+    texto = texto_lead(lead.observacoes, lead.caracteristicas_desejadas)
+    if not texto.strip():
+        return None
+
+    modelo = obter_modelo_embeddings()
+    hash_texto = hashlib.sha1(texto.encode('utf-8')).hexdigest()[:16]
+
+    salvo = lead.perfil_embedding if isinstance(lead.perfil_embedding, dict) else None
+    if salvo and salvo.get('modelo') == modelo.nome and salvo.get('hash') == hash_texto:
+        vetor = bytes_para_vetor(base64.b64decode(salvo.get('vetor', '')), modelo.dimensao)
+        if vetor is not None:
+            return vetor
+
+    vetor = modelo.codificar([texto])[0]
+    if atualizar:
+        lead.perfil_embedding = {
+            'modelo': modelo.nome,
+            'dimensao': modelo.dimensao,
+            'hash': hash_texto,
+            'vetor': base64.b64encode(vetor_para_bytes(vetor)).decode('ascii')
+        }
+    return vetor
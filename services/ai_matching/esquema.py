@@ -0,0 +1,36 @@
+"""
+Colunas do matching acrescentadas a tabelas já existentes
+
+Sem migrations, create_all não altera tabelas criadas antes das colunas;
+garantir_colunas_matching acrescenta as que faltam (uma vez por engine).
+"""
+
+from sqlalchemy import BigInteger, LargeBinary, inspect, text
+
+from core.logger import logger
+
+# (tabela, coluna, tipo) - mesmos tipos declarados nos modelos
+COLUNAS_MATCHING = (
+    ('imoveis', 'amenidades', BigInteger()),
+    ('imoveis', 'embedding', LargeBinary()),
+    ('leads', 'amenidades_desejadas', BigInteger()),
+)
+
+_engines_verificadas = set()
+
+
+def garantir_colunas_matching(bind):
+    """Acrescentar as colunas de COLUNAS_MATCHING que faltarem"""
+    engine = getattr(bind, 'engine', bind)
+    if id(engine) in _engines_verificadas:
+        return
+
+    inspetor = inspect(engine)
+    with engine.begin() as conn:
+        for tabela, coluna, tipo in COLUNAS_MATCHING:
+            if not inspetor.has_table(tabela):
+                continue
+            if coluna not in {c['name'] for c in inspetor.get_columns(tabela)}:
+                conn.execute(text(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo.compile(dialect=engine.dialect)}"))
+                logger.info(f"Coluna {tabela}.{coluna} criada")
+    _engines_verificadas.add(id(engine))
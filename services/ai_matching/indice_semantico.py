@@ -0,0 +1,345 @@
+"""
+Índice semântico dos imóveis (busca aproximada por vizinhos mais próximos)
+
+IVF: k-means esférico separa os vetores em ~sqrt(n) listas; a consulta
+compara com os centróides e varre só as n_sondas listas mais próximas.
+Abaixo de MIN_VETORES_IVF fica uma lista só (varredura exata, ~1 ms para
+20 mil imóveis). Vetores ficam quantizados em int8 com uma escala por
+vetor (1 byte por dimensão em memória).
+
+Um índice por cliente e por processo, carregado de Imovel.embedding e
+mantido incrementalmente por data_atualizacao como o índice espacial. O
+delta relê MARGEM_WATERMARK antes do watermark: data_atualizacao é o início
+da transação (now() no Postgres) e as partes de uma importação commitam
+fora de ordem.
+Com TF-IDF com hashing, o IDF é calculado sobre o portfólio do cliente na
+carga completa; muitas alterações desde a carga forçam uma nova.
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.logger import logger
+from services.ai_matching.embeddings import obter_modelo_embeddings, bytes_para_vetor
+from services.matching.spatial_index import INTERVALO_SINCRONIZACAO, MARGEM_WATERMARK, podar_recentes
+
+# Abaixo disso a varredura exata das listas int8 já custa poucos ms
+MIN_VETORES_IVF = 50000
+
+# Listas sondadas por consulta (limitado ao total de listas)
+N_SONDAS_PADRAO = 32
+
+# Fração de vetores alterados desde a carga que força recarga (IDF e centróides)
+FRACAO_RECONSTRUCAO = 0.2
+
+# Pontos usados para treinar os centróides
+MAX_AMOSTRA_KMEANS = 20000
+
+# Linhas int8 convertidas para float32 por vez na busca
+TAMANHO_BLOCO = 4096
+
+
+def _normalizar(matriz: np.ndarray) -> np.ndarray:
+    normas = np.linalg.norm(matriz, axis=-1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return matriz / normas
+
+
+def calcular_idf(matriz: np.ndarray) -> np.ndarray:
+    """IDF suavizado por dimensão (documentos com a posição preenchida)"""
+    frequencia = np.count_nonzero(matriz, axis=0)
+    return (np.log((1 + len(matriz)) / (1 + frequencia)) + 1).astype(np.float32)
+
+
+def _quantizar(matriz: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    escalas = np.abs(matriz).max(axis=1) / 127.0
+    escalas[escalas == 0] = 1.0
+    codigos = np.round(matriz / escalas[:, None]).astype(np.int8)
+    return codigos, escalas.astype(np.float32)
+
+
+def _produto_int8(codigos: np.ndarray, escalas: np.ndarray, consulta: np.ndarray) -> np.ndarray:
+    """Cosseno de vetores int8 com a consulta, convertendo em blocos (cabe no cache)"""
+    resultado = np.empty(len(codigos), dtype=np.float32)
+    bloco = np.empty((min(len(codigos), TAMANHO_BLOCO), codigos.shape[1]), dtype=np.float32)
+    for inicio in range(0, len(codigos), TAMANHO_BLOCO):
+        parte = codigos[inicio:inicio + TAMANHO_BLOCO]
+        bloco[:len(parte)] = parte
+        resultado[inicio:inicio + len(parte)] = bloco[:len(parte)] @ consulta
+    return resultado * escalas
+
+
+class IndiceIVF:
+    """Listas invertidas sobre centróides k-means, vetores int8"""
+
+    def __init__(self, dimensao: int):
+        self.dimensao = dimensao
+        self.centroides = np.zeros((0, dimensao), dtype=np.float32)
+        self._ids: List[List[str]] = []
+        self._codigos: List[np.ndarray] = []
+        self._escalas: List[np.ndarray] = []
+        self._pendentes: Dict[int, Dict[str, np.ndarray]] = {}
+        self._lista_do_id: Dict[str, int] = {}
+        self._sujas: set = set()  # Listas com entradas removidas/substituídas
+
+    def __len__(self) -> int:
+        return len(self._lista_do_id)
+
+    def __contains__(self, chave: str) -> bool:
+        return chave in self._lista_do_id
+
+    def construir(self, ids: List[str], matriz: np.ndarray, n_listas: Optional[int] = None, iteracoes: int = 10):
+        """Treinar centróides e distribuir os vetores (matriz já normalizada)"""
+        n = len(ids)
+        if n_listas is None:
+            n_listas = max(1, int(round(np.sqrt(n)))) if n >= MIN_VETORES_IVF else 1
+        n_listas = min(n_listas, max(n, 1))
+        rng = np.random.default_rng(0)
+
+        if n:
+            amostra = matriz[rng.choice(n, size=min(n, MAX_AMOSTRA_KMEANS), replace=False)]
+            centroides = amostra[rng.choice(len(amostra), size=n_listas, replace=False)].copy()
+            for _ in range(iteracoes):
+                atribuicao = np.argmax(amostra @ centroides.T, axis=1)
+                for lista in range(n_listas):
+                    membros = amostra[atribuicao == lista]
+                    # Lista vazia: recomeça de um ponto aleatório
+                    centroides[lista] = membros.sum(axis=0) if len(membros) else amostra[rng.integers(len(amostra))]
+                centroides = _normalizar(centroides)
+            self.centroides = centroides.astype(np.float32)
+        else:
+            self.centroides = np.zeros((0, self.dimensao), dtype=np.float32)
+
+        self._ids = [[] for _ in range(len(self.centroides))]
+        self._codigos = [np.zeros((0, self.dimensao), dtype=np.int8) for _ in self._ids]
+        self._escalas = [np.zeros(0, dtype=np.float32) for _ in self._ids]
+        self._pendentes = {}
+        self._lista_do_id = {}
+        self._sujas = set()
+
+        if n:
+            atribuicao = self._atribuir(matriz)
+            codigos, escalas = _quantizar(matriz)
+            for lista in range(len(self.centroides)):
+                posicoes = np.nonzero(atribuicao == lista)[0]
+                self._ids[lista] = [ids[p] for p in posicoes]
+                self._codigos[lista] = codigos[posicoes]
+                self._escalas[lista] = escalas[posicoes]
+            self._lista_do_id = {chave: int(lista) for chave, lista in zip(ids, atribuicao)}
+
+    def _atribuir(self, matriz: np.ndarray) -> np.ndarray:
+        atribuicao = np.empty(len(matriz), dtype=np.int64)
+        for inicio in range(0, len(matriz), 10000):
+            bloco = matriz[inicio:inicio + 10000]
+            atribuicao[inicio:inicio + len(bloco)] = np.argmax(bloco @ self.centroides.T, axis=1)
+        return atribuicao
+
+    def adicionar(self, chave: str, vetor: np.ndarray):
+        """Inserir ou substituir um vetor (normalizado)"""
+        if not len(self.centroides):
+            self.construir([chave], vetor[None, :])
+            return
+        self.remover(chave)
+        lista = int(np.argmax(self.centroides @ vetor))
+        self._pendentes.setdefault(lista, {})[chave] = vetor
+        self._lista_do_id[chave] = lista
+
+    def remover(self, chave: str) -> bool:
+        lista = self._lista_do_id.pop(chave, None)
+        if lista is None:
+            return False
+        self._sujas.add(lista)
+        return True
+
+    def _consolidar(self, lista: int):
+        """Incorporar pendentes e descartar entradas que não são mais desta lista"""
+        pendentes = {
+            chave: vetor for chave, vetor in self._pendentes.pop(lista, {}).items()
+            if self._lista_do_id.get(chave) == lista
+        }
+        ids = self._ids[lista]
+        manter = [
+            i for i, chave in enumerate(ids)
+            if self._lista_do_id.get(chave) == lista and chave not in pendentes
+        ]
+
+        novos_ids = [ids[i] for i in manter]
+        codigos = self._codigos[lista][manter]
+        escalas = self._escalas[lista][manter]
+        if pendentes:
+            codigos_novos, escalas_novas = _quantizar(np.stack(list(pendentes.values())))
+            novos_ids.extend(pendentes)
+            codigos = np.concatenate([codigos, codigos_novos])
+            escalas = np.concatenate([escalas, escalas_novas])
+
+        self._ids[lista] = novos_ids
+        self._codigos[lista] = codigos
+        self._escalas[lista] = escalas
+        self._sujas.discard(lista)
+
+    def buscar(self, consulta: np.ndarray, k: int, n_sondas: int = N_SONDAS_PADRAO) -> List[Tuple[str, float]]:
+        """(chave, similaridade cosseno) dos k mais próximos, do maior para o menor"""
+        if not len(self.centroides) or k <= 0:
+            return []
+
+        n_sondas = min(n_sondas, len(self.centroides))
+        proximidade = self.centroides @ consulta
+        sondas = np.argpartition(-proximidade, n_sondas - 1)[:n_sondas]
+
+        ids: List[str] = []
+        similaridades = []
+        for lista in sondas.tolist():
+            if lista in self._pendentes or lista in self._sujas:
+                self._consolidar(lista)
+            if not self._ids[lista]:
+                continue
+            ids.extend(self._ids[lista])
+            similaridades.append(_produto_int8(self._codigos[lista], self._escalas[lista], consulta))
+
+        if not ids:
+            return []
+        similaridades = np.concatenate(similaridades)
+
+        k = min(k, len(ids))
+        melhores = np.argpartition(-similaridades, k - 1)[:k]
+        melhores = melhores[np.argsort(-similaridades[melhores])]
+        return [(ids[i], float(similaridades[i])) for i in melhores.tolist()]
+
+
+class IndiceSemanticoImoveis:
+    """
+    Índice IVF dos imóveis ativos (Imovel) de um cliente
+
+    Carrega só (id, embedding) do banco; depois da carga completa aplica os
+    imóveis alterados desde o último watermark.
+    """
+
+    def __init__(self, cliente_id: str):
+        self.cliente_id = cliente_id
+        self.modelo = obter_modelo_embeddings()
+        self.indice = IndiceIVF(self.modelo.dimensao)
+        self.idf: Optional[np.ndarray] = None
+        self.watermark: Optional[datetime] = None
+        self.ultima_sincronizacao: float = 0.0
+        self.alteracoes_desde_carga = 0
+        self.desatualizado = True
+        self._recentes: Dict[str, datetime] = {}  # id -> data_atualizacao aplicada, dentro da margem
+        self._lock = threading.RLock()
+
+    def marcar_desatualizado(self):
+        """Forçar sincronização na próxima busca (chamado pelo importador)"""
+        self.desatualizado = True
+
+    def _precisa_sincronizar(self) -> bool:
+        if self.desatualizado:
+            return True
+        return time.time() - self.ultima_sincronizacao > INTERVALO_SINCRONIZACAO
+
+    def _ponderar(self, matriz: np.ndarray) -> np.ndarray:
+        if self.idf is not None:
+            matriz = matriz * self.idf
+        return _normalizar(matriz).astype(np.float32)
+
+    def sincronizar(self, db=None) -> int:
+        """Carga completa na primeira vez (ou após muitas alterações); depois só o delta"""
+        from models.imovel import Imovel
+
+        with self._lock:
+            if db is None:
+                from core.database import get_db_session
+                with get_db_session() as sessao:
+                    return self._sincronizar(sessao, Imovel)
+            return self._sincronizar(db, Imovel)
+
+    def _sincronizar(self, db, Imovel) -> int:
+        if self.alteracoes_desde_carga > FRACAO_RECONSTRUCAO * max(len(self.indice), 1):
+            self.watermark = None
+        carga_completa = self.watermark is None
+
+        query = db.query(Imovel.id, Imovel.embedding, Imovel.status, Imovel.data_atualizacao).filter(
+            Imovel.cliente_id == self.cliente_id
+        )
+        if carga_completa:
+            query = query.filter(Imovel.status == 'ativo', Imovel.embedding.isnot(None))
+            recentes: Dict[str, datetime] = {}
+        else:
+            query = query.filter(Imovel.data_atualizacao >= self.watermark - MARGEM_WATERMARK)
+            recentes = self._recentes
+
+        linhas = 0
+        ids, vetores = [], []
+        watermark = self.watermark
+        for imovel_id, dados, status, data_atualizacao in query:
+            linhas += 1
+            chave = str(imovel_id)
+            if data_atualizacao is not None:
+                # Já aplicado numa sincronização anterior (releitura da margem)
+                if recentes.get(chave) == data_atualizacao:
+                    continue
+                recentes[chave] = data_atualizacao
+            vetor = bytes_para_vetor(dados, self.modelo.dimensao) if status == 'ativo' else None
+            if carga_completa:
+                if vetor is not None:
+                    ids.append(chave)
+                    vetores.append(vetor)
+            elif vetor is not None:
+                self.indice.adicionar(chave, self._ponderar(vetor[None, :])[0])
+                self.alteracoes_desde_carga += 1
+            elif self.indice.remover(chave):
+                self.alteracoes_desde_carga += 1
+
+            if data_atualizacao and (watermark is None or data_atualizacao > watermark):
+                watermark = data_atualizacao
+
+        if carga_completa:
+            matriz = np.stack(vetores) if vetores else np.zeros((0, self.modelo.dimensao), dtype=np.float32)
+            if self.modelo.usa_idf and len(matriz):
+                self.idf = calcular_idf(matriz)
+            self.indice.construir(ids, self._ponderar(matriz))
+            self.alteracoes_desde_carga = 0
+
+        self.watermark = watermark or datetime.utcnow()
+        self._recentes = podar_recentes(recentes, self.watermark)
+        self.ultima_sincronizacao = time.time()
+        self.desatualizado = False
+
+        logger.debug(
+            f"[SEMANTIC_INDEX] {self.cliente_id}: {'carga completa' if carga_completa else 'delta'} "
+            f"({linhas} linhas, {len(self.indice)} imóveis no índice)"
+        )
+        return linhas
+
+    def buscar(self, vetor: np.ndarray, k: int, n_sondas: int = N_SONDAS_PADRAO, db=None) -> List[Tuple[str, float]]:
+        """(imovel_id, similaridade) dos k imóveis mais próximos do vetor"""
+        if self._precisa_sincronizar():
+            self.sincronizar(db)
+
+        with self._lock:
+            return self.indice.buscar(self._ponderar(vetor[None, :])[0], k, n_sondas)
+
+
+# REGISTRO DE ÍNDICES POR CLIENTE (um por processo)
+
+_indices_semanticos: Dict[str, IndiceSemanticoImoveis] = {}
+_indices_lock = threading.Lock()
+
+
+def obter_indice_semantico(cliente_id: str) -> IndiceSemanticoImoveis:
+    """Obter (ou criar) o índice semântico de imóveis do cliente"""
+    with _indices_lock:
+        indice = _indices_semanticos.get(cliente_id)
+        if indice is None:
+            indice = IndiceSemanticoImoveis(cliente_id)
+            _indices_semanticos[cliente_id] = indice
+        return indice
+
+
+def marcar_indice_semantico_desatualizado(cliente_id: str):
+    """Avisar que os imóveis do cliente mudaram (importação XML)"""
+    indice = _indices_semanticos.get(cliente_id)
+    if indice is not None:
+        indice.marcar_desatualizado()
@@ -1,18 +1,65 @@
 """
-Engine de Matching Inteligente (versão simplificada sem FAISS)
+Engine de Matching Inteligente
+
+Score semântico: amenidades (bitset) + similaridade do perfil do lead com o
+texto dos imóveis, buscada no índice IVF local do cliente (sem FAISS).
 """
 
+import heapq
 import numpy as np
-from typing import List, Dict, Any, Tuple, Optional
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Tuple, Optional, Set
 from datetime import datetime
 from core.logger import logger
-from core.database import get_db_session
+from core.database import get_db_session, engine
+from sqlalchemy.orm import defer
 from models.lead import Lead, Matching
 from models.imovel import Imovel
+from services.ai_matching.amenidades import (
+    amenidades_lead,
+    extrair_amenidades,
+    score_amenidades
+)
+from services.ai_matching.embeddings import embedding_lead
+from services.ai_matching.esquema import garantir_colunas_matching
+from services.ai_matching.indice_semantico import obter_indice_semantico
+from services.matching.persistencia import salvar_matchings
 import uuid
 import json
 
 
+# Score mínimo para um imóvel entrar nos matches
+SCORE_MINIMO = 0.3
+
+# Candidatos semânticos por busca (fora deles a similaridade conta como 0)
+MIN_CANDIDATOS_SEMANTICOS = 200
+
+
+@dataclass
+class PerfilLead:
+    """Preferências do lead já normalizadas, calculadas uma vez por busca"""
+    cidades: Set[str]
+    bairros: Set[str]
+    tipo_imovel: Optional[str]
+    categoria: Optional[str]
+    amenidades: int
+    similaridades: Dict[str, float] = field(default_factory=dict)  # imovel_id -> cosseno (índice semântico)
+
+    @classmethod
+    def from_lead(cls, lead: Lead) -> 'PerfilLead':
+        return cls(
+            cidades={c.lower() for c in lead.cidades_interesse or []},
+            bairros={b.lower() for b in lead.bairros_interesse or []},
+            tipo_imovel=lead.tipo_imovel.lower() if lead.tipo_imovel else None,
+            categoria=lead.categoria.lower() if lead.categoria else None,
+            amenidades=(
+                lead.amenidades_desejadas
+                if lead.amenidades_desejadas is not None
+                else amenidades_lead(lead.observacoes, lead.caracteristicas_desejadas)
+            )
+        )
+
+
 class MatchingEngine:
     """Engine principal de matching inteligente"""
     
@@ -30,6 +77,7 @@ class MatchingEngine:
         """
         try:
             logger.info(f"[MATCHING] Iniciando busca de matches para lead: {lead_id}")
+            garantir_colunas_matching(engine)
             
             with get_db_session() as db:
                 # Buscar lead
@@ -37,8 +85,8 @@ class MatchingEngine:
                 if not lead:
                     raise ValueError(f"Lead {lead_id} não encontrado")
                 
-                # Buscar imóveis ativos do mesmo cliente
-                imoveis = db.query(Imovel).filter(
+                # Buscar imóveis ativos do mesmo cliente (o vetor fica no índice semântico)
+                imoveis = db.query(Imovel).options(defer(Imovel.embedding)).filter(
                     Imovel.cliente_id == lead.cliente_id,
                     Imovel.status == 'ativo'
                 ).all()
@@ -47,22 +95,10 @@ class MatchingEngine:
                     logger.warning(f"[MATCHING] Nenhum imóvel ativo encontrado para cliente {lead.cliente_id}")
                     return []
                 
-                # Calcular scores para cada imóvel
-                matches = []
-                for imovel in imoveis:
-                    score_data = self._calculate_match_score(lead, imovel)
-                    if score_data['score_geral'] > 0.3:  # Threshold mínimo
-                        matches.append({
-                            'imovel': imovel,
-                            'scores': score_data,
-                            'lead_id': lead_id
-                        })
-                
-                # Ordenar por score geral
-                matches.sort(key=lambda x: x['scores']['score_geral'], reverse=True)
-                
-                # Limitar resultados
-                matches = matches[:limit]
+                similaridades = self._buscar_similaridades(lead, max(limit * 20, MIN_CANDIDATOS_SEMANTICOS), db)
+                matches = self._select_top_matches(lead, imoveis, limit, similaridades)
+                for match in matches:
+                    match['lead_id'] = lead_id
                 
                 # Salvar matches no banco
                 self._save_matches(matches, db)
@@ -74,6 +110,111 @@ class MatchingEngine:
             logger.error(f"[MATCHING] Erro ao buscar matches: {e}")
             return []
     
+    def buscar_imoveis_semelhantes(self, lead_id: str, k: int = 20) -> List[Dict[str, Any]]:
+        """
+        Imóveis cujo texto mais se parece com o perfil do lead (índice semântico)
+        """
+        with get_db_session() as db:
+            lead = db.query(Lead).filter(Lead.id == lead_id).first()
+            if not lead:
+                raise ValueError(f"Lead {lead_id} não encontrado")
+            
+            similaridades = self._buscar_similaridades(lead, k, db)
+        
+        return [
+            {'imovel_id': imovel_id, 'similaridade': round(similaridade, 4)}
+            for imovel_id, similaridade in sorted(similaridades.items(), key=lambda x: x[1], reverse=True)
+        ]
+    
+    def _buscar_similaridades(self, lead: Lead, k: int, db) -> Dict[str, float]:
+        """imovel_id -> similaridade (0 a 1) dos k candidatos semânticos do lead"""
+        try:
+            vetor = embedding_lead(lead)  # Grava perfil_embedding se o texto mudou
+            if vetor is None:
+                return {}
+            
+            indice = obter_indice_semantico(lead.cliente_id)
+            return {
+                imovel_id: max(similaridade, 0.0)
+                for imovel_id, similaridade in indice.buscar(vetor, k, db=db)
+            }
+            
+        except Exception as e:
+            logger.warning(f"[MATCHING] Busca semântica indisponível: {e}")
+            return {}
+    
+    def _select_top_matches(
+        self,
+        lead: Lead,
+        imoveis: List[Imovel],
+        limit: int,
+        similaridades: Optional[Dict[str, float]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Top-K em duas fases: scores numéricos + limite superior do score de IA
+        descartam o imóvel antes do score de amenidades quando ele não pode
+        entrar no heap; motivos e pontos de atenção só para os K finais.
+        Mesma ordem de sort estável por score_geral (empate: ordem da consulta).
+        """
+        if limit <= 0:
+            return []
+        
+        perfil = PerfilLead.from_lead(lead)
+        perfil.similaridades = similaridades or {}
+        # Sem amenidades desejadas o score de amenidades é sempre o neutro (0.5)
+        ia_maximo = 1.0 if perfil.amenidades else 0.5
+        if perfil.similaridades:
+            ia_maximo = 0.5 * ia_maximo + 0.5 * max(perfil.similaridades.values())
+
+        heap = []  # (score_geral, -posicao, parciais) - menor no topo
+        for posicao, imovel in enumerate(imoveis):
+            score_preco = self._calculate_price_score(lead, imovel)
+            score_localizacao = self._calculate_location_score(lead, imovel, perfil)
+            score_caracteristicas = self._calculate_features_score(lead, imovel, perfil)
+
+            parcial = (
+                score_preco * self.score_weights['preco'] +
+                score_localizacao * self.score_weights['localizacao'] +
+                score_caracteristicas * self.score_weights['caracteristicas']
+            )
+
+            # Empate perde para quem já está no heap (veio antes na consulta)
+            piso = heap[0][0] if len(heap) >= limit else SCORE_MINIMO
+            if round(parcial + ia_maximo * self.score_weights['ia_semantic'], 3) <= piso:
+                continue
+
+            score_ia = self._calculate_ai_score(lead, imovel, perfil)
+            score_geral = round(parcial + score_ia * self.score_weights['ia_semantic'], 3)
+            if score_geral <= piso:
+                continue
+
+            item = (score_geral, -posicao, (imovel, score_preco, score_localizacao, score_caracteristicas, score_ia))
+            if len(heap) < limit:
+                heapq.heappush(heap, item)
+            else:
+                heapq.heapreplace(heap, item)
+
+        matches = []
+        for score_geral, _, (imovel, score_preco, score_localizacao, score_caracteristicas, score_ia) in sorted(heap, reverse=True):
+            matches.append({
+                'imovel': imovel,
+                'scores': {
+                    'score_geral': score_geral,
+                    'score_preco': round(score_preco, 3),
+                    'score_localizacao': round(score_localizacao, 3),
+                    'score_caracteristicas': round(score_caracteristicas, 3),
+                    'score_ia': round(score_ia, 3),
+                    'motivos_match': self._generate_match_reasons(lead, imovel, {
+                        'preco': score_preco,
+                        'localizacao': score_localizacao,
+                        'caracteristicas': score_caracteristicas,
+                        'ia': score_ia
+                    }),
+                    'pontos_atencao': self._generate_attention_points(lead, imovel)
+                }
+            })
+        return matches
+    
     def _calculate_match_score(self, lead: Lead, imovel: Imovel) -> Dict[str, Any]:
         """
         Calcular score de compatibilidade entre lead e imóvel
@@ -160,14 +301,15 @@ class MatchingEngine:
             logger.error(f"[MATCHING] Erro no score de preço: {e}")
             return 0.0
     
-    def _calculate_location_score(self, lead: Lead, imovel: Imovel) -> float:
+    def _calculate_location_score(self, lead: Lead, imovel: Imovel, perfil: Optional[PerfilLead] = None) -> float:
         """Calcular score de compatibilidade de localização"""
         try:
+            perfil = perfil or PerfilLead.from_lead(lead)
             score = 0.0
             
             # Score por cidade
-            if lead.cidades_interesse and imovel.cidade:
-                if imovel.cidade.lower() in [c.lower() for c in lead.cidades_interesse]:
+            if perfil.cidades and imovel.cidade:
+                if imovel.cidade.lower() in perfil.cidades:
                     score += 0.6
                 else:
                     score += 0.1
@@ -175,8 +317,8 @@ class MatchingEngine:
                 score += 0.3
             
             # Score por bairro
-            if lead.bairros_interesse and imovel.bairro:
-                if imovel.bairro.lower() in [b.lower() for b in lead.bairros_interesse]:
+            if perfil.bairros and imovel.bairro:
+                if imovel.bairro.lower() in perfil.bairros:
                     score += 0.4
                 else:
                     score += 0.1
@@ -189,19 +331,20 @@ class MatchingEngine:
             logger.error(f"[MATCHING] Erro no score de localização: {e}")
             return 0.0
     
-    def _calculate_features_score(self, lead: Lead, imovel: Imovel) -> float:
+    def _calculate_features_score(self, lead: Lead, imovel: Imovel, perfil: Optional[PerfilLead] = None) -> float:
         """Calcular score de características do imóvel"""
         try:
+            perfil = perfil or PerfilLead.from_lead(lead)
             score = 0.0
             
             # Verificar tipo de imóvel
-            if lead.tipo_imovel and imovel.tipo:
-                if lead.tipo_imovel.lower() == imovel.tipo.lower():
+            if perfil.tipo_imovel and imovel.tipo:
+                if perfil.tipo_imovel == imovel.tipo.lower():
                     score += 0.3
             
             # Verificar categoria (venda/locação)
-            if lead.categoria and imovel.categoria:
-                if lead.categoria.lower() == imovel.categoria.lower():
+            if perfil.categoria and imovel.categoria:
+                if perfil.categoria == imovel.categoria.lower():
                     score += 0.2
             
             # Verificar quartos
@@ -230,29 +373,24 @@ class MatchingEngine:
             logger.error(f"[MATCHING] Erro no score de características: {e}")
             return 0.0
     
-    def _calculate_ai_score(self, lead: Lead, imovel: Imovel) -> float:
-        """Calcular score usando análise de texto simples"""
+    def _calculate_ai_score(self, lead: Lead, imovel: Imovel, perfil: Optional[PerfilLead] = None) -> float:
+        """
+        Calcular score pelas amenidades desejadas x amenidades do imóvel (bitsets),
+        combinado meio a meio com a similaridade semântica quando o lead tem perfil
+        """
         try:
-            score = 0.5  # Score base
+            perfil = perfil or PerfilLead.from_lead(lead)
             
-            # Analisar observações do lead vs descrição do imóvel
-            if lead.observacoes and imovel.descricao:
-                lead_words = set(lead.observacoes.lower().split())
-                imovel_words = set(imovel.descricao.lower().split())
-                
-                # Palavras-chave importantes
-                keywords = {
-                    'piscina', 'churrasqueira', 'varanda', 'sacada', 'jardim',
-                    'garagem', 'elevador', 'portaria', 'academia', 'playground',
-                    'novo', 'reformado', 'mobiliado', 'vista', 'sol'
-                }
-                
-                lead_keywords = lead_words.intersection(keywords)
-                imovel_keywords = imovel_words.intersection(keywords)
-                
-                if lead_keywords and imovel_keywords:
-                    match_ratio = len(lead_keywords.intersection(imovel_keywords)) / len(lead_keywords)
-                    score = 0.3 + (match_ratio * 0.7)
+            score = 0.5
+            if perfil.amenidades:
+                # Imóveis importados antes do bitset: extrair do texto
+                amenidades = imovel.amenidades
+                if amenidades is None:
+                    amenidades = extrair_amenidades(imovel.titulo, imovel.descricao)
+                score = score_amenidades(perfil.amenidades, amenidades)
+            
+            if perfil.similaridades:
+                score = 0.5 * score + 0.5 * perfil.similaridades.get(imovel.id, 0.0)
             
             return score
             
@@ -300,45 +438,17 @@ class MatchingEngine:
             return []
     
     def _save_matches(self, matches: List[Dict[str, Any]], db):
-        """Salvar matches no banco de dados"""
+        """Salvar matches no banco de dados (upsert em lote)"""
         try:
-            for match_data in matches:
-                imovel = match_data['imovel']
-                scores = match_data['scores']
-                lead_id = match_data['lead_id']
-                
-                # Verificar se match já existe
-                existing_match = db.query(Matching).filter(
-                    Matching.lead_id == lead_id,
-                    Matching.imovel_id == imovel.id
-                ).first()
-                
-                if existing_match:
-                    # Atualizar match existente
-                    existing_match.score_geral = scores['score_geral']
-                    existing_match.score_preco = scores['score_preco']
-                    existing_match.score_localizacao = scores['score_localizacao']
-                    existing_match.score_caracteristicas = scores['score_caracteristicas']
-                    existing_match.score_ia = scores['score_ia']
-                    existing_match.motivos_match = scores['motivos_match']
-                    existing_match.pontos_atencao = scores['pontos_atencao']
-                    existing_match.data_atualizacao = datetime.now()
-                else:
-                    # Criar novo match
-                    new_match = Matching(
-                        id=str(uuid.uuid4()),
-                        lead_id=lead_id,
-                        imovel_id=imovel.id,
-                        cliente_id=imovel.cliente_id,
-                        score_geral=scores['score_geral'],
-                        score_preco=scores['score_preco'],
-                        score_localizacao=scores['score_localizacao'],
-                        score_caracteristicas=scores['score_caracteristicas'],
-                        score_ia=scores['score_ia'],
-                        motivos_match=scores['motivos_match'],
-                        pontos_atencao=scores['pontos_atencao']
-                    )
-                    db.add(new_match)
+            salvar_matchings(db, [
+                {
+                    'lead_id': match_data['lead_id'],
+                    'imovel_id': match_data['imovel'].id,
+                    'cliente_id': match_data['imovel'].cliente_id,
+                    **match_data['scores']
+                }
+                for match_data in matches
+            ])
             
             logger.info(f"[MATCHING] Salvos {len(matches)} matches no banco")
             
@@ -5,8 +5,9 @@ Sistema de Automação da Carol
 from typing import Dict, List, Any
 from datetime import datetime
 
-from services.ai_agents.agents.carol_ai import enviar_mensagem_novos_imoveis
-from services.matching.geo_matching import GeoMatchingEngine
+from services.automation.carol_campaign import executar_campanha_sync
+from services.matching.batch_matching import MAX_MATCHES_POR_LEAD
+from services.matching.top_matches import ArmazenamentoTopK, combinar_operacoes
 from services.crm_integration.crm_connector import CRMConnector
 
 
@@ -33,16 +34,14 @@ def processar_novos_imoveis_com_carol(cliente_id: str) -> Dict[str, Any]:
             resultado["mensagem"] = "Nenhum lead ativo encontrado"
             return resultado
         
-        # 2. Para cada lead, buscar imóveis compatíveis
-        matching_engine = GeoMatchingEngine(cliente_id)
+        # 2. Imóveis compatíveis já materializados pelo matching (lead_top_matches)
+        top_matches = ArmazenamentoTopK(cliente_id).obter([str(lead.id) for lead in leads_prontos])
+        envios = []
         
         for lead in leads_prontos:
             try:
                 lead_data = lead.to_dict()
                 
-                # Buscar imóveis compatíveis
-                imoveis_matches = []
-                
                 # Determinar tipos de operação
                 tipos_operacao = []
                 if lead.interesse_venda:
@@ -50,63 +49,36 @@ def processar_novos_imoveis_com_carol(cliente_id: str) -> Dict[str, Any]:
                 if lead.interesse_locacao:
                     tipos_operacao.append('locacao')
                 
-                # Buscar para cada tipo de operação
-                for tipo_op in tipos_operacao:
-                    filtros = {
-                        'tipo_imovel': lead.tipo_imovel,
-                        'quartos_min': lead.quartos_min,
-                        'quartos_max': lead.quartos_max,
-                        'vagas_min': lead.vagas_min
-                    }
-                    
-                    if tipo_op == 'venda':
-                        filtros.update({
-                            'preco_min': lead.orcamento_min_venda,
-                            'preco_max': lead.orcamento_max_venda
-                        })
-                    else:
-                        filtros.update({
-                            'aluguel_max': lead.orcamento_max_total_mensal
-                        })
-                    
-                    imoveis_proximos = matching_engine.buscar_imoveis_proximos(
-                        lat_centro=lead.latitude_centro,
-                        lng_centro=lead.longitude_centro,
-                        raio_km=lead.raio_busca_km or 3,
-                        tipo_operacao=tipo_op,
-                        filtros_adicionais=filtros
+                por_operacao = top_matches.get(str(lead.id), {})
+                imoveis_matches = [
+                    imovel
+                    for imovel in combinar_operacoes(
+                        {tipo_op: por_operacao.get(tipo_op, []) for tipo_op in tipos_operacao},
+                        MAX_MATCHES_POR_LEAD
                     )
-                    
-                    # Calcular score e filtrar
-                    for imovel in imoveis_proximos:
-                        score = matching_engine.calcular_score_compatibilidade(imovel, lead_data)
-                        if score >= 60:  # Score mínimo para Carol contactar
-                            imovel['score_compatibilidade'] = score
-                            imoveis_matches.append(imovel)
+                    if imovel['score_compatibilidade'] >= 60  # Score mínimo para Carol contactar
+                ]
                 
-                # Se encontrou matches, enviar mensagem via Carol
+                # Se encontrou matches, lead entra na campanha com os top 3
                 if imoveis_matches:
-                    # Ordenar por score e pegar top 3
-                    imoveis_matches.sort(key=lambda x: x['score_compatibilidade'], reverse=True)
-                    top_matches = imoveis_matches[:3]
-                    
-                    # Enviar mensagem via Carol
-                    resultado_envio = enviar_mensagem_novos_imoveis(
-                        cliente_id=cliente_id,
-                        lead_data=lead_data,
-                        imoveis_matches=top_matches
-                    )
-                    
-                    resultado["leads_contactados"] += 1
-                    resultado["mensagens_enviadas"] += 1
-                    
-                    print(f"✅ Mensagem enviada para {lead.nome} - {len(top_matches)} imóveis")
+                    envios.append((lead_data, imoveis_matches[:3]))
                 
             except Exception as e:
                 erro_msg = f"Erro ao processar lead {lead.nome}: {str(e)}"
                 resultado["erros"].append(erro_msg)
                 print(f"❌ {erro_msg}")
         
+        # 3. Gerar mensagens em paralelo (um CarolAI para o cliente) e enfileirar no WhatsApp
+        if envios:
+            campanha = executar_campanha_sync(cliente_id, envios)
+            
+            resultado["leads_contactados"] = campanha["mensagens_enviadas"]
+            resultado["mensagens_enviadas"] = campanha["mensagens_enviadas"]
+            resultado["duracao_campanha_s"] = campanha["duracao_s"]
+            resultado["erros"].extend(campanha["erros"])
+            
+            print(f"✅ {campanha['mensagens_enviadas']} mensagens enfileiradas em {campanha['duracao_s']}s")
+        
         resultado["status"] = "sucesso"
         
     except Exception as e:
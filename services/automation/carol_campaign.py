@@ -0,0 +1,110 @@
+"""
+Execução concorrente das campanhas diárias da Carol
+
+Um CarolAI por cliente (cliente OpenAI e garantias carregados uma vez) e
+as mensagens geradas em paralelo: um semáforo limita as completions
+simultâneas e um token bucket mantém o consumo dentro do orçamento de
+tokens por minuto da conta. O bucket só é consumido quando a mensagem vai
+mesmo para o LLM (rota 'llm' e cache miss), pela estimativa, reconciliada
+com o usage da resposta. Cada mensagem vai para a fila do WhatsApp
+assim que fica pronta, sem esperar o resto da campanha.
+"""
+
+import asyncio
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from core.logger import logger
+from utils.rate_limit import TokenBucket
+
+# Estimativa por mensagem de novos imóveis: system prompt + contexto + max_tokens (500)
+TOKENS_ESTIMADOS_POR_MENSAGEM = 1200
+
+
+class OrcamentoTokens:
+    """Reserva no TokenBucket da campanha a partir das threads de geração"""
+
+    def __init__(self, bucket: TokenBucket, loop: asyncio.AbstractEventLoop,
+                 estimativa: int = TOKENS_ESTIMADOS_POR_MENSAGEM):
+        self.bucket = bucket
+        self.loop = loop
+        self.estimativa = estimativa
+
+    def reservar(self):
+        """Bloquear a thread até o bucket ter a estimativa de uma chamada"""
+        asyncio.run_coroutine_threadsafe(self.bucket.adquirir(self.estimativa), self.loop).result()
+
+    def reconciliar(self, tokens: int):
+        """Trocar a estimativa reservada pelo consumo real (response.usage)"""
+        if tokens:
+            self.loop.call_soon_threadsafe(self.bucket.ajustar, tokens - self.estimativa)
+
+
+async def executar_campanha(
+    cliente_id: str,
+    envios: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]],
+    concorrencia: int = 8,
+    tokens_por_minuto: int = 60000,
+    carol=None
+) -> Dict[str, Any]:
+    """
+    Gerar e enfileirar as mensagens de uma campanha
+    envios: (lead_data, imoveis_matches) por lead.
+    """
+    from services.ai_agents.agents.carol_ai import CarolAI, enviar_mensagem_novos_imoveis
+
+    carol = carol or await asyncio.to_thread(CarolAI, cliente_id)
+    semaforo = asyncio.Semaphore(concorrencia)
+    if carol.openai_client:
+        bucket = TokenBucket(tokens_por_minuto / 60, capacidade=tokens_por_minuto)
+        carol.orcamento_tokens = OrcamentoTokens(bucket, asyncio.get_running_loop())
+
+    resultado = {
+        "mensagens_enviadas": 0,
+        "envios": [],
+        "erros": []
+    }
+
+    async def enviar(lead_data: Dict[str, Any], imoveis_matches: List[Dict[str, Any]]):
+        async with semaforo:
+            try:
+                # CarolAI e o cache do LLM são síncronos: cada geração roda numa thread
+                envio = await asyncio.to_thread(
+                    enviar_mensagem_novos_imoveis, cliente_id, lead_data, imoveis_matches, carol
+                )
+                resultado["envios"].append(envio)
+                resultado["mensagens_enviadas"] += 1
+            except Exception as e:
+                resultado["erros"].append(f"Erro ao enviar para lead {lead_data.get('nome')}: {e}")
+
+    inicio = time.perf_counter()
+    try:
+        await asyncio.gather(*[enviar(lead_data, matches) for lead_data, matches in envios])
+    finally:
+        # O bucket é deste event loop: a instância não leva o orçamento para fora da campanha
+        carol.orcamento_tokens = None
+    resultado["duracao_s"] = round(time.perf_counter() - inicio, 2)
+
+    logger.info(
+        f"[CAROL] Campanha {cliente_id}: {resultado['mensagens_enviadas']}/{len(envios)} mensagens "
+        f"em {resultado['duracao_s']}s (concorrência {concorrencia})"
+    )
+    return resultado
+
+
+def executar_campanha_sync(
+    cliente_id: str,
+    envios: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]],
+    concorrencia: Optional[int] = None,
+    tokens_por_minuto: Optional[int] = None
+) -> Dict[str, Any]:
+    """executar_campanha para código síncrono (tasks, rotina diária)"""
+    from core.config import get_settings
+
+    settings = get_settings()
+    return asyncio.run(executar_campanha(
+        cliente_id,
+        envios,
+        concorrencia=concorrencia or settings.carol_campanha_concorrencia,
+        tokens_por_minuto=tokens_por_minuto or settings.carol_campanha_tokens_por_minuto
+    ))
@@ -19,6 +19,10 @@ def sincronizar_crm_cliente(cliente_id: str) -> Dict[str, Any]:
         "erros": []
     }
     
+    # Índice de interesse dos leads reflete as mudanças na próxima consulta
+    from services.matching.lead_index import marcar_indice_leads_desatualizado
+    marcar_indice_leads_desatualizado(cliente_id)
+    
     print(f"✅ CRM sincronizado: {resultado}")
     return resultado
 
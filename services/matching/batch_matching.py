@@ -0,0 +1,417 @@
+"""
+Matching em lote - carrega o portfólio do cliente uma vez e casa todos os leads
+
+Substitui o laço de fazer_matching_completo (uma consulta a imoveis_dual por
+lead e por tipo de operação) por:
+1. uma consulta de leads e uma de imóveis ativos
+2. snapshot colunar do portfólio + grade espacial em memória
+3. filtros, distância e score vetorizados por lead, opcionalmente em
+   processos separados por blocos de leads
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+from sqlalchemy import and_, or_
+
+from core.database import get_db_session
+from core.logger import logger
+from models.imovel_dual import ImovelDual
+from models.lead_crm_integrado import LeadCRMIntegrado
+from services.matching.spatial_index import GradeEspacial
+from services.matching.vector_scoring import (
+    Vocabulario,
+    BlocoImoveis,
+    CriteriosLeads,
+    calcular_scores
+)
+
+SCORE_MINIMO = 50
+MAX_MATCHES_POR_LEAD = 10
+
+ETAPAS_ATIVAS = [
+    'visita_agendada',
+    'visita_realizada',
+    'proposta_enviada',
+    'atendimento',
+    'negociacao'
+]
+
+
+def _coluna(valores: List[Any]) -> np.ndarray:
+    """Coluna float com NaN para valores ausentes (mesma semântica de NULL no SQL)"""
+    return np.array([np.nan if v is None else float(v) for v in valores], dtype=np.float64)
+
+
+@dataclass
+class SnapshotPortfolio:
+    """Portfólio ativo do cliente em memória (colunar + dicionários de saída)"""
+    imoveis: List[Dict[str, Any]]
+    bloco: BlocoImoveis
+    grade: GradeEspacial
+    tipo_operacao: np.ndarray
+    tipo_imovel: np.ndarray
+    quartos: np.ndarray
+    vagas_garagem: np.ndarray
+    preco_venda: np.ndarray
+    valor_total_mensal: np.ndarray
+    mobiliado: np.ndarray
+    aceita_pets: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.imoveis)
+
+    @classmethod
+    def carregar(cls, cliente_id: str, caixas: List[tuple] = None) -> "SnapshotPortfolio":
+        """
+        Ler imóveis ativos com coordenadas em uma única consulta
+        caixas: (lat_min, lat_max, lng_min, lng_max) para carregar só as regiões
+        de alguns leads (matching incremental); None carrega o portfólio todo.
+        """
+        with get_db_session() as db:
+            query = db.query(ImovelDual).filter(
+                and_(
+                    ImovelDual.cliente_id == cliente_id,
+                    ImovelDual.ativo == True,
+                    ImovelDual.latitude.isnot(None),
+                    ImovelDual.longitude.isnot(None)
+                )
+            )
+            if caixas is not None:
+                query = query.filter(or_(*[
+                    and_(
+                        ImovelDual.latitude.between(lat_min, lat_max),
+                        ImovelDual.longitude.between(lng_min, lng_max)
+                    )
+                    for lat_min, lat_max, lng_min, lng_max in caixas
+                ]))
+            linhas = query.all()
+
+            imoveis = [imovel.to_dict() for imovel in linhas]
+            brutos = [
+                (
+                    float(imovel.latitude),
+                    float(imovel.longitude),
+                    imovel.quartos,
+                    imovel.vagas_garagem,
+                    imovel.preco_venda,
+                    imovel.valor_total_mensal,
+                    imovel.mobiliado,
+                    imovel.aceita_pets
+                )
+                for imovel in linhas
+            ]
+
+        return cls.montar(imoveis, brutos)
+
+    @classmethod
+    def montar(cls, imoveis: List[Dict[str, Any]], brutos: List[tuple]) -> "SnapshotPortfolio":
+        """Montar snapshot a partir dos dicionários e dos valores crus das colunas"""
+        vocabulario = Vocabulario()
+        grade = GradeEspacial()
+        for indice, linha in enumerate(brutos):
+            grade.inserir(indice, linha[0], linha[1])
+
+        colunas = list(zip(*brutos)) if brutos else [[] for _ in range(8)]
+
+        return cls(
+            imoveis=imoveis,
+            bloco=BlocoImoveis.from_dicts(imoveis, vocabulario),
+            grade=grade,
+            tipo_operacao=np.array([i['tipo_operacao'] for i in imoveis], dtype=object),
+            tipo_imovel=np.array([i['tipo_imovel'] for i in imoveis], dtype=object),
+            quartos=_coluna(colunas[2]),
+            vagas_garagem=_coluna(colunas[3]),
+            preco_venda=_coluna(colunas[4]),
+            valor_total_mensal=_coluna(colunas[5]),
+            mobiliado=np.array(colunas[6], dtype=object),
+            aceita_pets=np.array([bool(v) for v in colunas[7]], dtype=bool)
+        )
+
+    def filtrar(self, indices: np.ndarray, tipo_operacao: str, filtros: Dict[str, Any]) -> np.ndarray:
+        """
+        Aplicar os mesmos filtros de buscar_imoveis_proximos sobre os candidatos
+        Retorna máscara booleana alinhada com indices
+        """
+        mascara = self.tipo_operacao[indices] == tipo_operacao
+
+        if filtros.get('tipo_imovel'):
+            mascara &= self.tipo_imovel[indices] == filtros['tipo_imovel']
+        if filtros.get('quartos_min'):
+            mascara &= self.quartos[indices] >= filtros['quartos_min']
+        if filtros.get('quartos_max'):
+            mascara &= self.quartos[indices] <= filtros['quartos_max']
+        if filtros.get('vagas_min'):
+            mascara &= self.vagas_garagem[indices] >= filtros['vagas_min']
+
+        if tipo_operacao == 'venda':
+            if filtros.get('preco_min'):
+                mascara &= self.preco_venda[indices] >= filtros['preco_min']
+            if filtros.get('preco_max'):
+                mascara &= self.preco_venda[indices] <= filtros['preco_max']
+        elif tipo_operacao == 'locacao':
+            if filtros.get('aluguel_max'):
+                mascara &= self.valor_total_mensal[indices] <= filtros['aluguel_max']
+            if filtros.get('mobiliado'):
+                mascara &= self.mobiliado[indices] == filtros['mobiliado']
+            if filtros.get('aceita_pets'):
+                mascara &= self.aceita_pets[indices]
+
+        return mascara.astype(bool)
+
+    def selecionar_bloco(self, indices: np.ndarray) -> BlocoImoveis:
+        bloco = self.bloco
+        return BlocoImoveis(
+            operacao=bloco.operacao[indices],
+            preco_venda=bloco.preco_venda[indices],
+            valor_total_mensal=bloco.valor_total_mensal[indices],
+            quartos=bloco.quartos[indices],
+            vagas_garagem=bloco.vagas_garagem[indices],
+            area_total=bloco.area_total[indices],
+            aceita_pets=bloco.aceita_pets[indices],
+            mobiliado=bloco.mobiliado[indices],
+            tipo_imovel=bloco.tipo_imovel[indices],
+            distancia_km=bloco.distancia_km[indices],
+            vocabulario=bloco.vocabulario
+        )
+
+
+def _lead_para_payload(lead: LeadCRMIntegrado) -> Dict[str, Any]:
+    """Extrair do lead tudo que o matching precisa (sem depender da sessão)"""
+    return {
+        'id': str(lead.id),
+        'criterios': lead.to_dict(),
+        'latitude_centro': lead.latitude_centro,
+        'longitude_centro': lead.longitude_centro,
+        'raio_busca_km': lead.raio_busca_km,
+        'interesse_venda': lead.interesse_venda,
+        'interesse_locacao': lead.interesse_locacao,
+        'filtros': {
+            'tipo_imovel': lead.tipo_imovel,
+            'quartos_min': lead.quartos_min,
+            'quartos_max': lead.quartos_max,
+            'vagas_min': lead.vagas_min,
+            'aceita_pets': lead.aceita_pets_necessario
+        },
+        'filtros_venda': {
+            'preco_min': lead.orcamento_min_venda,
+            'preco_max': lead.orcamento_max_venda
+        },
+        'filtros_locacao': {
+            'aluguel_max': lead.orcamento_max_total_mensal,
+            'mobiliado': lead.mobiliado_preferencia if lead.mobiliado_preferencia != 'indiferente' else None
+        },
+        'lead_info': {
+            'nome': lead.nome,
+            'telefone': lead.telefone,
+            'etapa_crm': lead.etapa_crm,
+            'interesse_venda': lead.interesse_venda,
+            'interesse_locacao': lead.interesse_locacao
+        }
+    }
+
+
+def carregar_leads_payload(
+    cliente_id: str,
+    etapas_ativas: List[str] = None,
+    lead_ids: List[Any] = None
+) -> List[Dict[str, Any]]:
+    """Buscar leads em etapas ativas (opcionalmente só lead_ids) e convertê-los em payloads"""
+    with get_db_session() as db:
+        query = db.query(LeadCRMIntegrado).filter(
+            and_(
+                LeadCRMIntegrado.cliente_id == cliente_id,
+                LeadCRMIntegrado.ativo == True,
+                LeadCRMIntegrado.etapa_crm.in_(etapas_ativas or ETAPAS_ATIVAS),
+                LeadCRMIntegrado.latitude_centro.isnot(None),
+                LeadCRMIntegrado.longitude_centro.isnot(None)
+            )
+        )
+        if lead_ids is not None:
+            query = query.filter(LeadCRMIntegrado.id.in_(lead_ids))
+        return [_lead_para_payload(lead) for lead in query.all()]
+
+
+def casar_leads(
+    snapshot: SnapshotPortfolio,
+    leads: List[Dict[str, Any]],
+    vendas_ativo: bool,
+    locacao_ativo: bool,
+    raio_padrao_km: int
+) -> Dict[str, Any]:
+    """
+    Casar um bloco de leads contra o snapshot
+    Retorna resultado parcial no mesmo formato de fazer_matching_completo
+    """
+    resultado = {
+        "leads_processados": 0,
+        "matches_encontrados": 0,
+        "matches_por_lead": {},
+        "estatisticas": {
+            "vendas": {"leads": 0, "matches": 0},
+            "locacao": {"leads": 0, "matches": 0}
+        }
+    }
+    vocabulario = snapshot.bloco.vocabulario
+
+    for lead in leads:
+        por_operacao: Dict[str, List[Dict[str, Any]]] = {}
+
+        tipos_operacao = []
+        if lead['interesse_venda'] and vendas_ativo:
+            tipos_operacao.append('venda')
+        if lead['interesse_locacao'] and locacao_ativo:
+            tipos_operacao.append('locacao')
+
+        raio_km = lead['raio_busca_km'] or raio_padrao_km
+        proximos = snapshot.grade.buscar_raio(lead['latitude_centro'], lead['longitude_centro'], raio_km)
+        indices_raio = np.array([indice for indice, _, _ in proximos], dtype=np.int64)
+        distancias_raio = np.array([round(distancia, 2) for _, distancia, _ in proximos], dtype=np.float64)
+        criterios = CriteriosLeads.from_dicts([lead['criterios']], vocabulario)
+
+        for tipo_op in tipos_operacao:
+            filtros = dict(lead['filtros'])
+            if tipo_op == 'venda':
+                filtros.update(lead['filtros_venda'])
+                resultado["estatisticas"]["vendas"]["leads"] += 1
+            else:
+                filtros.update(lead['filtros_locacao'])
+                resultado["estatisticas"]["locacao"]["leads"] += 1
+
+            if not len(indices_raio):
+                continue
+
+            mascara = snapshot.filtrar(indices_raio, tipo_op, filtros)
+            if not mascara.any():
+                continue
+
+            indices = indices_raio[mascara]
+            distancias = distancias_raio[mascara]
+            scores = calcular_scores(snapshot.selecionar_bloco(indices), criterios, distancias=distancias)[0]
+
+            for indice, distancia, score in zip(indices.tolist(), distancias.tolist(), scores.tolist()):
+                if score >= SCORE_MINIMO:
+                    imovel = dict(snapshot.imoveis[indice])
+                    imovel['distancia_km'] = distancia
+                    imovel['score_compatibilidade'] = round(score, 1)
+                    por_operacao.setdefault(tipo_op, []).append(imovel)
+
+                    if tipo_op == 'venda':
+                        resultado["estatisticas"]["vendas"]["matches"] += 1
+                    else:
+                        resultado["estatisticas"]["locacao"]["matches"] += 1
+
+        # Top-K por operação (materializado em lead_top_matches) e o combinado
+        for matches in por_operacao.values():
+            matches.sort(key=lambda x: x['score_compatibilidade'], reverse=True)
+            del matches[MAX_MATCHES_POR_LEAD:]
+        matches_lead = sorted(
+            (match for matches in por_operacao.values() for match in matches),
+            key=lambda x: x['score_compatibilidade'],
+            reverse=True
+        )[:MAX_MATCHES_POR_LEAD]
+
+        if matches_lead:
+            resultado["matches_por_lead"][lead['id']] = {
+                "lead_info": lead['lead_info'],
+                "matches": matches_lead,
+                "por_operacao": por_operacao,
+                "total_matches": len(matches_lead)
+            }
+            resultado["matches_encontrados"] += len(matches_lead)
+
+        resultado["leads_processados"] += 1
+
+    return resultado
+
+
+# Snapshot do processo worker (definido pelo initializer do pool)
+_snapshot_worker: Optional[SnapshotPortfolio] = None
+
+
+def _inicializar_worker(snapshot: SnapshotPortfolio):
+    global _snapshot_worker
+    _snapshot_worker = snapshot
+
+
+def _casar_bloco_worker(leads: List[Dict[str, Any]], *parametros) -> Dict[str, Any]:
+    return casar_leads(_snapshot_worker, leads, *parametros)
+
+
+def _combinar_resultados(parciais: List[Dict[str, Any]]) -> Dict[str, Any]:
+    resultado = {
+        "leads_processados": 0,
+        "matches_encontrados": 0,
+        "matches_por_lead": {},
+        "estatisticas": {
+            "vendas": {"leads": 0, "matches": 0},
+            "locacao": {"leads": 0, "matches": 0}
+        }
+    }
+    for parcial in parciais:
+        resultado["leads_processados"] += parcial["leads_processados"]
+        resultado["matches_encontrados"] += parcial["matches_encontrados"]
+        resultado["matches_por_lead"].update(parcial["matches_por_lead"])
+        for operacao in ("vendas", "locacao"):
+            for campo in ("leads", "matches"):
+                resultado["estatisticas"][operacao][campo] += parcial["estatisticas"][operacao][campo]
+    return resultado
+
+
+def fazer_matching_lote(
+    cliente_id: str,
+    config,
+    processos: int = 0,
+    tamanho_bloco: int = 500
+) -> Dict[str, Any]:
+    """
+    Matching completo em lote para um cliente
+
+    processos: 0 executa no processo atual; > 0 distribui blocos de leads
+    em um ProcessPoolExecutor com esse número de workers.
+    Retorna a mesma estrutura de fazer_matching_completo, mais "tempos".
+    """
+    if not config or not config.auto_matching_ativo:
+        return {"erro": "Matching automático não está ativo"}
+
+    tempos = {}
+    inicio = time.perf_counter()
+
+    leads = carregar_leads_payload(cliente_id)
+    tempos["carregar_leads"] = time.perf_counter() - inicio
+
+    etapa = time.perf_counter()
+    snapshot = SnapshotPortfolio.carregar(cliente_id)
+    tempos["carregar_imoveis"] = time.perf_counter() - etapa
+
+    etapa = time.perf_counter()
+    parametros = (config.vendas_ativo, config.locacao_ativo, config.raio_busca_km)
+    blocos = [leads[i:i + tamanho_bloco] for i in range(0, len(leads), tamanho_bloco)]
+
+    if processos and len(blocos) > 1:
+        # Snapshot enviado uma vez por worker, não a cada bloco
+        with ProcessPoolExecutor(
+            max_workers=processos,
+            initializer=_inicializar_worker,
+            initargs=(snapshot,)
+        ) as executor:
+            futuros = [executor.submit(_casar_bloco_worker, bloco, *parametros) for bloco in blocos]
+            parciais = [futuro.result() for futuro in futuros]
+    else:
+        parciais = [casar_leads(snapshot, bloco, *parametros) for bloco in blocos]
+
+    resultado = _combinar_resultados(parciais)
+    tempos["matching"] = time.perf_counter() - etapa
+    tempos["total"] = time.perf_counter() - inicio
+
+    resultado["tempos"] = {etapa: round(segundos, 4) for etapa, segundos in tempos.items()}
+    resultado["imoveis_no_snapshot"] = len(snapshot)
+
+    logger.info(
+        f"[MATCHING_LOTE] {cliente_id}: {resultado['leads_processados']} leads x {len(snapshot)} imóveis "
+        f"em {tempos['total']:.2f}s ({resultado['tempos']})"
+    )
+    return resultado
@@ -3,15 +3,30 @@ Sistema de Matching Geográfico - Busca por proximidade (3km)
 """
 
 import math
+import uuid
+import numpy as np
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, text
 
 from core.database import get_db_session
+from core.logger import logger
 from models.imovel_dual import ImovelDual
 from models.lead_crm_integrado import LeadCRMIntegrado
 from models.configuracao_imobiliaria import ConfiguracaoImobiliaria
+from services.matching.spatial_index import obter_indice_imoveis, calcular_bounding_box
+from services.matching.vector_scoring import (
+    Vocabulario,
+    BlocoImoveis,
+    CriteriosLeads,
+    calcular_scores,
+    calcular_scores_dicts
+)
+from services.matching.batch_matching import fazer_matching_lote
+from services.matching.incremental_matching import fazer_matching_incremental
+from services.matching.lead_index import obter_indice_leads
+from services.matching.persistencia import salvar_matchings, linhas_matching_geo
 
 
 class GeoMatchingEngine:
@@ -69,17 +84,34 @@ class GeoMatchingEngine:
         if raio_km is None:
             raio_km = self.config.raio_busca_km or 3
         
+        lat_min, lat_max, lng_min, lng_max = calcular_bounding_box(lat_centro, lng_centro, raio_km)
+        
         with get_db_session() as db:
-            # Query base
+            # Candidatos pelo índice espacial (só células próximas são visitadas)
+            distancias = None
+            try:
+                indice = obter_indice_imoveis(self.cliente_id)
+                candidatos = indice.buscar(lat_centro, lng_centro, raio_km, tipo_operacao, db=db)
+                distancias = dict(candidatos)
+            except Exception as e:
+                logger.warning(f"[GEO_INDEX] Índice indisponível para {self.cliente_id}, usando bounding box: {e}")
+            
+            if distancias is not None and not distancias:
+                return []
+            
+            # Query base com bounding box no SQL (usa índices de latitude/longitude)
             query = db.query(ImovelDual).filter(
                 and_(
                     ImovelDual.cliente_id == self.cliente_id,
                     ImovelDual.ativo == True,
-                    ImovelDual.latitude.isnot(None),
-                    ImovelDual.longitude.isnot(None)
+                    ImovelDual.latitude.between(lat_min, lat_max),
+                    ImovelDual.longitude.between(lng_min, lng_max)
                 )
             )
             
+            if distancias is not None:
+                query = query.filter(ImovelDual.id.in_([uuid.UUID(i) for i in distancias]))
+            
             # Filtrar por tipo de operação se especificado
             if tipo_operacao:
                 query = query.filter(ImovelDual.tipo_operacao == tipo_operacao)
@@ -116,17 +148,22 @@ class GeoMatchingEngine:
                     if filtros_adicionais.get('aceita_pets'):
                         query = query.filter(ImovelDual.aceita_pets == True)
             
-            # Buscar todos os imóveis que passaram nos filtros
+            # Materializar apenas os candidatos
             imoveis = query.all()
             
             # Calcular distância e filtrar por proximidade
             imoveis_proximos = []
             for imovel in imoveis:
                 try:
-                    distancia = self.calcular_distancia_haversine(
-                        lat_centro, lng_centro,
-                        float(imovel.latitude), float(imovel.longitude)
-                    )
+                    if distancias is not None:
+                        distancia = distancias.get(str(imovel.id))
+                        if distancia is None:
+                            continue
+                    else:
+                        distancia = self.calcular_distancia_haversine(
+                            lat_centro, lng_centro,
+                            float(imovel.latitude), float(imovel.longitude)
+                        )
                     
                     if distancia <= raio_km:
                         imovel_dict = imovel.to_dict()
@@ -273,6 +310,17 @@ class GeoMatchingEngine:
         
         return min(100, max(0, score_final))
     
+    def calcular_scores_lote(
+        self,
+        imoveis: List[Dict[str, Any]],
+        leads_criterios: List[Dict[str, Any]]
+    ):
+        """
+        Versão vetorizada de calcular_score_compatibilidade
+        Retorna matriz NumPy (leads x imóveis) com scores de 0 a 100
+        """
+        return calcular_scores_dicts(imoveis, leads_criterios)
+    
     def buscar_leads_para_matching(
         self, 
         etapas_ativas: List[str] = None
@@ -368,9 +416,12 @@ class GeoMatchingEngine:
                     filtros_adicionais=filtros
                 )
                 
-                # Calcular score de compatibilidade para cada imóvel
-                for imovel in imoveis_proximos:
-                    score = self.calcular_score_compatibilidade(imovel, lead_dict)
+                if not imoveis_proximos:
+                    continue
+                
+                # Calcular score de compatibilidade de todos os imóveis de uma vez
+                scores = self.calcular_scores_lote(imoveis_proximos, [lead_dict])[0]
+                for imovel, score in zip(imoveis_proximos, scores.tolist()):
                     imovel['score_compatibilidade'] = round(score, 1)
                     
                     # Só incluir imóveis com score mínimo
@@ -406,6 +457,29 @@ class GeoMatchingEngine:
         
         return resultado
     
+    def fazer_matching_completo_lote(self, processos: int = 0) -> Dict[str, Any]:
+        """
+        Matching completo em lote: portfólio carregado uma única vez em memória
+        Mesma estrutura de fazer_matching_completo, com tempos por etapa
+        """
+        return fazer_matching_lote(self.cliente_id, self.config, processos=processos)
+    
+    def fazer_matching_incremental(self, completo: bool = False, processos: int = 0) -> Dict[str, Any]:
+        """
+        Atualizar os top-K persistidos só com os pares afetados por imóveis e
+        leads alterados desde a última execução (completo=True refaz tudo)
+        """
+        return fazer_matching_incremental(self.cliente_id, self.config, completo=completo, processos=processos)
+    
+    def salvar_matchings(self, resultado: Dict[str, Any]) -> int:
+        """
+        Gravar matches_por_lead de um resultado de matching na tabela matchings
+        (upsert em lote por lead_id/imovel_id)
+        """
+        linhas = linhas_matching_geo(self.cliente_id, resultado.get('matches_por_lead', {}))
+        with get_db_session() as db:
+            return salvar_matchings(db, linhas)
+    
     def buscar_leads_para_novo_imovel(self, imovel: ImovelDual) -> List[Dict[str, Any]]:
         """
         Buscar leads compatíveis quando um novo imóvel é cadastrado
@@ -413,54 +487,32 @@ class GeoMatchingEngine:
         if not imovel.latitude or not imovel.longitude:
             return []
         
-        # Buscar leads que podem ter interesse neste imóvel
-        with get_db_session() as db:
-            query = db.query(LeadCRMIntegrado).filter(
-                and_(
-                    LeadCRMIntegrado.cliente_id == self.cliente_id,
-                    LeadCRMIntegrado.ativo == True,
-                    LeadCRMIntegrado.latitude_centro.isnot(None),
-                    LeadCRMIntegrado.longitude_centro.isnot(None)
-                )
-            )
-            
-            # Filtrar por tipo de interesse
-            if imovel.tipo_operacao == 'venda':
-                query = query.filter(LeadCRMIntegrado.interesse_venda == True)
-            else:
-                query = query.filter(LeadCRMIntegrado.interesse_locacao == True)
-            
-            leads = query.all()
-        
-        leads_compativeis = []
         imovel_dict = imovel.to_dict()
+        raio_padrao = (self.config.raio_busca_km if self.config else None) or 3
         
-        for lead in leads:
-            # Calcular distância
-            try:
-                distancia = self.calcular_distancia_haversine(
-                    float(imovel.latitude), float(imovel.longitude),
-                    lead.latitude_centro, lead.longitude_centro
-                )
-                
-                raio_busca = lead.raio_busca_km or self.config.raio_busca_km or 3
-                
-                if distancia <= raio_busca:
-                    # Calcular score de compatibilidade
-                    imovel_dict['distancia_km'] = round(distancia, 2)
-                    score = self.calcular_score_compatibilidade(imovel_dict, lead.to_dict())
-                    
-                    if score >= 60:  # Score mínimo mais alto para novos imóveis
-                        leads_compativeis.append({
-                            "lead": lead.to_dict(),
-                            "score_compatibilidade": round(score, 1),
-                            "distancia_km": round(distancia, 2),
-                            "motivo_match": "novo_imovel_cadastrado"
-                        })
-                        
-            except Exception as e:
-                print(f"Erro ao processar lead {lead.id}: {e}")
-                continue
+        # Leads cujo círculo de busca contém o imóvel e cujos filtros ele atende
+        indice = obter_indice_leads(self.cliente_id, raio_padrao)
+        candidatos = indice.buscar_leads(imovel_dict)
+        
+        leads_no_raio = [interesse.dados for interesse, _ in candidatos]
+        distancias = [round(distancia, 2) for _, distancia in candidatos]
+        
+        leads_compativeis = []
+        if leads_no_raio:
+            # Calcular score de compatibilidade para todos os leads de uma vez
+            vocabulario = Vocabulario()
+            bloco = BlocoImoveis.from_dicts([imovel_dict], vocabulario)
+            criterios = CriteriosLeads.from_dicts(leads_no_raio, vocabulario)
+            scores = calcular_scores(bloco, criterios, distancias=np.array(distancias)[:, None])[:, 0]
+            
+            for lead_dict, distancia, score in zip(leads_no_raio, distancias, scores.tolist()):
+                if score >= 60:  # Score mínimo mais alto para novos imóveis
+                    leads_compativeis.append({
+                        "lead": lead_dict,
+                        "score_compatibilidade": round(score, 1),
+                        "distancia_km": distancia,
+                        "motivo_match": "novo_imovel_cadastrado"
+                    })
         
         # Ordenar por score
         leads_compativeis.sort(key=lambda x: x['score_compatibilidade'], reverse=True)
@@ -470,17 +522,39 @@ class GeoMatchingEngine:
 
 # FUNÇÕES UTILITÁRIAS PARA USO NO SISTEMA
 
-def executar_matching_automatico(cliente_id: str) -> Dict[str, Any]:
+def executar_matching_automatico(
+    cliente_id: str,
+    modo_lote: bool = True,
+    processos: int = 0,
+    incremental: bool = True,
+    completo: bool = False,
+    salvar: bool = False
+) -> Dict[str, Any]:
     """
     Executar matching automático para um cliente
+    incremental: só pares afetados por mudanças, mantendo os top-K persistidos
+    (a primeira execução, ou completo=True, recalcula todos os leads)
+    salvar: gravar também os matches encontrados na tabela matchings
     """
     print(f"🎯 Executando matching automático para {cliente_id}")
     
     engine = GeoMatchingEngine(cliente_id)
-    resultado = engine.fazer_matching_completo()
+    if incremental:
+        resultado = engine.fazer_matching_incremental(completo=completo, processos=processos)
+    elif modo_lote:
+        resultado = engine.fazer_matching_completo_lote(processos=processos)
+    else:
+        resultado = engine.fazer_matching_completo()
+    
+    if 'erro' in resultado:
+        print(f"⚠️ {resultado['erro']}")
+        return resultado
     
     print(f"📊 Resultado: {resultado['leads_processados']} leads processados, {resultado['matches_encontrados']} matches encontrados")
     
+    if salvar:
+        resultado["matchings_gravados"] = engine.salvar_matchings(resultado)
+    
     return resultado
 
 
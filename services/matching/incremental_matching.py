@@ -0,0 +1,367 @@
+"""
+Matching incremental - só recalcula os pares afetados por mudanças
+
+Estado por cliente no Redis:
+- matching:watermark:{cliente_id} -> hash imoveis / leads (data_atualizacao
+                                     já processada) e config (raio, operações)
+- matching:aplicados_{imoveis,leads}:{cliente_id} -> hash id -> data_atualizacao
+                                     já aplicada dentro da margem do watermark
+
+As mudanças são detectadas só pelo watermark: quem grava imoveis_dual e
+leads_crm precisa atualizar data_atualizacao (o importador XML grava a
+tabela imoveis, que não entra neste matching).
+
+Os top-K ficam na tabela lead_top_matches (services.matching.top_matches).
+
+A cada execução:
+1. imóveis/leads alterados = data_atualizacao >= watermark - MARGEM_WATERMARK,
+   sem os já aplicados com a mesma data_atualizacao (data_atualizacao é o
+   início da transação e as escritas commitam fora de ordem)
+2. leads alterados e leads cujo top-K contém um imóvel alterado são
+   recalculados, carregando só os imóveis do raio deles
+3. cada imóvel alterado ainda ativo é oferecido aos leads cujo círculo o
+   contém (índice de interesse) e entra no top-K se superar o último
+
+Sem watermark (primeira execução) ou com a configuração do cliente
+alterada, roda o matching em lote completo e grava todos os top-K.
+"""
+
+import copy
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Set
+
+import numpy as np
+from sqlalchemy import func
+
+from core.database import get_db_session
+from core.logger import logger
+from core.redis_config import LIBERAR_LOCK_LUA
+from models.imovel_dual import ImovelDual
+from models.lead_crm_integrado import LeadCRMIntegrado
+from services.matching.batch_matching import (
+    SCORE_MINIMO,
+    MAX_MATCHES_POR_LEAD,
+    ETAPAS_ATIVAS,
+    SnapshotPortfolio,
+    carregar_leads_payload,
+    casar_leads,
+    fazer_matching_lote
+)
+from services.matching.lead_index import obter_indice_leads
+from services.matching.top_matches import ArmazenamentoTopK, combinar_operacoes, nova_versao
+from services.matching.spatial_index import MARGEM_WATERMARK, calcular_bounding_box, podar_recentes
+from services.matching.vector_scoring import (
+    Vocabulario,
+    BlocoImoveis,
+    CriteriosLeads,
+    calcular_scores
+)
+
+TTL_LOCK_S = 600
+
+# Acima disso o recálculo de leads carrega o portfólio inteiro em vez de caixas
+MAX_CAIXAS_POR_CONSULTA = 50
+
+
+def _chave(cliente_id: str, sufixo: str) -> str:
+    return f"matching:{sufixo}:{cliente_id}"
+
+
+def _redis():
+    from core.redis_config import redis_client
+    return redis_client
+
+
+# ALTERAÇÕES
+
+def _ler_aplicados(redis, chave: str) -> Dict[str, datetime]:
+    return {registro_id: datetime.fromisoformat(data) for registro_id, data in (redis.hgetall(chave) or {}).items()}
+
+
+def _alterados_desde(db, modelo, cliente_id: str, watermark: datetime, aplicados: Dict[str, datetime]):
+    """
+    IDs alterados desde watermark - MARGEM_WATERMARK que ainda não foram
+    aplicados com a mesma data_atualizacao, o novo watermark e os aplicados
+    (atualizado no lugar) podados para a margem
+    """
+    ids = set()
+    novo = watermark
+    for registro_id, data_atualizacao in db.query(modelo.id, modelo.data_atualizacao).filter(
+        modelo.cliente_id == cliente_id,
+        modelo.data_atualizacao >= watermark - MARGEM_WATERMARK
+    ):
+        chave = str(registro_id)
+        if data_atualizacao is not None:
+            if aplicados.get(chave) == data_atualizacao:
+                continue
+            aplicados[chave] = data_atualizacao
+        ids.add(chave)
+        if data_atualizacao and data_atualizacao > novo:
+            novo = data_atualizacao
+    return ids, novo, podar_recentes(aplicados, novo)
+
+
+def _gravar_estado(redis, cliente_id: str, estado: Dict[str, str], aplicados: Dict[str, Dict[str, datetime]]):
+    """Watermarks e aplicados da margem numa transação só"""
+    pipe = redis.pipeline()
+    pipe.hset(_chave(cliente_id, 'watermark'), mapping=estado)
+    for sufixo, registros in aplicados.items():
+        chave = _chave(cliente_id, f'aplicados_{sufixo}')
+        pipe.delete(chave)
+        if registros:
+            pipe.hset(chave, mapping={registro_id: data.isoformat() for registro_id, data in registros.items()})
+    pipe.execute()
+
+
+def _assinatura_config(config) -> str:
+    return f"{config.raio_busca_km}|{int(bool(config.vendas_ativo))}|{int(bool(config.locacao_ativo))}"
+
+
+# RECÁLCULO
+
+def _recalcular_leads(cliente_id: str, config, lead_ids: Set[str]) -> Dict[str, Any]:
+    """Matching completo só para lead_ids, lendo os imóveis dentro do raio deles"""
+    validos = []
+    for lead_id in lead_ids:
+        try:
+            validos.append(uuid.UUID(lead_id))
+        except ValueError:
+            continue
+
+    leads = carregar_leads_payload(cliente_id, lead_ids=validos) if validos else []
+    if not leads:
+        return _resultado_vazio()
+
+    caixas = None
+    if len(leads) <= MAX_CAIXAS_POR_CONSULTA:
+        caixas = [
+            calcular_bounding_box(lead['latitude_centro'], lead['longitude_centro'], lead['raio_busca_km'] or config.raio_busca_km)
+            for lead in leads
+        ]
+    snapshot = SnapshotPortfolio.carregar(cliente_id, caixas=caixas)
+    return casar_leads(snapshot, leads, config.vendas_ativo, config.locacao_ativo, config.raio_busca_km)
+
+
+def _lead_info(interesse) -> Dict[str, Any]:
+    return {
+        "nome": interesse.dados.get('nome'),
+        "telefone": interesse.dados.get('telefone'),
+        "etapa_crm": interesse.dados.get('etapa_crm'),
+        "interesse_venda": interesse.interesse_venda,
+        "interesse_locacao": interesse.interesse_locacao
+    }
+
+
+def _oferecer_imoveis(
+    cliente_id: str,
+    config,
+    imoveis: List[Dict[str, Any]],
+    topk: Dict[str, Dict[str, List[Dict[str, Any]]]],
+    ignorar: Set[str]
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Inserir imóveis alterados no top-K (por operação) dos leads cujo círculo
+    os contém. topk é atualizado no lugar; retorna lead_info dos modificados
+    """
+    indice = obter_indice_leads(cliente_id, config.raio_busca_km or 3)
+    operacoes = {
+        'venda': bool(config.vendas_ativo),
+        'locacao': bool(config.locacao_ativo)
+    }
+    modificados = {}
+
+    for imovel in imoveis:
+        tipo_operacao = imovel['tipo_operacao']
+        if not operacoes.get(tipo_operacao):
+            continue
+
+        candidatos = [
+            (interesse, round(distancia, 2))
+            for interesse, distancia in indice.buscar_leads(imovel)
+            if interesse.lead_id not in ignorar and interesse.dados.get('etapa_crm') in ETAPAS_ATIVAS
+        ]
+        if not candidatos:
+            continue
+
+        vocabulario = Vocabulario()
+        bloco = BlocoImoveis.from_dicts([imovel], vocabulario)
+        criterios = CriteriosLeads.from_dicts([interesse.dados for interesse, _ in candidatos], vocabulario)
+        distancias = np.array([distancia for _, distancia in candidatos])[:, None]
+        scores = calcular_scores(bloco, criterios, distancias=distancias)[:, 0]
+
+        for (interesse, distancia), score in zip(candidatos, scores.tolist()):
+            if score < SCORE_MINIMO:
+                continue
+
+            matches = topk.setdefault(interesse.lead_id, {}).setdefault(tipo_operacao, [])
+            score = round(score, 1)
+            if len(matches) >= MAX_MATCHES_POR_LEAD and score <= matches[-1]['score_compatibilidade']:
+                continue
+
+            matches.append(dict(imovel, distancia_km=distancia, score_compatibilidade=score))
+            matches.sort(key=lambda x: x['score_compatibilidade'], reverse=True)
+            del matches[MAX_MATCHES_POR_LEAD:]
+            modificados[interesse.lead_id] = _lead_info(interesse)
+
+    return modificados
+
+
+def _resultado_vazio() -> Dict[str, Any]:
+    return {
+        "leads_processados": 0,
+        "matches_encontrados": 0,
+        "matches_por_lead": {},
+        "estatisticas": {
+            "vendas": {"leads": 0, "matches": 0},
+            "locacao": {"leads": 0, "matches": 0}
+        }
+    }
+
+
+def _matching_completo(cliente_id: str, config, redis, processos: int) -> Dict[str, Any]:
+    with get_db_session() as db:
+        # Watermarks lidos antes da carga: o que mudar durante a execução entra na próxima
+        marca_imoveis = db.query(func.max(ImovelDual.data_atualizacao)).filter(ImovelDual.cliente_id == cliente_id).scalar()
+        marca_leads = db.query(func.max(LeadCRMIntegrado.data_atualizacao)).filter(LeadCRMIntegrado.cliente_id == cliente_id).scalar()
+
+    resultado = fazer_matching_lote(cliente_id, config, processos=processos)
+    if 'erro' in resultado:
+        return resultado
+
+    versao = nova_versao()
+    ArmazenamentoTopK(cliente_id).substituir_todos(
+        {lead_id: dados["por_operacao"] for lead_id, dados in resultado["matches_por_lead"].items()},
+        versao
+    )
+
+    # Sem aplicados: a primeira execução incremental relê a margem inteira
+    agora = datetime.utcnow()
+    _gravar_estado(redis, cliente_id, {
+        'imoveis': (marca_imoveis or agora).isoformat(),
+        'leads': (marca_leads or agora).isoformat(),
+        'config': _assinatura_config(config)
+    }, {'imoveis': {}, 'leads': {}})
+
+    resultado["modo"] = "completo"
+    resultado["versao"] = versao
+    return resultado
+
+
+def fazer_matching_incremental(cliente_id: str, config, completo: bool = False, processos: int = 0) -> Dict[str, Any]:
+    """
+    Atualizar os top-K materializados do cliente a partir das mudanças desde a
+    última execução. Mesma estrutura de fazer_matching_completo, com
+    matches_por_lead só dos leads cujo top-K mudou.
+    """
+    if not config or not config.auto_matching_ativo:
+        return {"erro": "Matching automático não está ativo"}
+
+    redis = _redis()
+    chave_lock = f"{_chave(cliente_id, 'incremental')}:lock"
+    token = uuid.uuid4().hex
+    if not redis.set(chave_lock, token, nx=True, ex=TTL_LOCK_S):
+        return {"erro": "Matching incremental já em execução para este cliente"}
+
+    try:
+        estado = redis.hgetall(_chave(cliente_id, 'watermark')) or {}
+
+        if completo or not estado.get('imoveis') or estado.get('config') != _assinatura_config(config):
+            return _matching_completo(cliente_id, config, redis, processos)
+
+        inicio = time.perf_counter()
+        armazenamento = ArmazenamentoTopK(cliente_id)
+
+        with get_db_session() as db:
+            imoveis_alterados, marca_imoveis, aplicados_imoveis = _alterados_desde(
+                db, ImovelDual, cliente_id, datetime.fromisoformat(estado['imoveis']),
+                _ler_aplicados(redis, _chave(cliente_id, 'aplicados_imoveis'))
+            )
+            leads_alterados, marca_leads, aplicados_leads = _alterados_desde(
+                db, LeadCRMIntegrado, cliente_id, datetime.fromisoformat(estado['leads']),
+                _ler_aplicados(redis, _chave(cliente_id, 'aplicados_leads'))
+            )
+
+            # Estado atual dos imóveis alterados (ausentes = removidos)
+            uuids = []
+            for imovel_id in imoveis_alterados:
+                try:
+                    uuids.append(uuid.UUID(imovel_id))
+                except ValueError:
+                    continue
+            ativos = []
+            for inicio_lote in range(0, len(uuids), 1000):
+                ativos.extend(
+                    imovel.to_dict() for imovel in db.query(ImovelDual).filter(
+                        ImovelDual.cliente_id == cliente_id,
+                        ImovelDual.id.in_(uuids[inicio_lote:inicio_lote + 1000]),
+                        ImovelDual.ativo == True,
+                        ImovelDual.latitude.isnot(None),
+                        ImovelDual.longitude.isnot(None)
+                    )
+                )
+
+        # Leads que tinham um imóvel alterado no top-K podem perder ou reordenar
+        # posições: recálculo completo deles (o top-K guardado não tem o K+1)
+        recalcular = set(leads_alterados) | armazenamento.leads_com_imoveis(sorted(imoveis_alterados))
+
+        parcial = _recalcular_leads(cliente_id, config, recalcular) if recalcular else _resultado_vazio()
+        novos: Dict[str, Optional[Dict[str, List[Dict[str, Any]]]]] = {lead_id: None for lead_id in recalcular}
+        for lead_id, dados in parcial["matches_por_lead"].items():
+            novos[lead_id] = dados["por_operacao"]
+
+        # Imóveis alterados entram no top-K dos demais leads do raio
+        oferecidos = {}
+        if ativos:
+            indice = obter_indice_leads(cliente_id, config.raio_busca_km or 3)
+            afetados = {
+                interesse.lead_id
+                for imovel in ativos
+                for interesse, _ in indice.buscar_leads(imovel)
+            } - recalcular
+            atuais = copy.deepcopy(armazenamento.obter(sorted(afetados)))
+            oferecidos = _oferecer_imoveis(cliente_id, config, ativos, atuais, recalcular)
+            for lead_id in oferecidos:
+                novos[lead_id] = atuais[lead_id]
+
+        versao = nova_versao()
+        armazenamento.gravar(novos, versao)
+
+        _gravar_estado(redis, cliente_id, {
+            'imoveis': marca_imoveis.isoformat(),
+            'leads': marca_leads.isoformat()
+        }, {'imoveis': aplicados_imoveis, 'leads': aplicados_leads})
+
+        resultado = parcial
+        resultado["leads_processados"] = len(recalcular)
+        for lead_id, lead_info in oferecidos.items():
+            matches = combinar_operacoes(novos[lead_id], MAX_MATCHES_POR_LEAD)
+            resultado["matches_por_lead"][lead_id] = {
+                "lead_info": lead_info,
+                "matches": matches,
+                "por_operacao": novos[lead_id],
+                "total_matches": len(matches)
+            }
+            resultado["matches_encontrados"] += len(matches)
+
+        resultado["modo"] = "incremental"
+        resultado["versao"] = versao
+        resultado["alteracoes"] = {
+            "imoveis_alterados": len(imoveis_alterados),
+            "leads_alterados": len(leads_alterados),
+            "leads_recalculados": len(recalcular),
+            "leads_atualizados": len(novos)
+        }
+        resultado["tempos"] = {"total": round(time.perf_counter() - inicio, 4)}
+
+        logger.info(
+            f"[MATCHING_INCREMENTAL] {cliente_id}: {len(imoveis_alterados)} imóveis e "
+            f"{len(leads_alterados)} leads alterados, {len(novos)} top-K atualizados "
+            f"em {resultado['tempos']['total']:.2f}s"
+        )
+        return resultado
+
+    finally:
+        # Só apaga o lock se ainda for desta execução (TTL pode ter expirado)
+        redis.eval(LIBERAR_LOCK_LUA, 1, chave_lock, token)
@@ -0,0 +1,303 @@
+"""
+Índice de interesse dos leads (matching reverso: imóvel -> leads)
+
+Cada lead ativo registra seu círculo de busca (centro + raio_busca_km) em
+todas as células da grade que o círculo cobre, junto com os filtros rígidos
+usados no matching direto (tipo_imovel, faixa de orçamento, quartos, vagas,
+mobiliado, pets). Um novo imóvel consulta só a célula onde está e recebe os
+leads candidatos sem varrer a base inteira.
+"""
+
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Set, Tuple
+
+from core.logger import logger
+from services.matching.spatial_index import (
+    TAMANHO_CELULA_GRAUS,
+    INTERVALO_SINCRONIZACAO,
+    MARGEM_WATERMARK,
+    haversine_km,
+    podar_recentes,
+    calcular_bounding_box
+)
+
+# Leads com círculo maior que isso (em células) ficam numa lista global
+MAX_CELULAS_POR_LEAD = 400
+
+
+@dataclass
+class InteresseLead:
+    """Círculo de busca e filtros rígidos de um lead"""
+    lead_id: str
+    latitude: float
+    longitude: float
+    raio_km: float
+    interesse_venda: bool
+    interesse_locacao: bool
+    tipo_imovel: Optional[str] = None
+    quartos_min: Optional[int] = None
+    quartos_max: Optional[int] = None
+    vagas_min: Optional[int] = None
+    preco_min: Optional[float] = None
+    preco_max: Optional[float] = None
+    aluguel_max: Optional[float] = None
+    mobiliado: Optional[str] = None
+    aceita_pets: bool = False
+    dados: Dict[str, Any] = field(default_factory=dict)  # lead.to_dict()
+
+    @classmethod
+    def from_lead(cls, lead, raio_padrao_km: float) -> "InteresseLead":
+        return cls(
+            lead_id=str(lead.id),
+            latitude=float(lead.latitude_centro),
+            longitude=float(lead.longitude_centro),
+            raio_km=lead.raio_busca_km or raio_padrao_km,
+            interesse_venda=bool(lead.interesse_venda),
+            interesse_locacao=bool(lead.interesse_locacao),
+            tipo_imovel=lead.tipo_imovel,
+            quartos_min=lead.quartos_min,
+            quartos_max=lead.quartos_max,
+            vagas_min=lead.vagas_min,
+            preco_min=lead.orcamento_min_venda,
+            preco_max=lead.orcamento_max_venda,
+            aluguel_max=lead.orcamento_max_total_mensal,
+            mobiliado=lead.mobiliado_preferencia if lead.mobiliado_preferencia != 'indiferente' else None,
+            aceita_pets=bool(lead.aceita_pets_necessario),
+            dados=lead.to_dict()
+        )
+
+    def aceita_imovel(self, imovel: Dict[str, Any]) -> bool:
+        """Mesmos filtros rígidos que buscar_imoveis_proximos aplica no SQL"""
+        tipo_operacao = imovel.get('tipo_operacao')
+        if tipo_operacao == 'venda':
+            if not self.interesse_venda:
+                return False
+        elif not self.interesse_locacao:
+            return False
+
+        if self.tipo_imovel and imovel.get('tipo_imovel') != self.tipo_imovel:
+            return False
+        if not _no_intervalo(imovel.get('quartos'), self.quartos_min, self.quartos_max):
+            return False
+        if not _no_intervalo(imovel.get('vagas_garagem'), self.vagas_min, None):
+            return False
+
+        if tipo_operacao == 'venda':
+            return _no_intervalo(imovel.get('preco_venda'), self.preco_min, self.preco_max)
+
+        if tipo_operacao == 'locacao':
+            if not _no_intervalo(imovel.get('valor_total_mensal'), None, self.aluguel_max):
+                return False
+            if self.mobiliado and imovel.get('mobiliado') != self.mobiliado:
+                return False
+            if self.aceita_pets and not imovel.get('aceita_pets'):
+                return False
+
+        return True
+
+
+def _no_intervalo(valor, minimo, maximo) -> bool:
+    """Filtro de faixa com semântica SQL: limite ausente não filtra, valor NULL não passa"""
+    if minimo:
+        if valor is None or valor < minimo:
+            return False
+    if maximo:
+        if valor is None or valor > maximo:
+            return False
+    return True
+
+
+class IndiceInteresseLeads:
+    """
+    Índice reverso dos leads de um cliente, mantido incrementalmente
+    a partir de data_atualizacao (sincronização do CRM)
+    """
+
+    def __init__(
+        self,
+        cliente_id: str,
+        raio_padrao_km: float = 3,
+        tamanho_celula: float = TAMANHO_CELULA_GRAUS
+    ):
+        self.cliente_id = cliente_id
+        self.raio_padrao_km = raio_padrao_km
+        self.tamanho_celula = tamanho_celula
+        self._celulas: Dict[Tuple[int, int], Set[str]] = {}
+        self._globais: Set[str] = set()
+        self._leads: Dict[str, InteresseLead] = {}
+        self._celulas_lead: Dict[str, List[Tuple[int, int]]] = {}
+        self.watermark: Optional[datetime] = None
+        self.ultima_sincronizacao: float = 0.0
+        self.desatualizado = True
+        self._recentes: Dict[str, datetime] = {}  # id -> data_atualizacao aplicada, dentro da margem
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._leads)
+
+    def _celula(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (
+            int(math.floor(lat / self.tamanho_celula)),
+            int(math.floor(lng / self.tamanho_celula))
+        )
+
+    # ATUALIZAÇÃO INCREMENTAL
+
+    def registrar(self, interesse: InteresseLead):
+        """Inserir ou atualizar o círculo de interesse de um lead"""
+        with self._lock:
+            self.remover(interesse.lead_id)
+
+            lat_min, lat_max, lng_min, lng_max = calcular_bounding_box(
+                interesse.latitude, interesse.longitude, interesse.raio_km
+            )
+            i_min, j_min = self._celula(lat_min, lng_min)
+            i_max, j_max = self._celula(lat_max, lng_max)
+
+            self._leads[interesse.lead_id] = interesse
+            if (i_max - i_min + 1) * (j_max - j_min + 1) > MAX_CELULAS_POR_LEAD:
+                self._globais.add(interesse.lead_id)
+                self._celulas_lead[interesse.lead_id] = []
+                return
+
+            celulas = [(i, j) for i in range(i_min, i_max + 1) for j in range(j_min, j_max + 1)]
+            for celula in celulas:
+                self._celulas.setdefault(celula, set()).add(interesse.lead_id)
+            self._celulas_lead[interesse.lead_id] = celulas
+
+    def remover(self, lead_id: str) -> bool:
+        """Remover lead do índice"""
+        with self._lock:
+            if self._leads.pop(lead_id, None) is None:
+                return False
+            self._globais.discard(lead_id)
+            for celula in self._celulas_lead.pop(lead_id, []):
+                leads = self._celulas.get(celula)
+                if leads is not None:
+                    leads.discard(lead_id)
+                    if not leads:
+                        del self._celulas[celula]
+            return True
+
+    def atualizar_lead(self, lead):
+        """Aplicar o estado atual de um LeadCRMIntegrado (ativo ou não)"""
+        if lead.ativo and lead.latitude_centro is not None and lead.longitude_centro is not None:
+            self.registrar(InteresseLead.from_lead(lead, self.raio_padrao_km))
+        else:
+            self.remover(str(lead.id))
+
+    def marcar_desatualizado(self):
+        self.desatualizado = True
+
+    def _precisa_sincronizar(self) -> bool:
+        if self.desatualizado:
+            return True
+        return time.time() - self.ultima_sincronizacao > INTERVALO_SINCRONIZACAO
+
+    def sincronizar(self, db=None) -> int:
+        """
+        Carga completa na primeira vez, depois só leads alterados desde o
+        watermark. Retorna o número de linhas lidas.
+        """
+        with self._lock:
+            if db is None:
+                from core.database import get_db_session
+                with get_db_session() as sessao:
+                    return self._sincronizar(sessao)
+            return self._sincronizar(db)
+
+    def _sincronizar(self, db) -> int:
+        from models.lead_crm_integrado import LeadCRMIntegrado
+
+        carga_completa = self.watermark is None
+        query = db.query(LeadCRMIntegrado).filter(LeadCRMIntegrado.cliente_id == self.cliente_id)
+
+        if carga_completa:
+            query = query.filter(
+                LeadCRMIntegrado.ativo == True,
+                LeadCRMIntegrado.latitude_centro.isnot(None),
+                LeadCRMIntegrado.longitude_centro.isnot(None)
+            )
+            recentes: Dict[str, datetime] = {}
+        else:
+            # Releitura da margem: transações do CRM commitam fora de ordem
+            query = query.filter(LeadCRMIntegrado.data_atualizacao >= self.watermark - MARGEM_WATERMARK)
+            recentes = self._recentes
+
+        linhas = 0
+        watermark = self.watermark
+        for lead in query:
+            linhas += 1
+            chave = str(lead.id)
+            if lead.data_atualizacao is not None:
+                if recentes.get(chave) == lead.data_atualizacao:
+                    continue
+                recentes[chave] = lead.data_atualizacao
+            self.atualizar_lead(lead)
+            if lead.data_atualizacao and (watermark is None or lead.data_atualizacao > watermark):
+                watermark = lead.data_atualizacao
+
+        self.watermark = watermark or datetime.utcnow()
+        self._recentes = podar_recentes(recentes, self.watermark)
+        self.ultima_sincronizacao = time.time()
+        self.desatualizado = False
+
+        logger.debug(
+            f"[LEAD_INDEX] {self.cliente_id}: {'carga completa' if carga_completa else 'delta'} "
+            f"({linhas} linhas, {len(self._leads)} leads no índice)"
+        )
+        return linhas
+
+    # CONSULTA
+
+    def buscar_leads(self, imovel: Dict[str, Any], db=None) -> List[Tuple[InteresseLead, float]]:
+        """
+        Leads cujo círculo contém o imóvel e cujos filtros rígidos ele atende
+        Retorna lista de (interesse, distancia_km)
+        """
+        if self._precisa_sincronizar():
+            self.sincronizar(db)
+
+        lat = imovel.get('latitude')
+        lng = imovel.get('longitude')
+        if lat is None or lng is None:
+            return []
+
+        with self._lock:
+            candidatos = set(self._celulas.get(self._celula(lat, lng), ()))
+            candidatos.update(self._globais)
+            interesses = [self._leads[lead_id] for lead_id in candidatos]
+
+        encontrados = []
+        for interesse in interesses:
+            distancia = haversine_km(lat, lng, interesse.latitude, interesse.longitude)
+            if distancia <= interesse.raio_km and interesse.aceita_imovel(imovel):
+                encontrados.append((interesse, distancia))
+        return encontrados
+
+
+# REGISTRO DE ÍNDICES POR CLIENTE (um por processo)
+
+_indices_leads: Dict[str, IndiceInteresseLeads] = {}
+_indices_lock = threading.Lock()
+
+
+def obter_indice_leads(cliente_id: str, raio_padrao_km: float = 3) -> IndiceInteresseLeads:
+    """Obter (ou criar) o índice de interesse dos leads do cliente"""
+    with _indices_lock:
+        indice = _indices_leads.get(cliente_id)
+        if indice is None or indice.raio_padrao_km != raio_padrao_km:
+            indice = IndiceInteresseLeads(cliente_id, raio_padrao_km)
+            _indices_leads[cliente_id] = indice
+        return indice
+
+
+def marcar_indice_leads_desatualizado(cliente_id: str):
+    """Avisar que leads do cliente mudaram (sincronização do CRM)"""
+    indice = _indices_leads.get(cliente_id)
+    if indice is not None:
+        indice.marcar_desatualizado()
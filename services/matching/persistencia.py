@@ -0,0 +1,165 @@
+"""
+Gravação em lote da tabela matchings (models.lead.Matching)
+
+Um INSERT ... ON CONFLICT (lead_id, imovel_id) DO UPDATE por lote de linhas,
+em vez de SELECT + insert/update pelo ORM para cada par. Usado pelo
+MatchingEngine (services.ai_matching) e pelo matching geográfico.
+
+O conflito só atualiza os scores e motivos presentes na linha e
+data_atualizacao: o matching geográfico (só score_geral e motivos) não
+apaga os scores parciais do MatchingEngine, e status, envio pelo WhatsApp
+e feedback do lead continuam os do match existente.
+"""
+
+import uuid
+from typing import Dict, Any, List, Iterable, Optional
+
+from sqlalchemy import case, delete, func, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from core.logger import logger
+from models.lead import Matching
+
+TAMANHO_LOTE = 1000
+
+CAMPOS_ATUALIZADOS = (
+    'score_geral',
+    'score_preco',
+    'score_localizacao',
+    'score_caracteristicas',
+    'score_ia',
+    'motivos_match',
+    'pontos_atencao'
+)
+
+_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert
+}
+
+# Engines em que o índice único já foi conferido neste processo
+_indices_verificados = set()
+
+
+def garantir_indice_unico(bind):
+    """
+    Criar uq_matchings_lead_imovel se ainda não existir (create_all não altera
+    tabelas já criadas). Pares duplicados gravados pelo caminho antigo
+    (SELECT + insert) são removidos antes (ver _remover_pares_duplicados).
+    """
+    engine = getattr(bind, 'engine', bind)
+    if id(engine) in _indices_verificados:
+        return
+
+    indice = next(i for i in Matching.__table__.indexes if i.name == 'uq_matchings_lead_imovel')
+    inspetor = inspect(engine)
+    if inspetor.has_table(Matching.__tablename__) and indice.name not in {
+        i['name'] for i in inspetor.get_indexes(Matching.__tablename__)
+    }:
+        with engine.begin() as conn:
+            removidos = _remover_pares_duplicados(conn)
+            if removidos:
+                logger.warning(f"[MATCHING] {removidos} matches duplicados removidos antes do índice único")
+            indice.create(bind=conn)
+        logger.info(f"Índice {indice.name} criado")
+    _indices_verificados.add(id(engine))
+
+
+def _remover_pares_duplicados(conn) -> int:
+    """
+    Apagar todas as linhas de cada (lead_id, imovel_id) menos uma: fica a que
+    tem feedback do lead, depois a enviada pelo WhatsApp, depois a com status
+    além de 'novo' e, no empate, a mais recente
+    """
+    ordem = func.row_number().over(
+        partition_by=(Matching.lead_id, Matching.imovel_id),
+        order_by=(
+            case((Matching.feedback_lead.isnot(None), 0), else_=1),
+            case((Matching.enviado_whatsapp == True, 0), else_=1),
+            case((func.coalesce(Matching.status, 'novo') != 'novo', 0), else_=1),
+            Matching.data_envio.desc().nulls_last(),
+            Matching.data_atualizacao.desc().nulls_last(),
+            Matching.data_criacao.desc().nulls_last(),
+            Matching.id.desc()
+        )
+    ).label('ordem')
+    numeradas = select(Matching.id, ordem).subquery()
+    excedentes = select(numeradas.c.id).where(numeradas.c.ordem > 1)
+    return conn.execute(delete(Matching).where(Matching.id.in_(excedentes))).rowcount or 0
+
+
+def _deduplicar(linhas: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # O mesmo par duas vezes no mesmo INSERT ... ON CONFLICT é erro no Postgres
+    por_par = {}
+    for linha in linhas:
+        por_par[(linha['lead_id'], linha['imovel_id'])] = linha
+    return list(por_par.values())
+
+
+def salvar_matchings(db, linhas: Iterable[Dict[str, Any]]) -> int:
+    """
+    Upsert de matches na sessão db (commit fica com quem chamou)
+    linhas: dicts com lead_id, imovel_id, cliente_id e os campos de score;
+    campos ausentes da linha não são alterados num match existente
+    """
+    linhas = _deduplicar(linhas)
+    if not linhas:
+        return 0
+
+    bind = db.get_bind()
+    garantir_indice_unico(bind)
+
+    insert = _INSERTS.get(bind.dialect.name)
+    if insert is None:
+        raise ValueError(f"Upsert de matchings não suportado no banco {bind.dialect.name}")
+
+    # Um statement por conjunto de campos presentes (set_ só com esses campos)
+    por_campos: Dict[tuple, List[Dict[str, Any]]] = {}
+    for linha in linhas:
+        campos = tuple(campo for campo in CAMPOS_ATUALIZADOS if campo in linha)
+        por_campos.setdefault(campos, []).append(linha)
+
+    for campos, grupo in por_campos.items():
+        stmt = insert(Matching)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['lead_id', 'imovel_id'],
+            set_={
+                **{campo: stmt.excluded[campo] for campo in campos},
+                'data_atualizacao': func.now()
+            }
+        )
+
+        for inicio in range(0, len(grupo), TAMANHO_LOTE):
+            lote = [
+                {
+                    'id': linha.get('id') or str(uuid.uuid4()),
+                    'lead_id': str(linha['lead_id']),
+                    'imovel_id': str(linha['imovel_id']),
+                    'cliente_id': linha['cliente_id'],
+                    **{campo: linha[campo] for campo in campos}
+                }
+                for linha in grupo[inicio:inicio + TAMANHO_LOTE]
+            ]
+            db.execute(stmt, lote)
+
+    logger.info(f"[MATCHING] {len(linhas)} matches gravados em lote")
+    return len(linhas)
+
+
+def linhas_matching_geo(cliente_id: str, matches_por_lead: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Converter matches_por_lead do matching geográfico (score 0-100) em linhas
+    da tabela matchings (score 0-1)
+    """
+    linhas = []
+    for lead_id, dados in matches_por_lead.items():
+        for match in dados.get('matches', []):
+            distancia: Optional[float] = match.get('distancia_km')
+            linhas.append({
+                'lead_id': lead_id,
+                'imovel_id': match['id'],
+                'cliente_id': cliente_id,
+                'score_geral': round(match['score_compatibilidade'] / 100, 3),
+                'motivos_match': [f"A {distancia} km do centro de busca"] if distancia is not None else []
+            })
+    return linhas
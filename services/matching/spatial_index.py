@@ -0,0 +1,287 @@
+"""
+Índice espacial em memória para o matching geográfico
+
+Grade regular (lat/lng) por cliente: cada célula guarda os imóveis cujas
+coordenadas caem nela. Uma busca por raio só visita as células que cobrem o
+bounding box do círculo, então o custo cresce com o número de imóveis
+próximos e não com o tamanho do portfólio.
+
+O delta relê MARGEM_WATERMARK antes do watermark: data_atualizacao é o
+início da transação (now() no Postgres) e transações longas commitam fora
+de ordem. IDs já aplicados com a mesma data_atualizacao são pulados.
+"""
+
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple, Iterable
+
+from core.logger import logger
+
+# Raio médio da Terra em km (mesmo valor usado no GeoMatchingEngine)
+RAIO_TERRA_KM = 6371.0
+
+# Tamanho padrão da célula em graus (~1.1 km no equador)
+TAMANHO_CELULA_GRAUS = 0.01
+
+# Intervalo máximo entre sincronizações incrementais com o banco (segundos)
+INTERVALO_SINCRONIZACAO = 60
+
+# Releitura antes do watermark (maior que a transação de escrita mais longa)
+MARGEM_WATERMARK = timedelta(minutes=15)
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distância entre dois pontos em km (fórmula de Haversine)"""
+    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
+    return 2 * math.asin(math.sqrt(a)) * RAIO_TERRA_KM
+
+
+def calcular_bounding_box(lat: float, lng: float, raio_km: float) -> Tuple[float, float, float, float]:
+    """
+    Bounding box (lat_min, lat_max, lng_min, lng_max) que contém o círculo
+    de raio_km em torno do ponto
+    """
+    distancia_angular = raio_km / RAIO_TERRA_KM
+    delta_lat = math.degrees(distancia_angular)
+
+    # Extensão máxima em longitude do círculo na esfera
+    seno = math.sin(distancia_angular)
+    cos_lat = math.cos(math.radians(lat))
+    if seno >= cos_lat:
+        delta_lng = 180.0
+    else:
+        delta_lng = math.degrees(math.asin(seno / cos_lat))
+    return lat - delta_lat, lat + delta_lat, lng - delta_lng, lng + delta_lng
+
+
+def podar_recentes(recentes: Dict[str, datetime], watermark: datetime) -> Dict[str, datetime]:
+    """Manter só os IDs aplicados dentro da margem de releitura do watermark"""
+    limite = watermark - MARGEM_WATERMARK
+    return {chave: data for chave, data in recentes.items() if data >= limite}
+
+
+class GradeEspacial:
+    """
+    Grade de células lat/lng com inserção, remoção e busca por raio
+    """
+
+    def __init__(self, tamanho_celula: float = TAMANHO_CELULA_GRAUS):
+        self.tamanho_celula = tamanho_celula
+        self._celulas: Dict[Tuple[int, int], Dict[Any, Tuple[float, float, Any]]] = {}
+        self._posicoes: Dict[Any, Tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._posicoes)
+
+    def __contains__(self, chave: Any) -> bool:
+        return chave in self._posicoes
+
+    def _celula(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (
+            int(math.floor(lat / self.tamanho_celula)),
+            int(math.floor(lng / self.tamanho_celula))
+        )
+
+    def inserir(self, chave: Any, lat: float, lng: float, dados: Any = None):
+        """Inserir ou mover um ponto na grade"""
+        self.remover(chave)
+        celula = self._celula(lat, lng)
+        self._celulas.setdefault(celula, {})[chave] = (lat, lng, dados)
+        self._posicoes[chave] = celula
+
+    def remover(self, chave: Any) -> bool:
+        """Remover um ponto da grade"""
+        celula = self._posicoes.pop(chave, None)
+        if celula is None:
+            return False
+        pontos = self._celulas.get(celula)
+        if pontos is not None:
+            pontos.pop(chave, None)
+            if not pontos:
+                del self._celulas[celula]
+        return True
+
+    def limpar(self):
+        self._celulas.clear()
+        self._posicoes.clear()
+
+    def celulas_no_retangulo(
+        self,
+        lat_min: float,
+        lat_max: float,
+        lng_min: float,
+        lng_max: float
+    ) -> Iterable[Dict[Any, Tuple[float, float, Any]]]:
+        """Células ocupadas que intersectam o retângulo"""
+        i_min, j_min = self._celula(lat_min, lng_min)
+        i_max, j_max = self._celula(lat_max, lng_max)
+
+        total_celulas = (i_max - i_min + 1) * (j_max - j_min + 1)
+        if total_celulas > len(self._celulas):
+            # Retângulo maior que a área ocupada: varrer só as células existentes
+            for (i, j), pontos in self._celulas.items():
+                if i_min <= i <= i_max and j_min <= j <= j_max:
+                    yield pontos
+            return
+
+        for i in range(i_min, i_max + 1):
+            for j in range(j_min, j_max + 1):
+                pontos = self._celulas.get((i, j))
+                if pontos:
+                    yield pontos
+
+    def buscar_raio(self, lat: float, lng: float, raio_km: float) -> List[Tuple[Any, float, Any]]:
+        """
+        Buscar pontos dentro do raio
+        Retorna lista de (chave, distancia_km, dados) ordenada por distância
+        """
+        lat_min, lat_max, lng_min, lng_max = calcular_bounding_box(lat, lng, raio_km)
+
+        encontrados = []
+        for pontos in self.celulas_no_retangulo(lat_min, lat_max, lng_min, lng_max):
+            for chave, (p_lat, p_lng, dados) in pontos.items():
+                if not (lat_min <= p_lat <= lat_max and lng_min <= p_lng <= lng_max):
+                    continue
+                distancia = haversine_km(lat, lng, p_lat, p_lng)
+                if distancia <= raio_km:
+                    encontrados.append((chave, distancia, dados))
+
+        encontrados.sort(key=lambda x: x[1])
+        return encontrados
+
+
+class IndiceEspacialImoveis:
+    """
+    Índice espacial dos imóveis ativos (ImovelDual) de um cliente
+
+    Carrega apenas (id, latitude, longitude, tipo_operacao) do banco e é
+    mantido incrementalmente usando data_atualizacao como watermark: nenhum
+    código grava imoveis_dual, então alterações externas entram na próxima
+    sincronização (no máximo INTERVALO_SINCRONIZACAO depois).
+    """
+
+    def __init__(self, cliente_id: str, tamanho_celula: float = TAMANHO_CELULA_GRAUS):
+        self.cliente_id = cliente_id
+        self.grade = GradeEspacial(tamanho_celula)
+        self.watermark: Optional[datetime] = None
+        self.ultima_sincronizacao: float = 0.0
+        self.desatualizado = True
+        self._recentes: Dict[str, datetime] = {}  # id -> data_atualizacao aplicada, dentro da margem
+        self._lock = threading.RLock()
+
+    def _precisa_sincronizar(self) -> bool:
+        if self.desatualizado:
+            return True
+        return time.time() - self.ultima_sincronizacao > INTERVALO_SINCRONIZACAO
+
+    def sincronizar(self, db=None) -> int:
+        """
+        Sincronizar o índice com o banco
+        Na primeira carga lê todos os imóveis com coordenadas; depois só os
+        alterados desde o último watermark. Retorna o número de linhas lidas.
+        """
+        from models.imovel_dual import ImovelDual
+
+        with self._lock:
+            if db is None:
+                from core.database import get_db_session
+                with get_db_session() as sessao:
+                    return self._sincronizar(sessao, ImovelDual)
+            return self._sincronizar(db, ImovelDual)
+
+    def _sincronizar(self, db, ImovelDual) -> int:
+        carga_completa = self.watermark is None
+
+        query = db.query(
+            ImovelDual.id,
+            ImovelDual.latitude,
+            ImovelDual.longitude,
+            ImovelDual.tipo_operacao,
+            ImovelDual.ativo,
+            ImovelDual.data_atualizacao
+        ).filter(ImovelDual.cliente_id == self.cliente_id)
+
+        if carga_completa:
+            query = query.filter(
+                ImovelDual.ativo == True,
+                ImovelDual.latitude.isnot(None),
+                ImovelDual.longitude.isnot(None)
+            )
+            recentes: Dict[str, datetime] = {}
+        else:
+            query = query.filter(ImovelDual.data_atualizacao >= self.watermark - MARGEM_WATERMARK)
+            recentes = self._recentes
+
+        linhas = 0
+        watermark = self.watermark
+        for imovel_id, lat, lng, tipo_operacao, ativo, data_atualizacao in query:
+            linhas += 1
+            chave = str(imovel_id)
+            if data_atualizacao is not None:
+                # Já aplicado numa sincronização anterior (releitura da margem)
+                if recentes.get(chave) == data_atualizacao:
+                    continue
+                recentes[chave] = data_atualizacao
+            if ativo and lat is not None and lng is not None:
+                self.grade.inserir(chave, float(lat), float(lng), tipo_operacao)
+            else:
+                self.grade.remover(chave)
+
+            if data_atualizacao and (watermark is None or data_atualizacao > watermark):
+                watermark = data_atualizacao
+
+        self.watermark = watermark or datetime.utcnow()
+        self._recentes = podar_recentes(recentes, self.watermark)
+        self.ultima_sincronizacao = time.time()
+        self.desatualizado = False
+
+        logger.debug(
+            f"[GEO_INDEX] {self.cliente_id}: {'carga completa' if carga_completa else 'delta'} "
+            f"({linhas} linhas, {len(self.grade)} imóveis no índice)"
+        )
+        return linhas
+
+    def buscar(
+        self,
+        lat: float,
+        lng: float,
+        raio_km: float,
+        tipo_operacao: str = None,
+        db=None
+    ) -> List[Tuple[str, float]]:
+        """
+        Buscar imóveis no raio
+        Retorna lista de (imovel_id, distancia_km) ordenada por distância
+        """
+        if self._precisa_sincronizar():
+            self.sincronizar(db)
+
+        with self._lock:
+            encontrados = self.grade.buscar_raio(lat, lng, raio_km)
+
+        return [
+            (chave, distancia)
+            for chave, distancia, tipo in encontrados
+            if not tipo_operacao or tipo == tipo_operacao
+        ]
+
+
+# REGISTRO DE ÍNDICES POR CLIENTE (um por processo)
+
+_indices_imoveis: Dict[str, IndiceEspacialImoveis] = {}
+_indices_lock = threading.Lock()
+
+
+def obter_indice_imoveis(cliente_id: str) -> IndiceEspacialImoveis:
+    """Obter (ou criar) o índice espacial de imóveis do cliente"""
+    with _indices_lock:
+        indice = _indices_imoveis.get(cliente_id)
+        if indice is None:
+            indice = IndiceEspacialImoveis(cliente_id)
+            _indices_imoveis[cliente_id] = indice
+        return indice
@@ -0,0 +1,165 @@
+"""
+Top-K materializado por lead e tipo de operação (tabela lead_top_matches)
+
+Mantido pelo matching geográfico (completo e incremental); Carol, dashboard
+e API leem daqui em vez de recalcular. A leitura de um lead é uma consulta
+pela chave primária (lead_id, tipo_operacao, posicao).
+"""
+
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Set
+
+from sqlalchemy import insert, delete, func
+
+from core.database import get_db_session
+from models.lead_top_match import LeadTopMatch
+
+TAMANHO_LOTE = 1000
+
+# Campos do match que não fazem parte de ImovelDual.to_dict()
+CAMPOS_MATCH = ('score_compatibilidade', 'distancia_km')
+
+
+def nova_versao() -> int:
+    """Carimbo da execução do matching (ms desde epoch)"""
+    return int(time.time() * 1000)
+
+
+def _uuids(ids) -> List[uuid.UUID]:
+    validos = []
+    for valor in ids:
+        try:
+            validos.append(uuid.UUID(str(valor)))
+        except ValueError:
+            continue
+    return validos
+
+
+def _lotes(valores: List[Any]):
+    for inicio in range(0, len(valores), TAMANHO_LOTE):
+        yield valores[inicio:inicio + TAMANHO_LOTE]
+
+
+class ArmazenamentoTopK:
+    """Leitura e escrita dos top-K de um cliente"""
+
+    def __init__(self, cliente_id: str):
+        self.cliente_id = cliente_id
+
+    def obter(self, lead_ids: List[str]) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        """lead_id -> {tipo_operacao: [matches em ordem]}"""
+        resultado: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        with get_db_session() as db:
+            for lote in _lotes(_uuids(lead_ids)):
+                linhas = db.query(LeadTopMatch).filter(
+                    LeadTopMatch.lead_id.in_(lote)
+                ).order_by(LeadTopMatch.lead_id, LeadTopMatch.tipo_operacao, LeadTopMatch.posicao)
+                for linha in linhas:
+                    match = {
+                        **(linha.dados_imovel or {}),
+                        'score_compatibilidade': linha.score_compatibilidade,
+                        'distancia_km': linha.distancia_km
+                    }
+                    resultado.setdefault(str(linha.lead_id), {}).setdefault(linha.tipo_operacao, []).append(match)
+        return resultado
+
+    def leads_com_imoveis(self, imovel_ids: List[str]) -> Set[str]:
+        """Leads cujo top-K contém algum dos imóveis"""
+        leads = set()
+        with get_db_session() as db:
+            for lote in _lotes(_uuids(imovel_ids)):
+                leads.update(
+                    str(lead_id) for (lead_id,) in db.query(LeadTopMatch.lead_id).filter(
+                        LeadTopMatch.cliente_id == self.cliente_id,
+                        LeadTopMatch.imovel_id.in_(lote)
+                    ).distinct()
+                )
+        return leads
+
+    def gravar(self, novos: Dict[str, Optional[Dict[str, List[Dict[str, Any]]]]], versao: int):
+        """
+        Substituir o top-K dos leads em novos (None ou vazio remove)
+        novos: lead_id -> {tipo_operacao: [matches em ordem]}
+        """
+        with get_db_session() as db:
+            for lote in _lotes(_uuids(novos)):
+                db.execute(delete(LeadTopMatch).where(LeadTopMatch.lead_id.in_(lote)))
+            self._inserir(db, novos, versao)
+
+    def substituir_todos(self, novos: Dict[str, Dict[str, List[Dict[str, Any]]]], versao: int):
+        """
+        Matching completo: apagar o top-K do cliente e gravar novos
+        Na mesma transação: leitores veem o top-K anterior até o commit e
+        uma falha no insert mantém o anterior
+        """
+        with get_db_session() as db:
+            db.execute(delete(LeadTopMatch).where(LeadTopMatch.cliente_id == self.cliente_id))
+            self._inserir(db, novos, versao)
+
+    def _inserir(self, db, novos: Dict[str, Optional[Dict[str, List[Dict[str, Any]]]]], versao: int):
+        agora = datetime.utcnow()
+        linhas = []
+        for lead_id, por_operacao in novos.items():
+            for tipo_operacao, matches in (por_operacao or {}).items():
+                for posicao, match in enumerate(matches, 1):
+                    linhas.append({
+                        'lead_id': uuid.UUID(lead_id),
+                        'tipo_operacao': tipo_operacao,
+                        'posicao': posicao,
+                        'cliente_id': self.cliente_id,
+                        'imovel_id': uuid.UUID(match['id']),
+                        'score_compatibilidade': match['score_compatibilidade'],
+                        'distancia_km': match.get('distancia_km'),
+                        'dados_imovel': {k: v for k, v in match.items() if k not in CAMPOS_MATCH},
+                        'versao': versao,
+                        'data_atualizacao': agora
+                    })
+
+        for lote in _lotes(linhas):
+            db.execute(insert(LeadTopMatch), lote)
+
+
+def combinar_operacoes(por_operacao: Dict[str, List[Dict[str, Any]]], limite: int) -> List[Dict[str, Any]]:
+    """Melhores matches entre venda e locação"""
+    matches = [match for lista in por_operacao.values() for match in lista]
+    matches.sort(key=lambda x: x['score_compatibilidade'], reverse=True)
+    return matches[:limite]
+
+
+def obter_top_matches(
+    lead_id: str,
+    tipo_operacao: Optional[str] = None,
+    limite: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Melhores imóveis atuais de um lead, do maior score para o menor"""
+    try:
+        chave = uuid.UUID(str(lead_id))
+    except ValueError:
+        return []
+
+    with get_db_session() as db:
+        query = db.query(LeadTopMatch).filter(LeadTopMatch.lead_id == chave)
+        if tipo_operacao:
+            query = query.filter(LeadTopMatch.tipo_operacao == tipo_operacao)
+        matches = [linha.to_dict() for linha in query.order_by(LeadTopMatch.tipo_operacao, LeadTopMatch.posicao)]
+
+    matches.sort(key=lambda x: x['score_compatibilidade'], reverse=True)
+    return matches[:limite] if limite else matches
+
+
+def estatisticas_top_matches(cliente_id: str) -> Dict[str, Any]:
+    with get_db_session() as db:
+        leads, linhas, versao = db.query(
+            func.count(func.distinct(LeadTopMatch.lead_id)),
+            func.count(),
+            func.max(LeadTopMatch.versao)
+        ).filter(LeadTopMatch.cliente_id == cliente_id).one()
+
+    return {
+        'leads_com_matches': leads,
+        'matches_materializados': linhas,
+        'versao': versao,
+        'atualizado_em': datetime.utcfromtimestamp(versao / 1000).isoformat() if versao else None
+    }
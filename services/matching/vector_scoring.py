@@ -0,0 +1,289 @@
+"""
+Score de compatibilidade vetorizado (NumPy)
+
+Versão colunar de GeoMatchingEngine.calcular_score_compatibilidade: recebe
+um bloco de imóveis em struct-of-arrays e um ou vários leads, e devolve a
+matriz de scores (leads x imóveis) com as mesmas regras e pesos.
+
+Diferença intencional: campos numéricos com valor None são tratados como
+ausentes (usa o default do .get), onde a versão por dicionário lançaria
+TypeError na comparação.
+"""
+
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Sequence
+
+import numpy as np
+
+# Pesos (iguais aos de calcular_score_compatibilidade)
+PESO_PROXIMIDADE = 30.0
+PESO_PRECO = 25.0
+PESO_CARACTERISTICAS = 25.0
+PESO_EXTRAS = 20.0
+PESO_TOTAL = PESO_PROXIMIDADE + PESO_PRECO + PESO_CARACTERISTICAS + PESO_EXTRAS
+
+OPERACAO_VENDA = 0
+OPERACAO_LOCACAO = 1
+OPERACAO_OUTRA = 2
+
+
+class Vocabulario:
+    """Codificação de valores categóricos (inclusive None) em inteiros"""
+
+    def __init__(self):
+        self._codigos: Dict[Any, int] = {}
+
+    def codigo(self, valor: Any) -> int:
+        codigo = self._codigos.get(valor)
+        if codigo is None:
+            codigo = len(self._codigos)
+            self._codigos[valor] = codigo
+        return codigo
+
+    def codificar(self, valores: Sequence[Any]) -> np.ndarray:
+        return np.fromiter((self.codigo(v) for v in valores), dtype=np.int32, count=len(valores))
+
+
+def _numero(valor: Any, default: float) -> float:
+    return default if valor is None else float(valor)
+
+
+def _operacao(valor: Any) -> int:
+    if valor == 'venda':
+        return OPERACAO_VENDA
+    if valor == 'locacao':
+        return OPERACAO_LOCACAO
+    return OPERACAO_OUTRA
+
+
+@dataclass
+class BlocoImoveis:
+    """Imóveis em formato colunar"""
+    operacao: np.ndarray
+    preco_venda: np.ndarray
+    valor_total_mensal: np.ndarray
+    quartos: np.ndarray
+    vagas_garagem: np.ndarray
+    area_total: np.ndarray
+    aceita_pets: np.ndarray
+    mobiliado: np.ndarray
+    tipo_imovel: np.ndarray
+    distancia_km: np.ndarray  # NaN quando o imóvel não tem distância
+    vocabulario: Vocabulario
+
+    def __len__(self) -> int:
+        return len(self.operacao)
+
+    @classmethod
+    def from_dicts(cls, imoveis: List[Dict[str, Any]], vocabulario: Vocabulario = None) -> "BlocoImoveis":
+        vocabulario = vocabulario or Vocabulario()
+        n = len(imoveis)
+        nan = float('nan')
+
+        return cls(
+            operacao=np.fromiter((_operacao(i['tipo_operacao']) for i in imoveis), dtype=np.int8, count=n),
+            preco_venda=np.fromiter((_numero(i.get('preco_venda', 0), 0.0) for i in imoveis), dtype=np.float64, count=n),
+            valor_total_mensal=np.fromiter((_numero(i.get('valor_total_mensal', 0), 0.0) for i in imoveis), dtype=np.float64, count=n),
+            quartos=np.fromiter((_numero(i.get('quartos', 0), 0.0) for i in imoveis), dtype=np.float64, count=n),
+            vagas_garagem=np.fromiter((_numero(i.get('vagas_garagem', 0), 0.0) for i in imoveis), dtype=np.float64, count=n),
+            area_total=np.fromiter((_numero(i.get('area_total', 0), 0.0) for i in imoveis), dtype=np.float64, count=n),
+            aceita_pets=np.fromiter((bool(i.get('aceita_pets')) for i in imoveis), dtype=bool, count=n),
+            mobiliado=vocabulario.codificar([i.get('mobiliado', 'nao') for i in imoveis]),
+            tipo_imovel=vocabulario.codificar([i.get('tipo_imovel') for i in imoveis]),
+            distancia_km=np.fromiter(
+                (_numero(i['distancia_km'], nan) if 'distancia_km' in i else nan for i in imoveis),
+                dtype=np.float64, count=n
+            ),
+            vocabulario=vocabulario
+        )
+
+
+@dataclass
+class CriteriosLeads:
+    """Critérios de um ou vários leads em formato colunar"""
+    orcamento_min_venda: np.ndarray
+    orcamento_max_venda: np.ndarray
+    orcamento_max_total_mensal: np.ndarray
+    tem_tipo_imovel: np.ndarray
+    tipo_imovel: np.ndarray
+    quartos_min: np.ndarray
+    quartos_max: np.ndarray
+    vagas_min: np.ndarray
+    aceita_pets_necessario: np.ndarray
+    mobiliado_preferencia: np.ndarray
+    area_min: np.ndarray
+    area_max: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.quartos_min)
+
+    @classmethod
+    def from_dicts(cls, leads: List[Dict[str, Any]], vocabulario: Vocabulario) -> "CriteriosLeads":
+        n = len(leads)
+        inf = float('inf')
+
+        def coluna(campo: str, default: float) -> np.ndarray:
+            return np.fromiter((_numero(l.get(campo, default), default) for l in leads), dtype=np.float64, count=n)
+
+        return cls(
+            orcamento_min_venda=coluna('orcamento_min_venda', 0.0),
+            orcamento_max_venda=coluna('orcamento_max_venda', inf),
+            orcamento_max_total_mensal=coluna('orcamento_max_total_mensal', inf),
+            tem_tipo_imovel=np.fromiter((bool(l.get('tipo_imovel')) for l in leads), dtype=bool, count=n),
+            tipo_imovel=vocabulario.codificar([l.get('tipo_imovel') for l in leads]),
+            quartos_min=coluna('quartos_min', 0.0),
+            quartos_max=coluna('quartos_max', inf),
+            vagas_min=coluna('vagas_min', 0.0),
+            aceita_pets_necessario=np.fromiter((bool(l.get('aceita_pets_necessario')) for l in leads), dtype=bool, count=n),
+            mobiliado_preferencia=vocabulario.codificar([l.get('mobiliado_preferencia', 'indiferente') for l in leads]),
+            area_min=coluna('area_min', 0.0),
+            area_max=coluna('area_max', inf)
+        )
+
+
+def distancias_haversine(
+    lat_leads: np.ndarray,
+    lng_leads: np.ndarray,
+    lat_imoveis: np.ndarray,
+    lng_imoveis: np.ndarray
+) -> np.ndarray:
+    """Matriz de distâncias (leads x imóveis) em km"""
+    lat1 = np.radians(np.asarray(lat_leads, dtype=np.float64))[:, None]
+    lng1 = np.radians(np.asarray(lng_leads, dtype=np.float64))[:, None]
+    lat2 = np.radians(np.asarray(lat_imoveis, dtype=np.float64))[None, :]
+    lng2 = np.radians(np.asarray(lng_imoveis, dtype=np.float64))[None, :]
+
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * np.arcsin(np.sqrt(a)) * 6371
+
+
+def calcular_scores(
+    bloco: BlocoImoveis,
+    criterios: CriteriosLeads,
+    distancias: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Calcular matriz de scores (leads x imóveis), de 0 a 100
+
+    distancias: opcional, (imóveis,) ou (leads, imóveis); NaN = sem distância.
+    Se omitido, usa bloco.distancia_km.
+    """
+    vocab = bloco.vocabulario
+    inf = float('inf')
+
+    def lead(coluna: np.ndarray) -> np.ndarray:
+        return coluna[:, None]
+
+    venda = (bloco.operacao == OPERACAO_VENDA)[None, :]
+    locacao = (bloco.operacao == OPERACAO_LOCACAO)[None, :]
+
+    # PESO 1: Proximidade geográfica
+    dist = bloco.distancia_km if distancias is None else np.asarray(distancias, dtype=np.float64)
+    dist = np.broadcast_to(dist, (len(criterios), len(bloco)))
+    with np.errstate(invalid='ignore'):
+        score_proximidade = np.maximum(0, 100 - (dist / 3.0 * 100))
+    score = np.where(np.isnan(dist), 0.0, score_proximidade * (PESO_PROXIMIDADE / 100))
+
+    # PESO 2: Faixa de preço
+    preco = bloco.preco_venda[None, :]
+    preco_min = lead(criterios.orcamento_min_venda)
+    preco_max = lead(criterios.orcamento_max_venda)
+    score_venda = np.where(
+        (preco_min <= preco) & (preco <= preco_max),
+        100.0,
+        np.where(preco < preco_min, 70.0, 30.0)
+    )
+
+    valor_total = bloco.valor_total_mensal[None, :]
+    valor_max = lead(criterios.orcamento_max_total_mensal)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        excesso_percentual = (valor_total - valor_max) / valor_max
+        score_locacao = np.where(
+            valor_total <= valor_max,
+            100.0,
+            np.maximum(0, 100 - (excesso_percentual * 100))
+        )
+    score_locacao = np.nan_to_num(score_locacao, nan=0.0)
+
+    score = score + np.where(
+        venda,
+        score_venda * (PESO_PRECO / 100),
+        np.where(locacao, score_locacao * (PESO_PRECO / 100), 0.0)
+    )
+
+    # PESO 3: Características obrigatórias
+    checks = np.zeros(score.shape, dtype=np.int64)
+    pontos = np.zeros(score.shape, dtype=np.int64)
+
+    tem_tipo = lead(criterios.tem_tipo_imovel)
+    checks += tem_tipo
+    pontos += np.where(tem_tipo & (bloco.tipo_imovel[None, :] == lead(criterios.tipo_imovel)), 100, 0)
+
+    quartos = bloco.quartos[None, :]
+    quartos_min = lead(criterios.quartos_min)
+    quartos_max = lead(criterios.quartos_max)
+    checa_quartos = (quartos_min > 0) | (quartos_max < inf)
+    checks += checa_quartos
+    pontos += np.where(
+        checa_quartos,
+        np.where(
+            (quartos_min <= quartos) & (quartos <= quartos_max),
+            100,
+            np.where(quartos >= quartos_min, 80, 0)
+        ),
+        0
+    )
+
+    vagas_min = lead(criterios.vagas_min)
+    checa_vagas = vagas_min > 0
+    checks += checa_vagas
+    pontos += np.where(checa_vagas & (bloco.vagas_garagem[None, :] >= vagas_min), 100, 0)
+
+    checa_pets = locacao & lead(criterios.aceita_pets_necessario)
+    checks += checa_pets
+    pontos += np.where(checa_pets & bloco.aceita_pets[None, :], 100, 0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        score = score + np.where(checks > 0, (pontos / checks) * (PESO_CARACTERISTICAS / 100), 0.0)
+
+    # PESO 4: Características extras
+    checks = np.zeros(score.shape, dtype=np.int64)
+    pontos = np.zeros(score.shape, dtype=np.int64)
+
+    preferencia = lead(criterios.mobiliado_preferencia)
+    mobiliado = bloco.mobiliado[None, :]
+    checa_mobiliado = locacao & (preferencia != vocab.codigo('indiferente'))
+    checks += checa_mobiliado
+    prefere_vazio_aceita = (preferencia == vocab.codigo('nao')) & (
+        (mobiliado == vocab.codigo('sim')) | (mobiliado == vocab.codigo('semi'))
+    )
+    pontos += np.where(
+        checa_mobiliado,
+        np.where(preferencia == mobiliado, 100, np.where(prefere_vazio_aceita, 70, 0)),
+        0
+    )
+
+    area = bloco.area_total[None, :]
+    area_min = lead(criterios.area_min)
+    area_max = lead(criterios.area_max)
+    checa_area = (area_min > 0) | (area_max < inf)
+    checks += checa_area
+    pontos += np.where(checa_area & (area_min <= area) & (area <= area_max), 100, 0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        score = score + np.where(checks > 0, (pontos / checks) * (PESO_EXTRAS / 100), 0.0)
+
+    # Normalizar score final
+    score_final = (score / PESO_TOTAL) * 100
+    return np.minimum(100, np.maximum(0, score_final))
+
+
+def calcular_scores_dicts(
+    imoveis: List[Dict[str, Any]],
+    leads_criterios: List[Dict[str, Any]]
+) -> np.ndarray:
+    """Atalho: montar bloco e critérios a partir de dicionários e pontuar"""
+    vocabulario = Vocabulario()
+    bloco = BlocoImoveis.from_dicts(imoveis, vocabulario)
+    criterios = CriteriosLeads.from_dicts(leads_criterios, vocabulario)
+    return calcular_scores(bloco, criterios)
@@ -0,0 +1,128 @@
+"""
+Classificador de intenções por palavras-chave
+
+Todas as palavras-chave viram uma única regex compilada uma vez, montada
+como trie (prefixos comuns compartilhados), então o custo por mensagem
+cresce com o tamanho do texto e não com o número de padrões. O texto é
+normalizado (minúsculas, sem acentos) antes da busca, e uma só passada
+devolve todas as intenções encontradas com score.
+"""
+
+import re
+import unicodedata
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+INTENCAO_PADRAO = "geral"
+CONFIANCA_PADRAO = 0.5
+
+# intenção -> (confiança quando vence, palavras-chave). A ordem desempata scores iguais.
+PALAVRAS_CHAVE: Dict[str, Tuple[float, List[str]]] = {
+    "saudacao": (0.9, ["oi", "ola", "bom dia", "boa tarde", "boa noite"]),
+    "interesse_imovel": (0.8, ["apartamento", "casa", "imovel", "comprar", "alugar"]),
+    "preco": (0.8, ["preco", "valor", "quanto", "custa"]),
+    "agendamento": (0.8, ["visita", "agendar", "conhecer", "ver"]),
+    "garantia": (0.8, ["garantia", "fiador", "seguro"]),
+    "despedida": (0.9, ["tchau", "obrigado", "valeu"]),
+}
+
+
+def _tabela_sem_acentos() -> Dict[int, str]:
+    """Latin-1 + Latin Extended-A -> letra base (translate é bem mais rápido que NFD por mensagem)"""
+    tabela = {}
+    for codigo in range(0xC0, 0x180):
+        base = unicodedata.normalize('NFD', chr(codigo))[0]
+        if base != chr(codigo) and base.isascii():
+            tabela[codigo] = base.lower()
+    return tabela
+
+
+_SEM_ACENTOS = _tabela_sem_acentos()
+
+
+def normalizar_texto(texto: str) -> str:
+    """Minúsculas e sem acentos ('Olá, preço?' -> 'ola, preco?')"""
+    return texto.lower().translate(_SEM_ACENTOS)
+
+
+def _regex_trie(palavras: Iterable[str]) -> str:
+    """Alternância em forma de trie: ['casa', 'custa'] -> 'c(?:asa|usta)'"""
+    trie: Dict[str, Any] = {}
+    for palavra in palavras:
+        no = trie
+        for caractere in palavra:
+            no = no.setdefault(caractere, {})
+        no[''] = {}
+
+    def montar(no: Dict[str, Any]) -> str:
+        fim = '' in no
+        ramos = [
+            (r'\s+' if caractere == ' ' else re.escape(caractere)) + montar(filho)
+            for caractere, filho in sorted(no.items()) if caractere
+        ]
+        if not ramos:
+            return ''
+        corpo = ramos[0] if len(ramos) == 1 else '(?:' + '|'.join(ramos) + ')'
+        if fim:
+            return '(?:' + corpo + ')?'
+        return corpo
+
+    return montar(trie)
+
+
+class IntentClassifier:
+    """Classificação de intenção em uma passada sobre o texto normalizado"""
+
+    def __init__(self, palavras_chave: Optional[Dict[str, Tuple[float, List[str]]]] = None):
+        palavras_chave = palavras_chave or PALAVRAS_CHAVE
+
+        self.confiancas = {intencao: confianca for intencao, (confianca, _) in palavras_chave.items()}
+        self.prioridade = {intencao: indice for indice, intencao in enumerate(palavras_chave)}
+
+        # palavra-chave normalizada -> intenções (a mesma palavra pode servir a mais de uma)
+        self.intencoes_por_palavra: Dict[str, List[str]] = {}
+        for intencao, (_, palavras) in palavras_chave.items():
+            for palavra in palavras:
+                chave = ' '.join(normalizar_texto(palavra).split())
+                intencoes = self.intencoes_por_palavra.setdefault(chave, [])
+                if intencao not in intencoes:
+                    intencoes.append(intencao)
+
+        self.regex = re.compile(r'\b' + _regex_trie(self.intencoes_por_palavra) + r'\b')
+
+    def encontrar(self, texto: str) -> Dict[str, float]:
+        """Score por intenção (palavras-chave distintas encontradas)"""
+        encontradas = {' '.join(m.group().split()) for m in self.regex.finditer(normalizar_texto(texto))}
+
+        scores: Dict[str, float] = {}
+        for palavra in encontradas:
+            for intencao in self.intencoes_por_palavra[palavra]:
+                scores[intencao] = scores.get(intencao, 0) + 1
+        return scores
+
+    def classificar(self, texto: str) -> Dict[str, Any]:
+        """
+        Intenção principal + todas as intenções encontradas
+        Maior score vence; empate fica com a intenção declarada primeiro.
+        """
+        scores = self.encontrar(texto)
+        if not scores:
+            return {"intent": INTENCAO_PADRAO, "confidence": CONFIANCA_PADRAO, "intents": []}
+
+        ordenadas = sorted(scores.items(), key=lambda item: (-item[1], self.prioridade[item[0]]))
+        intencao = ordenadas[0][0]
+        return {
+            "intent": intencao,
+            "confidence": self.confiancas[intencao],
+            "intents": [{"intent": nome, "score": score} for nome, score in ordenadas]
+        }
+
+
+_classificador: Optional[IntentClassifier] = None
+
+
+def classificar_intencao(texto: str) -> Dict[str, Any]:
+    """Classificação com as palavras-chave padrão (regex compilada uma vez por processo)"""
+    global _classificador
+    if _classificador is None:
+        _classificador = IntentClassifier()
+    return _classificador.classificar(texto)
@@ -2,18 +2,13 @@
 Processador de Mensagens
 """
 
-import re
 from typing import Dict, Any, List
 
+from services.message_processing.intent_classifier import IntentClassifier
+
 class MessageProcessor:
     def __init__(self):
-        self.intent_patterns = {
-            "saudacao": [r"\b(oi|olá|ola|bom dia|boa tarde|boa noite)\b"],
-            "interesse_imovel": [r"\b(apartamento|casa|imóvel|comprar|alugar)\b"],
-            "preco": [r"\b(preço|valor|quanto)\b"],
-            "agendamento": [r"\b(visita|agendar|conhecer)\b"],
-            "despedida": [r"\b(tchau|obrigado|valeu)\b"]
-        }
+        self.intent_classifier = IntentClassifier()
     
     async def process_message(self, message: str, session: Dict[str, Any], message_type: str = "text") -> Dict[str, Any]:
         intent_result = self._classify_intent(message)
@@ -34,14 +29,7 @@ class MessageProcessor:
         }
     
     def _classify_intent(self, message: str) -> Dict[str, Any]:
-        message_lower = message.lower()
-        
-        for intent, patterns in self.intent_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, message_lower):
-                    return {"intent": intent, "confidence": 0.8}
-        
-        return {"intent": "geral", "confidence": 0.5}
+        return self.intent_classifier.classificar(message)
     
     def _generate_response(self, intent: str, contact_name: str, message: str) -> str:
         responses = {
@@ -49,6 +37,7 @@ class MessageProcessor:
             "interesse_imovel": f"Perfeito {contact_name}! Vejo interesse em imóveis. É para compra ou locação?",
             "preco": f"{contact_name}, os preços variam. Que tipo de imóvel você procura?",
             "agendamento": f"Ótimo {contact_name}! Vou verificar horários. Qual período prefere?",
+            "garantia": f"{contact_name}, trabalhamos com seguro fiança, fiador, capitalização e crédito pago. Qual te interessa?",
             "despedida": f"Foi um prazer {contact_name}! Qualquer dúvida, estarei aqui.",
             "geral": f"Entendi {contact_name}! Como assistente imobiliária, posso ajudar com imóveis e preços."
         }
@@ -61,6 +50,7 @@ class MessageProcessor:
             "interesse_imovel": ["💰 Compra", "🏠 Locação", "📍 Regiões"],
             "preco": ["🏠 Apartamento", "🏡 Casa", "📍 Regiões"],
             "agendamento": ["🌅 Manhã", "🌞 Tarde", "📅 Final de semana"],
+            "garantia": ["🔒 Seguro Fiança", "👥 Fiador", "💰 Capitalização"],
             "geral": ["🏠 Ver imóveis", "💰 Preços", "📋 Garantias"]
         }
         
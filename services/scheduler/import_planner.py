@@ -0,0 +1,368 @@
+"""
+Planejamento das importações XML multi-cliente
+
+- Distribui os clientes ao longo de uma janela a partir do horario_importacao
+  de cada um (ConfiguracaoImobiliaria), em vez de disparar todos às 08:00
+- Feeds pequenos/rápidos saem primeiro (estimativa pelo histórico)
+- Limita downloads simultâneos por host de origem (semáforo no Redis)
+- Registra espera em fila e tempo de execução por cliente para medir o makespan
+"""
+
+import json
+import time
+import uuid
+from dataclasses import dataclass, field, asdict, is_dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+from urllib.parse import urlparse
+
+from core.logger import logger
+
+# Frequência do planejador no beat (minutos)
+JANELA_PLANEJAMENTO_MIN = 15
+
+# Fim da última janela planejada: janelas atrasadas são recuperadas
+CHAVE_PLANEJADO_ATE = "importacao:planejado_ate"
+
+# Clientes com o mesmo horário são espalhados ao longo desta janela
+JANELA_DISTRIBUICAO_MIN = 30
+
+# Downloads simultâneos permitidos por host de origem
+MAX_DOWNLOADS_POR_HOST = 2
+
+# Validade de uma vaga no semáforo (libera vagas de workers que morreram)
+TTL_VAGA_HOST_S = 1800
+
+# Espera antes de tentar de novo quando o host está lotado
+ESPERA_HOST_LOTADO_S = 30
+
+# Reagendamentos por host lotado antes de desistir (~10 min de espera)
+MAX_REAGENDAMENTOS_HOST = 20
+
+# Feeds com mais imóveis que isso (pelo histórico) são divididos em partes
+LIMITE_FEED_GRANDE_IMOVEIS = 20000
+TAMANHO_PARTE_IMOVEIS = 2000
+
+# Quantas importações anteriores entram na estimativa
+HISTORICO_ESTIMATIVA = 5
+
+# Retenção das métricas por dia no Redis
+TTL_METRICAS_S = 7 * 24 * 3600
+
+
+@dataclass
+class FeedImportacao:
+    """Um XML a importar e as estimativas usadas na priorização"""
+    cliente_id: str
+    xml_url: str
+    xml_mapping: Dict[str, Any] = field(default_factory=dict)
+    horario_importacao: str = "08:00"
+    tamanho_estimado: int = 0  # bytes do último XML
+    tempo_estimado: float = 0.0  # segundos (média das últimas importações)
+    total_estimado: int = 0  # imóveis na última importação
+
+    @property
+    def host(self) -> str:
+        return urlparse(self.xml_url).netloc.lower()
+
+    @property
+    def grande(self) -> bool:
+        return self.total_estimado >= LIMITE_FEED_GRANDE_IMOVEIS
+
+    def chave_prioridade(self):
+        # Menor primeiro; feeds sem histórico entram depois dos conhecidos rápidos
+        return (self.tempo_estimado or float('inf'), self.tamanho_estimado, self.cliente_id)
+
+    def to_config(self, agendado_em: float) -> Dict[str, Any]:
+        """Payload JSON da task import_client_xml"""
+        return {
+            'cliente_id': self.cliente_id,
+            'xml_url': self.xml_url,
+            'xml_mapping': self.xml_mapping,
+            'agendado_em': agendado_em,
+            'particionar': self.grande
+        }
+
+
+def serializar_mapping(xml_mapping) -> Dict[str, Any]:
+    """XMLMapping -> dict (o Celery serializa em JSON)"""
+    if is_dataclass(xml_mapping):
+        return asdict(xml_mapping)
+    return dict(xml_mapping or {})
+
+
+def carregar_feeds() -> List[FeedImportacao]:
+    """Feeds dos clientes ativos com estimativas do histórico de importação"""
+    from services.scheduler.import_tasks import get_active_clients_configs
+
+    feeds: Dict[str, FeedImportacao] = {}
+
+    for config in get_active_clients_configs():
+        feeds[config['cliente_id']] = FeedImportacao(
+            cliente_id=config['cliente_id'],
+            xml_url=config['xml_url'],
+            xml_mapping=serializar_mapping(config.get('xml_mapping')),
+            horario_importacao=config.get('horario_importacao') or "08:00"
+        )
+
+    try:
+        from core.database import get_db_session
+        from models.configuracao_imobiliaria import ConfiguracaoImobiliaria
+
+        with get_db_session() as db:
+            for config in db.query(ConfiguracaoImobiliaria).all():
+                xml_url = config.xml_url_unificado or config.xml_url_vendas or config.xml_url_locacao
+                if not xml_url:
+                    continue
+                feed = feeds.get(config.cliente_id)
+                if feed is None:
+                    feeds[config.cliente_id] = FeedImportacao(
+                        cliente_id=config.cliente_id,
+                        xml_url=xml_url,
+                        horario_importacao=config.horario_importacao or "08:00"
+                    )
+                elif config.horario_importacao:
+                    feed.horario_importacao = config.horario_importacao
+    except Exception as e:
+        logger.warning(f"[PLANNER] Configurações das imobiliárias indisponíveis: {e}")
+
+    _aplicar_historico(list(feeds.values()))
+    return list(feeds.values())
+
+
+def _aplicar_historico(feeds: List[FeedImportacao]):
+    """Preencher tamanho/tempo/total estimados a partir de EstadoFeedXML e ImportacaoLog"""
+    if not feeds:
+        return
+
+    try:
+        from core.database import get_db_session
+        from models.imovel import EstadoFeedXML, ImportacaoLog
+
+        por_cliente = {feed.cliente_id: feed for feed in feeds}
+
+        with get_db_session() as db:
+            for estado in db.query(EstadoFeedXML).filter(
+                EstadoFeedXML.cliente_id.in_(list(por_cliente))
+            ):
+                por_cliente[estado.cliente_id].tamanho_estimado = estado.tamanho_bytes or 0
+
+            for feed in feeds:
+                logs = db.query(
+                    ImportacaoLog.tempo_execucao, ImportacaoLog.total_imoveis
+                ).filter(
+                    ImportacaoLog.cliente_id == feed.cliente_id,
+                    ImportacaoLog.status == 'sucesso'
+                ).order_by(
+                    ImportacaoLog.data_importacao.desc()
+                ).limit(HISTORICO_ESTIMATIVA).all()
+
+                if logs:
+                    tempos = [tempo for tempo, _ in logs if tempo]
+                    feed.tempo_estimado = sum(tempos) / len(tempos) if tempos else 0.0
+                    feed.total_estimado = logs[0][1] or 0
+    except Exception as e:
+        logger.warning(f"[PLANNER] Histórico de importações indisponível: {e}")
+
+
+def _minutos(horario: str) -> int:
+    """'HH:MM' -> minutos desde a meia-noite"""
+    try:
+        horas, minutos = horario.split(':')
+        return int(horas) * 60 + int(minutos)
+    except (ValueError, AttributeError):
+        return 8 * 60
+
+
+def planejar(
+    feeds: List[FeedImportacao],
+    agora: datetime,
+    janela_min: int = JANELA_PLANEJAMENTO_MIN,
+    ignorar_horario: bool = False,
+    desde: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """
+    Montar o plano de disparo: lista de {'feed', 'horario', 'eta'} ordenada por eta
+
+    Com ignorar_horario todos os feeds saem agora, só ordenados por prioridade.
+    Senão entram os feeds cujo horario_importacao cai em [desde, agora + janela)
+    (desde = agora por padrão; no máximo 24 h antes do fim); horários já
+    passados saem agora. Feeds do mesmo horário são espalhados por
+    JANELA_DISTRIBUICAO_MIN, os menores primeiro.
+    """
+    if ignorar_horario:
+        ordenados = sorted(feeds, key=FeedImportacao.chave_prioridade)
+        return [{'feed': feed, 'horario': agora, 'eta': agora} for feed in ordenados]
+
+    fim = agora.replace(second=0, microsecond=0) + timedelta(minutes=janela_min)
+    inicio = (desde or agora).replace(second=0, microsecond=0)
+    inicio = max(inicio, fim - timedelta(days=1))
+
+    grupos: Dict[datetime, List[FeedImportacao]] = {}
+    for feed in feeds:
+        minuto = _minutos(feed.horario_importacao)
+        horario = inicio.replace(hour=minuto // 60, minute=minuto % 60)
+        if horario < inicio:
+            horario += timedelta(days=1)
+        if horario < fim:
+            grupos.setdefault(horario, []).append(feed)
+
+    plano = []
+    for horario, grupo in grupos.items():
+        grupo.sort(key=FeedImportacao.chave_prioridade)
+        passo = JANELA_DISTRIBUICAO_MIN * 60 / len(grupo)
+        for i, feed in enumerate(grupo):
+            plano.append({
+                'feed': feed,
+                'horario': horario,
+                'eta': max(agora, horario + timedelta(seconds=i * passo))
+            })
+
+    plano.sort(key=lambda item: item['eta'])
+    return plano
+
+
+def obter_planejado_ate() -> Optional[datetime]:
+    """Fim da última janela planejada (None sem Redis ou na primeira execução)"""
+    redis = _obter_redis()
+    if redis is None:
+        return None
+    try:
+        valor = redis.get(CHAVE_PLANEJADO_ATE)
+        return datetime.fromisoformat(valor) if valor else None
+    except Exception as e:
+        logger.warning(f"[PLANNER] Erro ao ler o fim da última janela: {e}")
+        return None
+
+
+def salvar_planejado_ate(fim: datetime):
+    redis = _obter_redis()
+    if redis is None:
+        return
+    try:
+        redis.set(CHAVE_PLANEJADO_ATE, fim.isoformat())
+    except Exception as e:
+        logger.warning(f"[PLANNER] Erro ao gravar o fim da janela planejada: {e}")
+
+
+class SemaforoHost:
+    """
+    Semáforo por host de origem no Redis (sorted set com expiração das vagas)
+    Sem Redis disponível não limita.
+    """
+
+    def __init__(self, host: str, limite: int = MAX_DOWNLOADS_POR_HOST, ttl: int = TTL_VAGA_HOST_S):
+        self.chave = f"importacao:host:{host}"
+        self.limite = limite
+        self.ttl = ttl
+        self.token = str(uuid.uuid4())
+        self._redis = _obter_redis()
+
+    def adquirir(self) -> bool:
+        if self._redis is None:
+            return True
+        try:
+            agora = time.time()
+            pipe = self._redis.pipeline()
+            pipe.zremrangebyscore(self.chave, '-inf', agora - self.ttl)
+            pipe.zadd(self.chave, {self.token: agora})
+            pipe.zrank(self.chave, self.token)
+            pipe.expire(self.chave, self.ttl)
+            posicao = pipe.execute()[2]
+
+            if posicao is not None and posicao < self.limite:
+                return True
+
+            self._redis.zrem(self.chave, self.token)
+            return False
+        except Exception as e:
+            logger.warning(f"[PLANNER] Semáforo indisponível ({self.chave}): {e}")
+            return True
+
+    def liberar(self):
+        if self._redis is None:
+            return
+        try:
+            self._redis.zrem(self.chave, self.token)
+        except Exception as e:
+            logger.warning(f"[PLANNER] Erro ao liberar semáforo ({self.chave}): {e}")
+
+
+def _chave_planejado(cliente_id: str, data: str) -> str:
+    return f"importacao:planejada:{data}:{cliente_id}"
+
+
+def marcar_planejado(cliente_id: str, data: str) -> bool:
+    """Evitar disparo duplicado do mesmo cliente no mesmo dia (True se é o primeiro)"""
+    redis = _obter_redis()
+    if redis is None:
+        return True
+    try:
+        return bool(redis.set(_chave_planejado(cliente_id, data), 1, nx=True, ex=24 * 3600))
+    except Exception:
+        return True
+
+
+def desmarcar_planejado(cliente_id: str, data: str):
+    """Liberar o cliente para o próximo planejamento (falha ao agendar)"""
+    redis = _obter_redis()
+    if redis is None:
+        return
+    try:
+        redis.delete(_chave_planejado(cliente_id, data))
+    except Exception as e:
+        logger.warning(f"[PLANNER] Erro ao desmarcar {cliente_id}: {e}")
+
+
+# MÉTRICAS (espera em fila e tempo de execução por cliente)
+
+def registrar_metrica(cliente_id: str, **dados):
+    """Atualizar a métrica do cliente no dia (campos são mesclados)"""
+    redis = _obter_redis()
+    if redis is None:
+        return
+    try:
+        data = datetime.now().strftime('%Y-%m-%d')
+        chave = f"importacao:metricas:{data}"
+        atual = redis.hget(chave, cliente_id)
+        metrica = json.loads(atual) if atual else {}
+        metrica.update(dados)
+        redis.hset(chave, cliente_id, json.dumps(metrica))
+        redis.expire(chave, TTL_METRICAS_S)
+    except Exception as e:
+        logger.warning(f"[PLANNER] Erro ao registrar métrica de {cliente_id}: {e}")
+
+
+def obter_metricas(data: Optional[str] = None) -> Dict[str, Any]:
+    """Métricas do dia por cliente e makespan (primeiro agendamento até o último término)"""
+    data = data or datetime.now().strftime('%Y-%m-%d')
+    redis = _obter_redis()
+    if redis is None:
+        return {'data': data, 'clientes': {}, 'erro': 'Redis não disponível'}
+
+    clientes = {
+        cliente_id: json.loads(valor)
+        for cliente_id, valor in (redis.hgetall(f"importacao:metricas:{data}") or {}).items()
+    }
+
+    agendados = [m['agendado_em'] for m in clientes.values() if m.get('agendado_em')]
+    terminos = [m['fim'] for m in clientes.values() if m.get('fim')]
+    esperas = [m['espera_fila'] for m in clientes.values() if m.get('espera_fila') is not None]
+    execucoes = [m['tempo_execucao'] for m in clientes.values() if m.get('tempo_execucao') is not None]
+
+    return {
+        'data': data,
+        'clientes': clientes,
+        'makespan': max(terminos) - min(agendados) if agendados and terminos else None,
+        'espera_fila_media': sum(esperas) / len(esperas) if esperas else None,
+        'espera_fila_max': max(esperas) if esperas else None,
+        'tempo_execucao_total': sum(execucoes) if execucoes else None
+    }
+
+
+def _obter_redis():
+    try:
+        from core.redis_config import redis_client
+        return redis_client
+    except Exception:
+        return None
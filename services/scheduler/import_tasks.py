@@ -2,14 +2,31 @@
 Tasks do Celery para importação automática de XML
 """
 
-from celery import current_task
+from celery import current_task, chord
 from datetime import datetime, timedelta
 from typing import Dict, List, Any
+from urllib.parse import urlparse
 from core.celery_app import celery_app
 from core.logger import logger
 from core.database import get_db_session
 from models.imovel import ImportacaoLog
+import json
+import os
+import tempfile
 import uuid
+import time
+
+
+def _montar_importador(cliente_config: Dict[str, Any]):
+    """Criar XMLImporter a partir do payload JSON da task"""
+    from services.xml_importer.importer import XMLImporter
+    from services.xml_importer.parser import XMLMapping
+    
+    xml_mapping = cliente_config['xml_mapping']
+    if isinstance(xml_mapping, dict):
+        xml_mapping = XMLMapping(**xml_mapping)
+    
+    return XMLImporter(cliente_config['cliente_id'], cliente_config['xml_url'], xml_mapping)
 
 
 @celery_app.task(bind=True, max_retries=3, default_retry_delay=300)
@@ -18,22 +35,64 @@ def import_client_xml(self, cliente_config: Dict[str, Any]):
     Task para importar XML de um cliente específico
     """
     cliente_id = cliente_config.get('cliente_id', 'unknown')
+    inicio = time.time()
     
     try:
         logger.info(f"[TASK] Iniciando importação XML: {cliente_id}")
         
-        # Importar módulos necessários
-        from services.xml_importer.importer import XMLImporter
+        from services.scheduler.import_planner import (
+            SemaforoHost, registrar_metrica, ESPERA_HOST_LOTADO_S, MAX_REAGENDAMENTOS_HOST
+        )
         
         # Criar importador
-        importer = XMLImporter(
-            cliente_config['cliente_id'],
-            cliente_config['xml_url'], 
-            cliente_config['xml_mapping']
+        importer = _montar_importador(cliente_config)
+        
+        # Limite de downloads simultâneos no mesmo host de origem
+        semaforo = SemaforoHost(urlparse(cliente_config['xml_url']).netloc.lower())
+        if not semaforo.adquirir():
+            reagendamentos = cliente_config.get('reagendamentos_host', 0)
+            if reagendamentos >= MAX_REAGENDAMENTOS_HOST:
+                logger.error(f"[TASK] Host lotado após {reagendamentos} reagendamentos, desistindo de {cliente_id}")
+                registrar_metrica(cliente_id, fim=time.time(), status='host_lotado')
+                return {
+                    'status': 'host_lotado',
+                    'cliente_id': cliente_id,
+                    'reagendamentos': reagendamentos,
+                    'timestamp': datetime.now().isoformat()
+                }
+            
+            logger.info(f"[TASK] Host lotado, reagendando {cliente_id} em {ESPERA_HOST_LOTADO_S}s")
+            import_client_xml.apply_async(
+                ({**cliente_config, 'reagendamentos_host': reagendamentos + 1},),
+                countdown=ESPERA_HOST_LOTADO_S
+            )
+            return {
+                'status': 'reagendado',
+                'cliente_id': cliente_id,
+                'timestamp': datetime.now().isoformat()
+            }
+        
+        agendado_em = cliente_config.get('agendado_em')
+        registrar_metrica(
+            cliente_id,
+            agendado_em=agendado_em,
+            inicio=inicio,
+            espera_fila=max(0.0, inicio - agendado_em) if agendado_em else None,
+            status='executando'
         )
         
-        # Executar importação
-        resultado = importer.import_imoveis()
+        # Executar importação (feeds grandes viram sub-tasks)
+        try:
+            if cliente_config.get('particionar'):
+                resultado = _importar_particionado(importer, cliente_config, inicio)
+            else:
+                resultado = importer.import_imoveis()
+        finally:
+            semaforo.liberar()
+        
+        if resultado['status'] != 'particionado':
+            fim = time.time()
+            registrar_metrica(cliente_id, fim=fim, tempo_execucao=fim - inicio, status=resultado['status'])
         
         # Log de sucesso
         logger.info(f"[TASK] Importação concluída: {cliente_id} - {resultado['status']}")
@@ -80,18 +139,210 @@ def import_client_xml(self, cliente_config: Dict[str, Any]):
         }
 
 
+def _diretorio_partes() -> str:
+    """Diretório das partes dos feeds grandes (precisa ser visível para todos os workers)"""
+    from core.config import get_settings
+    
+    diretorio = get_settings().importacao_dir_partes or os.path.join(tempfile.gettempdir(), 'imobi_partes_xml')
+    os.makedirs(diretorio, exist_ok=True)
+    return diretorio
+
+
+def _gravar_partes(importer, arquivo_xml, log_id: str) -> List[str]:
+    """
+    Parsear o feed em streaming e gravar cada parte em um arquivo JSON Lines
+    Só uma parte fica em memória; as sub-tasks recebem o caminho do arquivo
+    """
+    from services.scheduler.import_planner import TAMANHO_PARTE_IMOVEIS
+    
+    diretorio = _diretorio_partes()
+    caminhos = []
+    try:
+        for indice, imoveis in enumerate(importer.parser.iter_lotes(arquivo_xml, TAMANHO_PARTE_IMOVEIS)):
+            caminho = os.path.join(diretorio, f"{importer.cliente_id}_{log_id}_{indice:05d}.jsonl")
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                for imovel_data in imoveis:
+                    arquivo.write(json.dumps(imovel_data, default=str, ensure_ascii=False))
+                    arquivo.write('\n')
+            caminhos.append(caminho)
+    except Exception:
+        _remover_partes(caminhos)
+        raise
+    return caminhos
+
+
+def _ler_parte(caminho: str) -> List[Dict[str, Any]]:
+    with open(caminho, 'r', encoding='utf-8') as arquivo:
+        return [json.loads(linha) for linha in arquivo if linha.strip()]
+
+
+def _remover_partes(caminhos: List[str]):
+    for caminho in caminhos:
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"[TASK] Não foi possível remover a parte {caminho}: {e}")
+
+
+def _importar_particionado(importer, cliente_config: Dict[str, Any], inicio: float) -> Dict[str, Any]:
+    """
+    Baixar e parsear o feed uma vez, gravar as partes em arquivos e dividir
+    a gravação em sub-tasks (chord: importar_parte_feed em paralelo ->
+    finalizar_importacao_feed). Pelo broker passam só os caminhos.
+    """
+    log_id = str(uuid.uuid4())
+    
+    try:
+        download, nao_modificado = importer.baixar_feed()
+        if nao_modificado:
+            return importer.registrar_nao_modificado(download, log_id, inicio)
+        
+        try:
+            caminhos = _gravar_partes(importer, download.arquivo, log_id)
+        finally:
+            download.close()
+        
+        download_info = {
+            'etag': download.etag,
+            'last_modified': download.last_modified,
+            'hash_conteudo': download.hash_conteudo,
+            'tamanho_bytes': download.tamanho_bytes
+        }
+        
+        if not caminhos:
+            return finalizar_importacao_feed([], cliente_config, download_info, log_id, inicio)
+        
+        try:
+            resultado_chord = chord(
+                importar_parte_feed.s(cliente_config, caminho) for caminho in caminhos
+            )(
+                finalizar_importacao_feed.s(cliente_config, download_info, log_id, inicio, caminhos)
+            )
+        except Exception:
+            _remover_partes(caminhos)
+            raise
+        
+        logger.info(f"[TASK] {cliente_config['cliente_id']}: feed dividido em {len(caminhos)} partes")
+        return {
+            'status': 'particionado',
+            'log_id': log_id,
+            'partes': len(caminhos),
+            'task_final_id': resultado_chord.id
+        }
+        
+    except Exception as e:
+        return importer.registrar_erro(e, log_id, inicio)
+
+
+@celery_app.task
+def importar_parte_feed(cliente_config: Dict[str, Any], caminho_parte: str):
+    """
+    Sub-task: gravar uma parte de um feed grande (arquivo gravado por _gravar_partes)
+    Em caso de erro os IDs da parte ainda são devolvidos para não serem removidos
+    """
+    importer = _montar_importador(cliente_config)
+    imoveis = _ler_parte(caminho_parte)
+    
+    try:
+        return importer.importar_parte(imoveis)
+    except Exception as e:
+        logger.error(f"[TASK] Erro na parte do feed {cliente_config['cliente_id']}: {e}")
+        return {
+            'total_imoveis': len(imoveis),
+            'erros': len(imoveis),
+            'ids': [f"{importer.cliente_id}_{imovel['id_xml']}" for imovel in imoveis if imovel.get('id_xml')]
+        }
+
+
+@celery_app.task
+def finalizar_importacao_feed(
+    partes: List[Dict[str, Any]],
+    cliente_config: Dict[str, Any],
+    download_info: Dict[str, Any],
+    log_id: str,
+    inicio: float,
+    caminhos_partes: List[str] = None
+):
+    """Callback do chord: combinar partes, remover ausentes e registrar a importação"""
+    from services.scheduler.import_planner import registrar_metrica
+    from services.xml_importer.parser import DownloadXML
+    
+    cliente_id = cliente_config['cliente_id']
+    importer = _montar_importador(cliente_config)
+    
+    try:
+        resultado = importer.finalizar_partes(partes, DownloadXML(**download_info), log_id, inicio)
+    except Exception as e:
+        resultado = importer.registrar_erro(e, log_id, inicio)
+    finally:
+        _remover_partes(caminhos_partes or [])
+    
+    fim = time.time()
+    registrar_metrica(
+        cliente_id,
+        fim=fim,
+        tempo_execucao=fim - inicio,
+        status=resultado['status'],
+        partes=len(partes)
+    )
+    
+    logger.info(f"[TASK] Importação particionada concluída: {cliente_id} - {resultado['status']}")
+    return resultado
+
+
+def _disparar_plano(plano: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Enfileirar import_client_xml para cada item do plano (eta e prioridade já definidas)"""
+    task_results = []
+    
+    for item in plano:
+        feed = item['feed']
+        try:
+            # Agendar task assíncrona
+            task = import_client_xml.apply_async(
+                (feed.to_config(item['eta'].timestamp()),),
+                eta=item['eta']
+            )
+            
+            task_results.append({
+                'cliente_id': feed.cliente_id,
+                'task_id': task.id,
+                'status': 'agendado',
+                'eta': item['eta'].isoformat(),
+                'particionado': feed.grande,
+                'timestamp': datetime.now().isoformat()
+            })
+            
+            logger.info(f"[SCHEDULER] Task agendada: {feed.cliente_id} -> {task.id} ({item['eta']:%H:%M:%S})")
+            
+        except Exception as e:
+            logger.error(f"[SCHEDULER] Erro ao agendar {feed.cliente_id}: {e}")
+            task_results.append({
+                'cliente_id': feed.cliente_id,
+                'status': 'erro_agendamento',
+                'erro': str(e),
+                'timestamp': datetime.now().isoformat()
+            })
+    
+    return task_results
+
+
 @celery_app.task(bind=True)
 def import_all_clients_daily(self):
     """
-    Task principal para importar todos os clientes ativos diariamente
+    Task principal para importar todos os clientes ativos imediatamente
+    (feeds menores primeiro)
     """
     try:
-        logger.info("[SCHEDULER] Iniciando importação diária de todos os clientes")
+        logger.info("[SCHEDULER] Iniciando importação de todos os clientes")
+        
+        from services.scheduler.import_planner import carregar_feeds, planejar
         
-        # Buscar configurações de clientes ativos
-        clientes_configs = get_active_clients_configs()
+        # Buscar feeds de clientes ativos
+        feeds = carregar_feeds()
         
-        if not clientes_configs:
+        if not feeds:
             logger.warning("[SCHEDULER] Nenhum cliente ativo encontrado")
             return {
                 'status': 'aviso',
@@ -100,47 +351,87 @@ def import_all_clients_daily(self):
             }
         
         # Agendar importação para cada cliente
-        task_results = []
-        for config in clientes_configs:
-            try:
-                # Agendar task assíncrona
-                task = import_client_xml.delay(config)
-                
-                task_results.append({
-                    'cliente_id': config['cliente_id'],
-                    'task_id': task.id,
-                    'status': 'agendado',
-                    'timestamp': datetime.now().isoformat()
-                })
-                
-                logger.info(f"[SCHEDULER] Task agendada: {config['cliente_id']} -> {task.id}")
-                
-            except Exception as e:
-                logger.error(f"[SCHEDULER] Erro ao agendar {config['cliente_id']}: {e}")
-                task_results.append({
-                    'cliente_id': config['cliente_id'],
-                    'status': 'erro_agendamento',
-                    'erro': str(e),
-                    'timestamp': datetime.now().isoformat()
-                })
+        task_results = _disparar_plano(planejar(feeds, celery_app.now(), ignorar_horario=True))
         
         # Salvar log da execução do scheduler
         save_scheduler_log(task_results)
         
         resultado = {
             'status': 'sucesso',
-            'total_clientes': len(clientes_configs),
+            'total_clientes': len(feeds),
             'tasks_agendadas': len([t for t in task_results if t['status'] == 'agendado']),
             'erros': len([t for t in task_results if t['status'] == 'erro_agendamento']),
             'tasks': task_results,
             'timestamp': datetime.now().isoformat()
         }
         
-        logger.info(f"[SCHEDULER] Importação diária concluída: {resultado['tasks_agendadas']} tasks agendadas")
+        logger.info(f"[SCHEDULER] Importação geral concluída: {resultado['tasks_agendadas']} tasks agendadas")
         return resultado
         
     except Exception as e:
-        logger.error(f"[SCHEDULER] Erro crítico na importação diária: {e}")
+        logger.error(f"[SCHEDULER] Erro crítico na importação geral: {e}")
+        return {
+            'status': 'erro_critico',
+            'erro': str(e),
+            'timestamp': datetime.now().isoformat()
+        }
+
+
+@celery_app.task(bind=True)
+def planejar_importacoes(self):
+    """
+    Task periódica (beat): agenda os clientes cujo horario_importacao cai
+    entre o fim da última janela planejada e o fim da próxima, espalhados
+    e priorizados pelo planejador (janelas atrasadas são recuperadas)
+    """
+    try:
+        from services.scheduler.import_planner import (
+            carregar_feeds, planejar, marcar_planejado, desmarcar_planejado,
+            obter_planejado_ate, salvar_planejado_ate, JANELA_PLANEJAMENTO_MIN
+        )
+        
+        agora = celery_app.now()
+        desde = obter_planejado_ate()
+        if desde is not None:
+            desde = desde.astimezone(agora.tzinfo)
+        plano = planejar(carregar_feeds(), agora, JANELA_PLANEJAMENTO_MIN, desde=desde)
+        fim = agora.replace(second=0, microsecond=0) + timedelta(minutes=JANELA_PLANEJAMENTO_MIN)
+        
+        # Cada cliente é disparado uma vez por dia (dia do horário planejado)
+        plano = [
+            item for item in plano
+            if marcar_planejado(item['feed'].cliente_id, item['horario'].strftime('%Y-%m-%d'))
+        ]
+        
+        if not plano:
+            salvar_planejado_ate(fim)
+            return {
+                'status': 'sucesso',
+                'tasks_agendadas': 0,
+                'timestamp': datetime.now().isoformat()
+            }
+        
+        task_results = _disparar_plano(plano)
+        
+        # Falha ao enfileirar: o cliente volta para o próximo planejamento
+        # (a janela salva não passa do horário dele)
+        for item, task_result in zip(plano, task_results):
+            if task_result['status'] == 'erro_agendamento':
+                desmarcar_planejado(item['feed'].cliente_id, item['horario'].strftime('%Y-%m-%d'))
+                fim = min(fim, item['horario'])
+        salvar_planejado_ate(fim)
+        save_scheduler_log(task_results)
+        
+        logger.info(f"[SCHEDULER] Janela {agora:%H:%M}: {len(task_results)} importações planejadas")
+        return {
+            'status': 'sucesso',
+            'tasks_agendadas': len([t for t in task_results if t['status'] == 'agendado']),
+            'tasks': task_results,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"[SCHEDULER] Erro no planejamento de importações: {e}")
         return {
             'status': 'erro_critico',
             'erro': str(e),
@@ -220,7 +511,12 @@ def import_client_manual(cliente_id: str):
             raise ValueError(f"Cliente {cliente_id} não encontrado ou inativo")
         
         # Executar importação
-        task = import_client_xml.delay(client_config)
+        from services.scheduler.import_planner import serializar_mapping
+        task = import_client_xml.delay({
+            **client_config,
+            'xml_mapping': serializar_mapping(client_config['xml_mapping']),
+            'agendado_em': time.time()
+        })
         
         return {
             'status': 'agendado',
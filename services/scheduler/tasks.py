@@ -163,6 +163,7 @@ def generate_daily_report():
                 'importacoes_hoje': len(logs_hoje),
                 'importacoes_sucesso': len([l for l in logs_hoje if l.status == 'sucesso']),
                 'importacoes_erro': len([l for l in logs_hoje if l.status == 'erro']),
+                'importacoes_nao_modificadas': len([l for l in logs_hoje if l.status == 'nao_modificado']),
                 'clientes_stats': [
                     {
                         'cliente_id': stat.cliente_id,
@@ -197,3 +198,129 @@ def generate_daily_report():
             'erro': str(e),
             'timestamp': datetime.now().isoformat()
         }
+
+
+@celery_app.task
+def flush_session_cache():
+    """
+    Gravar no Postgres as sessões de conversa alteradas no cache Redis
+    """
+    try:
+        import asyncio
+        from core.database import async_engine
+        from core.redis_config import fechar_redis_async
+        from services.session_management.session_manager import SessionManager
+        
+        async def _flush() -> int:
+            try:
+                return await SessionManager().flush_sessions()
+            finally:
+                # Conexões do pool e do Redis ficam presas ao event loop desta execução
+                await fechar_redis_async()
+                await async_engine.dispose()
+        
+        gravadas = asyncio.run(_flush())
+        
+        if gravadas:
+            logger.info(f"[SESSIONS] {gravadas} sessões gravadas no banco")
+        
+        return {
+            'status': 'sucesso',
+            'sessoes_gravadas': gravadas,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"[SESSIONS] Erro no flush de sessões: {e}")
+        return {
+            'status': 'erro',
+            'erro': str(e),
+            'timestamp': datetime.now().isoformat()
+        }
+
+
+@celery_app.task
+def matching_incremental_clientes():
+    """
+    Matching noturno: só os pares afetados por imóveis e leads alterados
+    """
+    try:
+        from models.configuracao_imobiliaria import ConfiguracaoImobiliaria
+        from services.matching.geo_matching import executar_matching_automatico
+        
+        with get_db_session() as db:
+            clientes = [
+                cliente_id for (cliente_id,) in db.query(ConfiguracaoImobiliaria.cliente_id).filter(
+                    ConfiguracaoImobiliaria.auto_matching_ativo == True
+                )
+            ]
+        
+        resultados = {}
+        for cliente_id in clientes:
+            try:
+                resultado = executar_matching_automatico(cliente_id)
+                resultados[cliente_id] = resultado.get('erro') or {
+                    'modo': resultado.get('modo'),
+                    'leads_atualizados': len(resultado.get('matches_por_lead', {})),
+                    **resultado.get('alteracoes', {})
+                }
+            except Exception as e:
+                logger.error(f"[MATCHING] Erro no matching incremental de {cliente_id}: {e}")
+                resultados[cliente_id] = f"erro: {e}"
+        
+        return {
+            'status': 'sucesso',
+            'clientes': resultados,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"[MATCHING] Erro no matching incremental: {e}")
+        return {
+            'status': 'erro',
+            'erro': str(e),
+            'timestamp': datetime.now().isoformat()
+        }
+
+
+@celery_app.task
+def enviar_fila_whatsapp():
+    """
+    Enviar as mensagens de WhatsApp enfileiradas (pool + limite de taxa + retry)
+    """
+    try:
+        import asyncio
+        import redis.asyncio as redis_async
+        from core.config import get_settings
+        from services.whatsapp.outbound_queue import descarregar_fila
+        from services.whatsapp.whatsapp_sender import criar_whatsapp_sender
+        
+        settings = get_settings()
+        
+        async def _enviar() -> Dict:
+            redis = redis_async.from_url(settings.redis_url, decode_responses=True)
+            sender = criar_whatsapp_sender()
+            try:
+                return await descarregar_fila(sender, redis, limite_diario=settings.whatsapp_limite_diario)
+            finally:
+                if sender:
+                    await sender.close()
+                await redis.aclose()
+        
+        stats = asyncio.run(_enviar())
+        
+        if stats.get('enviadas') or stats.get('falhas'):
+            logger.info(f"[WHATSAPP] Fila: {stats}")
+        
+        return {
+            **stats,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"[WHATSAPP] Erro ao enviar fila: {e}")
+        return {
+            'status': 'erro',
+            'erro': str(e),
+            'timestamp': datetime.now().isoformat()
+        }
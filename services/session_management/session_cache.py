@@ -0,0 +1,212 @@
+"""
+Cache de sessões de conversa no Redis (write-behind, cliente assíncrono)
+
+A sessão ativa de cada (phone, chat_id) fica no Redis com TTL igual ao
+timeout da sessão. Atualizações só marcam a sessão como suja; um flush
+periódico grava as sessões sujas no Postgres em lote. Atualizações
+concorrentes da mesma sessão usam WATCH/MULTI (nenhuma se perde).
+
+Chaves:
+- sessao:chat:{phone}:{chat_id} -> id da sessão
+- sessao:{id}                   -> JSON da sessão (to_dict + expires_at)
+- sessao:sujas                  -> set de ids pendentes de gravação
+"""
+
+import asyncio
+import json
+import random
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional
+
+from core.logger import logger
+
+CHAVE_SUJAS = "sessao:sujas"
+
+# Sessões gravadas por lote no flush
+TAMANHO_LOTE_FLUSH = 200
+
+# Tentativas de atualizar uma sessão alterada por outra requisição no meio
+# (espera aleatória crescente entre elas, até ESPERA_CONFLITO_S por tentativa)
+MAX_TENTATIVAS_ATUALIZACAO = 20
+ESPERA_CONFLITO_S = 0.005
+
+
+class SessionCache:
+    """Sessões ativas no Redis com gravação adiada no banco"""
+
+    def __init__(self, redis, ttl_segundos: int):
+        self.redis = redis
+        self.ttl_segundos = ttl_segundos
+
+    @staticmethod
+    def _chave_chat(phone: str, chat_id: str) -> str:
+        return f"sessao:chat:{phone}:{chat_id}"
+
+    @staticmethod
+    def _chave_sessao(session_id: str) -> str:
+        return f"sessao:{session_id}"
+
+    # LEITURA
+
+    async def obter(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Sessão pelo id (None se ausente ou expirada)"""
+        bruto = await self.redis.get(self._chave_sessao(session_id))
+        if not bruto:
+            return None
+
+        sessao = json.loads(bruto)
+        expires_at = sessao.get('expires_at')
+        if expires_at and datetime.utcnow() > datetime.fromisoformat(expires_at):
+            return None
+        return sessao
+
+    async def obter_por_chat(self, phone: str, chat_id: str) -> Optional[Dict[str, Any]]:
+        """Sessão ativa da conversa"""
+        session_id = await self.redis.get(self._chave_chat(phone, chat_id))
+        if not session_id:
+            return None
+        return await self.obter(session_id)
+
+    # ESCRITA
+
+    async def armazenar(self, sessao: Dict[str, Any], suja: bool = False):
+        """Gravar sessão no cache (e marcar para flush se suja)"""
+        pipe = self.redis.pipeline()
+        pipe.set(self._chave_sessao(sessao['id']), json.dumps(sessao), ex=self.ttl_segundos)
+        pipe.set(self._chave_chat(sessao['phone'], sessao['chat_id']), sessao['id'], ex=self.ttl_segundos)
+        if suja:
+            pipe.sadd(CHAVE_SUJAS, sessao['id'])
+        await pipe.execute()
+
+    async def atualizar(
+        self,
+        session_id: str,
+        aplicar: Callable[[Dict[str, Any]], None]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Ler, alterar com aplicar(sessao) e gravar (suja) atomicamente; repete
+        se outra requisição gravou a sessão no meio. None se ausente ou expirada.
+        """
+        from redis.exceptions import WatchError
+
+        chave = self._chave_sessao(session_id)
+        for tentativa in range(MAX_TENTATIVAS_ATUALIZACAO):
+            async with self.redis.pipeline() as pipe:
+                try:
+                    await pipe.watch(chave)
+                    bruto = await pipe.get(chave)
+                    if not bruto:
+                        return None
+                    sessao = json.loads(bruto)
+                    expires_at = sessao.get('expires_at')
+                    if expires_at and datetime.utcnow() > datetime.fromisoformat(expires_at):
+                        return None
+
+                    aplicar(sessao)
+                    pipe.multi()
+                    pipe.set(chave, json.dumps(sessao), ex=self.ttl_segundos)
+                    pipe.set(self._chave_chat(sessao['phone'], sessao['chat_id']), sessao['id'], ex=self.ttl_segundos)
+                    pipe.sadd(CHAVE_SUJAS, sessao['id'])
+                    await pipe.execute()
+                    return sessao
+                except WatchError:
+                    pass
+            await asyncio.sleep(random.uniform(0, ESPERA_CONFLITO_S * (tentativa + 1)))
+
+        raise WatchError(f"Sessão {session_id} alterada concorrentemente {MAX_TENTATIVAS_ATUALIZACAO} vezes")
+
+    async def descartar(self, sessao: Dict[str, Any]):
+        """Remover sessão do cache (finalizada ou expirada)"""
+        pipe = self.redis.pipeline()
+        pipe.delete(self._chave_sessao(sessao['id']))
+        pipe.delete(self._chave_chat(sessao['phone'], sessao['chat_id']))
+        pipe.srem(CHAVE_SUJAS, sessao['id'])
+        await pipe.execute()
+
+    # FLUSH
+
+    async def total_sujas(self) -> int:
+        return await self.redis.scard(CHAVE_SUJAS)
+
+    async def descarregar(self, session_ids: Optional[List[str]] = None) -> int:
+        """
+        Gravar sessões sujas no Postgres em lotes
+        session_ids limita o flush a essas sessões. Retorna quantas foram gravadas.
+        """
+        gravadas = 0
+
+        while True:
+            if session_ids is None:
+                ids = await self.redis.spop(CHAVE_SUJAS, TAMANHO_LOTE_FLUSH) or []
+            else:
+                ids = [i for i in session_ids if await self.redis.srem(CHAVE_SUJAS, i)]
+            if not ids:
+                break
+
+            # Sessões alteradas depois do SPOP voltam para o set e entram no próximo flush
+            sessoes = []
+            for bruto in await self.redis.mget([self._chave_sessao(i) for i in ids]):
+                if bruto:
+                    sessoes.append(json.loads(bruto))
+
+            try:
+                await self._gravar_lote(sessoes)
+            except Exception as e:
+                logger.error(f"[SESSION_CACHE] Erro no flush de {len(ids)} sessões: {e}")
+                await self.redis.sadd(CHAVE_SUJAS, *ids)
+                raise
+
+            gravadas += len(sessoes)
+            if session_ids is not None:
+                break
+
+        if gravadas:
+            logger.debug(f"[SESSION_CACHE] {gravadas} sessões gravadas no banco")
+        return gravadas
+
+    async def _gravar_lote(self, sessoes: List[Dict[str, Any]]):
+        if not sessoes:
+            return
+
+        import uuid
+        from sqlalchemy import update
+        from core.database import get_async_db_session
+        from services.session_management.session_manager import ConversationSession
+
+        mappings = [
+            {
+                'id': uuid.UUID(sessao['id']),
+                'contact_name': sessao.get('contact_name'),
+                'conversation_stage': sessao.get('conversation_stage'),
+                'last_intent': sessao.get('last_intent'),
+                'last_message': sessao.get('last_message'),
+                'collected_info': sessao.get('collected_info') or {},
+                'context_data': sessao.get('context_data') or {},
+                'active': sessao.get('active', True),
+                'updated_at': _data(sessao.get('updated_at')),
+                'expires_at': _data(sessao.get('expires_at'))
+            }
+            for sessao in sessoes
+        ]
+
+        # UPDATE em lote por chave primária (executemany)
+        async with get_async_db_session() as db:
+            await db.execute(update(ConversationSession), mappings)
+
+
+def _data(valor: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(valor) if valor else None
+
+
+def criar_session_cache(ttl_segundos: int) -> Optional[SessionCache]:
+    """
+    SessionCache sobre o cliente Redis assíncrono do processo (None se
+    redis.asyncio indisponível). Todos os SessionManager dividem o mesmo
+    cliente; core.redis_config.fechar_redis_async() o encerra.
+    """
+    try:
+        from core.redis_config import obter_redis_async
+        return SessionCache(obter_redis_async(), ttl_segundos)
+    except Exception as e:
+        logger.warning(f"[SESSION_CACHE] Redis indisponível, sessões direto no banco: {e}")
+        return None
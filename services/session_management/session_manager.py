@@ -4,13 +4,14 @@ Gerenciador de Sessões de Conversa
 
 import json
 import uuid
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
-from sqlalchemy import Column, String, DateTime, Text, Boolean
+from sqlalchemy import Column, String, DateTime, Text, Boolean, select, update
 from sqlalchemy.dialects.postgresql import UUID, JSON
 
 from models.base import Base
-from core.database import get_db_session
+from core.database import get_async_db_session
+from core.logger import logger
 
 class ConversationSession(Base):
     __tablename__ = "conversation_sessions"
@@ -52,10 +53,14 @@ class ConversationSession(Base):
         }
 
 class SessionManager:
-    """Gerenciador de sessões de conversa"""
+    """Gerenciador de sessões de conversa (banco assíncrono + cache Redis)"""
     
-    def __init__(self):
+    def __init__(self, usar_cache: bool = True):
         self.session_timeout_hours = 24
+        self.cache = None
+        if usar_cache:
+            from services.session_management.session_cache import criar_session_cache
+            self.cache = criar_session_cache(self.session_timeout_hours * 3600)
     
     async def get_or_create_session(
         self, 
@@ -65,13 +70,21 @@ class SessionManager:
     ) -> Dict[str, Any]:
         """Obter sessão existente ou criar nova"""
         
-        with get_db_session() as db:
+        # Conversa em andamento: atendida pelo cache, sem SQL
+        cached = await self._cache_obter_por_chat(phone, chat_id)
+        if cached:
+            return self._sessao_publica(cached)
+        
+        async with get_async_db_session() as db:
             # Buscar sessão ativa existente
-            session = db.query(ConversationSession).filter_by(
-                phone=phone,
-                chat_id=chat_id,
-                active=True
-            ).first()
+            result = await db.execute(
+                select(ConversationSession).filter_by(
+                    phone=phone,
+                    chat_id=chat_id,
+                    active=True
+                ).limit(1)
+            )
+            session = result.scalars().first()
             
             # Se não existe ou expirou, criar nova
             if not session or self._is_expired(session):
@@ -85,10 +98,13 @@ class SessionManager:
                     expires_at=datetime.utcnow() + timedelta(hours=self.session_timeout_hours)
                 )
                 db.add(session)
-                db.commit()
-                db.refresh(session)
+                await db.commit()
+                await db.refresh(session)
             
-            return session.to_dict()
+            sessao = self._sessao_cache(session)
+        
+        await self._cache_armazenar(sessao)
+        return self._sessao_publica(sessao)
     
     async def update_session(
         self, 
@@ -100,11 +116,28 @@ class SessionManager:
     ) -> bool:
         """Atualizar sessão existente"""
         
-        with get_db_session() as db:
-            session = db.query(ConversationSession).filter_by(
-                id=session_id,
-                active=True
-            ).first()
+        # Sessão no cache: atualizar lá (atômico) e gravar no banco no próximo flush
+        atualizada = await self._cache_atualizar(
+            session_id,
+            lambda sessao: self._aplicar_atualizacao(
+                sessao, last_message, context_update, conversation_stage, last_intent
+            )
+        )
+        if atualizada:
+            return True
+        
+        session_uuid = _uuid(session_id)
+        if session_uuid is None:
+            return False
+        
+        async with get_async_db_session() as db:
+            result = await db.execute(
+                select(ConversationSession).filter_by(
+                    id=session_uuid,
+                    active=True
+                ).limit(1)
+            )
+            session = result.scalars().first()
             
             if not session:
                 return False
@@ -121,13 +154,13 @@ class SessionManager:
             
             if context_update:
                 # Merge context data
-                current_context = session.context_data or {}
+                current_context = dict(session.context_data or {})
                 current_context.update(context_update)
                 session.context_data = current_context
                 
                 # Merge collected info se presente
                 if 'collected_info' in context_update:
-                    current_info = session.collected_info or {}
+                    current_info = dict(session.collected_info or {})
                     current_info.update(context_update['collected_info'])
                     session.collected_info = current_info
             
@@ -135,17 +168,28 @@ class SessionManager:
             session.expires_at = datetime.utcnow() + timedelta(hours=self.session_timeout_hours)
             session.updated_at = datetime.utcnow()
             
-            db.commit()
+            await db.commit()
             return True
     
     async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Obter sessão por ID"""
         
-        with get_db_session() as db:
-            session = db.query(ConversationSession).filter_by(
-                id=session_id,
-                active=True
-            ).first()
+        cached = await self._cache_obter(session_id)
+        if cached:
+            return self._sessao_publica(cached)
+        
+        session_uuid = _uuid(session_id)
+        if session_uuid is None:
+            return None
+        
+        async with get_async_db_session() as db:
+            result = await db.execute(
+                select(ConversationSession).filter_by(
+                    id=session_uuid,
+                    active=True
+                ).limit(1)
+            )
+            session = result.scalars().first()
             
             if session and not self._is_expired(session):
                 return session.to_dict()
@@ -155,15 +199,23 @@ class SessionManager:
     async def end_session(self, session_id: str) -> bool:
         """Finalizar sessão"""
         
-        with get_db_session() as db:
-            session = db.query(ConversationSession).filter_by(
-                id=session_id
-            ).first()
+        # Gravar alterações pendentes antes de encerrar
+        cached = await self._cache_obter(session_id)
+        if cached:
+            await self.flush_sessions([session_id])
+            await self._cache_descartar(cached)
+        
+        session_uuid = _uuid(session_id)
+        if session_uuid is None:
+            return False
+        
+        async with get_async_db_session() as db:
+            session = await db.get(ConversationSession, session_uuid)
             
             if session:
                 session.active = False
                 session.conversation_stage = 'finished'
-                db.commit()
+                await db.commit()
                 return True
             
             return False
@@ -171,19 +223,115 @@ class SessionManager:
     async def cleanup_expired_sessions(self) -> int:
         """Limpar sessões expiradas"""
         
-        with get_db_session() as db:
-            expired_sessions = db.query(ConversationSession).filter(
-                ConversationSession.expires_at < datetime.utcnow(),
-                ConversationSession.active == True
-            ).all()
-            
-            count = len(expired_sessions)
+        # Estado mais recente das sessões do cache vai para o banco primeiro
+        await self.flush_sessions()
+        
+        async with get_async_db_session() as db:
+            result = await db.execute(
+                update(ConversationSession).where(
+                    ConversationSession.expires_at < datetime.utcnow(),
+                    ConversationSession.active == True
+                ).values(active=False)
+            )
             
-            for session in expired_sessions:
-                session.active = False
+            await db.commit()
+            return result.rowcount
+    
+    async def flush_sessions(self, session_ids: List[str] = None) -> int:
+        """Gravar no banco as sessões alteradas no cache"""
+        if not self.cache:
+            return 0
+        try:
+            return await self.cache.descarregar(session_ids)
+        except Exception as e:
+            logger.error(f"Erro ao gravar sessões do cache: {e}")
+            return 0
+    
+    # CACHE (falhas do Redis caem no caminho pelo banco)
+    
+    async def _cache_obter(self, session_id: str) -> Optional[Dict[str, Any]]:
+        if not self.cache:
+            return None
+        try:
+            return await self.cache.obter(session_id)
+        except Exception as e:
+            logger.warning(f"Cache de sessões indisponível: {e}")
+            return None
+    
+    async def _cache_obter_por_chat(self, phone: str, chat_id: str) -> Optional[Dict[str, Any]]:
+        if not self.cache:
+            return None
+        try:
+            return await self.cache.obter_por_chat(phone, chat_id)
+        except Exception as e:
+            logger.warning(f"Cache de sessões indisponível: {e}")
+            return None
+    
+    async def _cache_armazenar(self, sessao: Dict[str, Any], suja: bool = False) -> bool:
+        if not self.cache:
+            return False
+        try:
+            await self.cache.armazenar(sessao, suja=suja)
+            return True
+        except Exception as e:
+            logger.warning(f"Cache de sessões indisponível: {e}")
+            return False
+    
+    async def _cache_atualizar(self, session_id: str, aplicar) -> Optional[Dict[str, Any]]:
+        if not self.cache:
+            return None
+        try:
+            return await self.cache.atualizar(session_id, aplicar)
+        except Exception as e:
+            logger.warning(f"Cache de sessões indisponível: {e}")
+            return None
+    
+    async def _cache_descartar(self, sessao: Dict[str, Any]):
+        try:
+            await self.cache.descartar(sessao)
+        except Exception as e:
+            logger.warning(f"Cache de sessões indisponível: {e}")
+    
+    def _sessao_cache(self, session: ConversationSession) -> Dict[str, Any]:
+        """to_dict + expires_at (necessário para expirar e gravar a partir do cache)"""
+        sessao = session.to_dict()
+        sessao['expires_at'] = session.expires_at.isoformat() if session.expires_at else None
+        return sessao
+    
+    def _sessao_publica(self, sessao: Dict[str, Any]) -> Dict[str, Any]:
+        """Mesmo formato de ConversationSession.to_dict()"""
+        return {chave: valor for chave, valor in sessao.items() if chave != 'expires_at'}
+    
+    def _aplicar_atualizacao(
+        self,
+        sessao: Dict[str, Any],
+        last_message: str = None,
+        context_update: Dict[str, Any] = None,
+        conversation_stage: str = None,
+        last_intent: str = None
+    ):
+        """Mesmas regras de update_session aplicadas ao dicionário do cache"""
+        if last_message:
+            sessao['last_message'] = last_message
+        
+        if conversation_stage:
+            sessao['conversation_stage'] = conversation_stage
+        
+        if last_intent:
+            sessao['last_intent'] = last_intent
+        
+        if context_update:
+            sessao['context_data'] = {**(sessao.get('context_data') or {}), **context_update}
             
-            db.commit()
-            return count
+            if 'collected_info' in context_update:
+                sessao['collected_info'] = {
+                    **(sessao.get('collected_info') or {}),
+                    **context_update['collected_info']
+                }
+        
+        agora = datetime.utcnow()
+        sessao['expires_at'] = (agora + timedelta(hours=self.session_timeout_hours)).isoformat()
+        sessao['updated_at'] = agora.isoformat()
     
     def _is_expired(self, session: ConversationSession) -> bool:
         """Verificar se sessão está expirada"""
@@ -191,6 +339,12 @@ class SessionManager:
             return False
         return datetime.utcnow() > session.expires_at
 
+def _uuid(session_id: str) -> Optional[uuid.UUID]:
+    try:
+        return uuid.UUID(str(session_id))
+    except ValueError:
+        return None
+
 # Criar tabela na inicialização
 def create_session_table():
     """Criar tabela de sessões"""
@@ -0,0 +1,138 @@
+"""
+Agrupamento de mensagens em sequência do mesmo chat (debounce no Redis)
+
+Leads costumam mandar várias mensagens curtas seguidas ("oi", "tudo bem?",
+"queria ver apto"). A primeira requisição do chat vira líder: espera até o
+chat ficar `janela_s` sem mensagens novas (no máximo `max_s` desde a
+primeira) e processa todas juntas, com uma só resposta. As requisições que
+chegam nesse intervalo só entram no buffer e retornam sem resposta.
+
+Entrada no buffer e coleta pelo líder são scripts Lua (atômicos), então uma
+mensagem nunca fica no buffer sem líder, mesmo com vários workers da API.
+
+Chaves:
+- webhook:agrupar:{chat_id}:buffer -> lista de mensagens (JSON)
+- webhook:agrupar:{chat_id}:ultima -> timestamp (ms) da última mensagem
+- webhook:agrupar:{chat_id}:lider  -> timestamp (ms) da primeira mensagem do grupo
+"""
+
+import asyncio
+import json
+import time
+from typing import Dict, Any, List, Optional
+
+from core.logger import logger
+
+# KEYS: buffer, ultima, lider | ARGV: mensagem, agora_ms, ttl_ms
+# Retorna 1 se esta requisição virou líder do grupo
+SCRIPT_ADICIONAR = """
+redis.call('RPUSH', KEYS[1], ARGV[1])
+redis.call('PEXPIRE', KEYS[1], ARGV[3])
+redis.call('SET', KEYS[2], ARGV[2], 'PX', ARGV[3])
+if redis.call('SET', KEYS[3], ARGV[2], 'NX', 'PX', ARGV[3]) then
+    return 1
+end
+return 0
+"""
+
+# KEYS: buffer, ultima, lider | ARGV: agora_ms, janela_ms, max_ms
+# Retorna {'aguardar', ms} enquanto o chat está ativo, ou {'ok', mensagens...}
+SCRIPT_COLETAR = """
+local agora = tonumber(ARGV[1])
+local ultima = tonumber(redis.call('GET', KEYS[2]) or '0')
+local inicio = tonumber(redis.call('GET', KEYS[3]) or ARGV[1])
+local resto = ultima + tonumber(ARGV[2]) - agora
+local limite = inicio + tonumber(ARGV[3]) - agora
+if resto > 0 and limite > 0 then
+    return {'aguardar', tostring(math.min(resto, limite))}
+end
+local mensagens = redis.call('LRANGE', KEYS[1], 0, -1)
+redis.call('DEL', KEYS[1], KEYS[3])
+table.insert(mensagens, 1, 'ok')
+return mensagens
+"""
+
+# KEYS: buffer, lider | Retira o buffer e libera o chat (líder que falhou)
+SCRIPT_LIBERAR = """
+local mensagens = redis.call('LRANGE', KEYS[1], 0, -1)
+redis.call('DEL', KEYS[1], KEYS[2])
+return mensagens
+"""
+
+# Folga no TTL das chaves além do tempo máximo de espera (líder que caiu libera o chat)
+FOLGA_TTL_S = 30
+
+
+class MessageCoalescer:
+    """Debounce por chat_id com buffer compartilhado no Redis"""
+
+    def __init__(self, redis, janela_s: float = 1.5, max_s: float = 6.0):
+        self.redis = redis
+        self.janela_ms = int(janela_s * 1000)
+        self.max_ms = int(max_s * 1000)
+        self.ttl_ms = self.max_ms + FOLGA_TTL_S * 1000
+        self._adicionar = redis.register_script(SCRIPT_ADICIONAR)
+        self._coletar = redis.register_script(SCRIPT_COLETAR)
+        self._liberar = redis.register_script(SCRIPT_LIBERAR)
+
+    @staticmethod
+    def _chaves(chat_id: str) -> List[str]:
+        prefixo = f"webhook:agrupar:{chat_id}"
+        return [f"{prefixo}:buffer", f"{prefixo}:ultima", f"{prefixo}:lider"]
+
+    async def adicionar(self, chat_id: str, mensagem: Dict[str, Any]) -> bool:
+        """Colocar mensagem no buffer do chat; True se quem chamou deve processar o grupo"""
+        lider = await self._adicionar(
+            keys=self._chaves(chat_id),
+            args=[json.dumps(mensagem), _agora_ms(), self.ttl_ms]
+        )
+        return bool(int(lider))
+
+    async def coletar(self, chat_id: str) -> List[Dict[str, Any]]:
+        """(Líder) Esperar o chat ficar quieto e retirar todas as mensagens do buffer"""
+        while True:
+            resultado = await self._coletar(
+                keys=self._chaves(chat_id),
+                args=[_agora_ms(), self.janela_ms, self.max_ms]
+            )
+            if resultado[0] == 'aguardar':
+                await asyncio.sleep(int(resultado[1]) / 1000)
+                continue
+            return [json.loads(bruto) for bruto in resultado[1:]]
+
+    async def liberar(self, chat_id: str) -> List[Dict[str, Any]]:
+        """(Líder que falhou) Retirar o buffer e apagar o líder para o chat não ficar mudo"""
+        buffer, _, lider = self._chaves(chat_id)
+        return [json.loads(bruto) for bruto in await self._liberar(keys=[buffer, lider])]
+
+
+def combinar_mensagens(mensagens: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Um payload a partir do grupo: textos em ordem, demais campos da última mensagem"""
+    combinada = dict(mensagens[-1])
+    combinada['message'] = "\n".join(m['message'] for m in mensagens if m.get('message'))
+    return combinada
+
+
+def _agora_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def criar_message_coalescer() -> Optional[MessageCoalescer]:
+    """MessageCoalescer configurado pelo Settings (None se desativado ou Redis indisponível)"""
+    from core.config import get_settings
+
+    settings = get_settings()
+    if settings.webhook_coalesce_window_s <= 0:
+        return None
+
+    try:
+        from core.redis_config import obter_redis_async
+
+        return MessageCoalescer(
+            obter_redis_async(),
+            janela_s=settings.webhook_coalesce_window_s,
+            max_s=settings.webhook_coalesce_max_s
+        )
+    except Exception as e:
+        logger.warning(f"[WEBHOOK] Agrupamento de mensagens desativado: {e}")
+        return None
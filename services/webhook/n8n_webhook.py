@@ -3,13 +3,14 @@ Webhook Receiver para N8N
 """
 
 from fastapi import APIRouter, HTTPException, Request
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 import json
 import uuid
 
 from services.message_processing.message_processor import MessageProcessor
 from services.session_management.session_manager import SessionManager
+from services.webhook.message_coalescer import criar_message_coalescer, combinar_mensagens
 from core.logger import logger
 
 router = APIRouter(prefix="/webhook", tags=["N8N Webhook"])
@@ -17,6 +18,7 @@ router = APIRouter(prefix="/webhook", tags=["N8N Webhook"])
 # Instâncias globais
 message_processor = MessageProcessor()
 session_manager = SessionManager()
+message_coalescer = criar_message_coalescer()
 
 @router.post("/n8n/incoming")
 async def receive_n8n_message(request: Request) -> Dict[str, Any]:
@@ -55,14 +57,22 @@ async def receive_n8n_message(request: Request) -> Dict[str, Any]:
         
         logger.info(f"📥 Mensagem recebida do N8N - Phone: {phone}, Message: {message[:50]}...")
         
+        mensagem = {
+            "phone": phone,
+            "message": message,
+            "chat_id": chat_id,
+            "contact_name": contact_name,
+            "message_type": message_type
+        }
+        
+        # Mensagens seguidas do mesmo chat: só a primeira requisição responde
+        mensagens = await coalesce_message(mensagem)
+        if mensagens is None:
+            return coalesced_response(phone, chat_id)
+        
         # Processar mensagem
-        response = await process_incoming_message(
-            phone=phone,
-            message=message,
-            chat_id=chat_id,
-            contact_name=contact_name,
-            message_type=message_type
-        )
+        response = await process_incoming_message(**combinar_mensagens(mensagens))
+        response["metadata"]["coalesced_messages"] = len(mensagens)
         
         return response
         
@@ -73,6 +83,43 @@ async def receive_n8n_message(request: Request) -> Dict[str, Any]:
             detail=f"Erro interno: {str(e)}"
         )
 
+async def coalesce_message(mensagem: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Agrupar mensagem com as próximas do mesmo chat
+    Retorna as mensagens a processar juntas, ou None se outra requisição já responde por elas.
+    """
+    if not message_coalescer:
+        return [mensagem]
+    
+    lider = False
+    try:
+        if not await message_coalescer.adicionar(mensagem['chat_id'], mensagem):
+            return None
+        lider = True
+        return await message_coalescer.coletar(mensagem['chat_id']) or [mensagem]
+    except Exception as e:
+        logger.warning(f"⚠️ Agrupamento indisponível, processando mensagem isolada: {e}")
+        if lider:
+            # Mensagens que os seguidores já deixaram no buffer saem nesta resposta
+            try:
+                return await message_coalescer.liberar(mensagem['chat_id']) or [mensagem]
+            except Exception as erro_liberar:
+                logger.error(f"❌ Erro ao liberar o agrupamento do chat {mensagem['chat_id']}: {erro_liberar}")
+        return [mensagem]
+
+def coalesced_response(phone: str, chat_id: str) -> Dict[str, Any]:
+    """Resposta da requisição agrupada: sem mensagem (N8N não envia nada)"""
+    return {
+        "success": True,
+        "coalesced": True,
+        "phone": phone,
+        "chat_id": chat_id,
+        "response_data": None,
+        "metadata": {
+            "timestamp": datetime.now().isoformat()
+        }
+    }
+
 async def process_incoming_message(
     phone: str,
     message: str,
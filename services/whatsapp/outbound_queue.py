@@ -0,0 +1,181 @@
+"""
+Fila durável de envio de WhatsApp (Redis)
+
+Quem gera a mensagem só enfileira e retorna; a task enviar_fila_whatsapp
+descarrega a fila com o WhatsAppSender (pool, limite de taxa, retry).
+
+Chaves:
+- whatsapp:fila         -> mensagens pendentes (JSON, LPUSH / LMOVE pela direita)
+- whatsapp:processando  -> mensagens retiradas e ainda não confirmadas
+- whatsapp:falhas       -> mensagens que esgotaram as tentativas
+- whatsapp:descarga     -> lock do descarregador (token; um por vez, o limite de taxa é por número)
+- whatsapp:destinatarios:{data} -> destinatários únicos do dia (limite do tier)
+"""
+
+import asyncio
+import json
+import uuid
+from datetime import datetime, date
+from typing import Dict, Any, List, Optional
+
+from core.logger import logger
+from core.redis_config import LIBERAR_LOCK_LUA
+from services.whatsapp.whatsapp_sender import formatar_telefone
+
+CHAVE_FILA = "whatsapp:fila"
+CHAVE_PROCESSANDO = "whatsapp:processando"
+CHAVE_FALHAS = "whatsapp:falhas"
+CHAVE_LOCK = "whatsapp:descarga"
+
+TTL_LOCK_S = 300
+TAMANHO_LOTE = 200
+TTL_DESTINATARIOS_S = 2 * 24 * 3600
+
+# KEYS: destinatários do dia | ARGV: telefone, limite, ttl
+# Atômico: envios concorrentes do lote não passam do limite do tier
+SCRIPT_RESERVAR_DESTINATARIO = """
+if redis.call('SISMEMBER', KEYS[1], ARGV[1]) == 1 then
+    return 1
+end
+if redis.call('SCARD', KEYS[1]) >= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('SADD', KEYS[1], ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+# KEYS: lock | ARGV: token, ttl - renova só se o lock ainda é deste descarregador
+SCRIPT_RENOVAR_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def enfileirar_mensagem(telefone: str, mensagem: str, metadados: Optional[Dict[str, Any]] = None,
+                        redis=None) -> Dict[str, Any]:
+    """
+    Colocar mensagem na fila de envio (síncrono, retorna na hora)
+    ValueError se o telefone não tem dígitos (a Graph API recusaria o envio)
+    """
+    if not formatar_telefone(telefone or ''):
+        raise ValueError(f"Telefone inválido para WhatsApp: '{telefone}'")
+    
+    if redis is None:
+        from core.redis_config import redis_client as redis
+
+    item = {
+        'id': str(uuid.uuid4()),
+        'telefone': telefone,
+        'mensagem': mensagem,
+        'metadados': metadados or {},
+        'enfileirado_em': datetime.now().isoformat()
+    }
+    redis.lpush(CHAVE_FILA, json.dumps(item))
+    return item
+
+
+def _chave_destinatarios(dia: date) -> str:
+    return f"whatsapp:destinatarios:{dia.isoformat()}"
+
+
+async def descarregar_fila(sender, redis, limite_diario: int = 0, max_mensagens: int = 0) -> Dict[str, Any]:
+    """
+    Enviar mensagens da fila até esvaziar (ou max_mensagens)
+    limite_diario: destinatários únicos por dia (tier do número); ao atingir, o resto fica na fila.
+    """
+    stats = {'enviadas': 0, 'falhas': 0, 'adiadas': 0}
+
+    token = uuid.uuid4().hex
+    if not await redis.set(CHAVE_LOCK, token, nx=True, ex=TTL_LOCK_S):
+        stats['status'] = 'em_andamento'
+        return stats
+
+    try:
+        # Itens de um descarregador anterior que caiu voltam para a fila
+        while await redis.lmove(CHAVE_PROCESSANDO, CHAVE_FILA, 'RIGHT', 'RIGHT'):
+            pass
+
+        while not max_mensagens or stats['enviadas'] + stats['falhas'] < max_mensagens:
+            lote = await _retirar_lote(redis)
+            if not lote:
+                break
+
+            if not int(await redis.eval(SCRIPT_RENOVAR_LOCK, 1, CHAVE_LOCK, token, TTL_LOCK_S)):
+                # Lock expirou e outro descarregador assumiu: devolver o lote e parar
+                logger.warning("[WHATSAPP] Lock da descarga perdido, devolvendo lote à fila")
+                for bruto in lote:
+                    await redis.lrem(CHAVE_PROCESSANDO, 1, bruto)
+                    await redis.rpush(CHAVE_FILA, bruto)
+                break
+
+            resultados = await asyncio.gather(*[
+                _enviar_item(sender, redis, bruto, limite_diario) for bruto in lote
+            ])
+            for resultado in resultados:
+                stats[resultado] += 1
+            if stats['adiadas']:
+                break
+    finally:
+        await redis.eval(LIBERAR_LOCK_LUA, 1, CHAVE_LOCK, token)
+
+    stats['pendentes'] = await redis.llen(CHAVE_FILA)
+    stats['status'] = 'sucesso'
+    return stats
+
+
+async def _retirar_lote(redis) -> List[str]:
+    lote = []
+    for _ in range(TAMANHO_LOTE):
+        bruto = await redis.lmove(CHAVE_FILA, CHAVE_PROCESSANDO, 'RIGHT', 'LEFT')
+        if bruto is None:
+            break
+        lote.append(bruto)
+    return lote
+
+
+async def _enviar_item(sender, redis, bruto: str, limite_diario: int) -> str:
+    item = json.loads(bruto)
+
+    if limite_diario and not await _reservar_destinatario(redis, item['telefone'], limite_diario):
+        # Tier do dia esgotado: volta para a fila (sai no próximo dia)
+        await redis.lrem(CHAVE_PROCESSANDO, 1, bruto)
+        await redis.rpush(CHAVE_FILA, bruto)
+        return 'adiadas'
+
+    if sender is None:
+        logger.info(f"[SIMULAÇÃO] WhatsApp para {item['telefone']}: {item['mensagem'][:50]}...")
+        resultado = {'status': 'simulated'}
+    else:
+        resultado = await sender.enviar_texto(item['telefone'], item['mensagem'])
+
+    await redis.lrem(CHAVE_PROCESSANDO, 1, bruto)
+    if resultado['status'] == 'error':
+        item['erro'] = resultado.get('error')
+        await redis.lpush(CHAVE_FALHAS, json.dumps(item))
+        return 'falhas'
+    return 'enviadas'
+
+
+async def _reservar_destinatario(redis, telefone: str, limite_diario: int) -> bool:
+    """Destinatário já contado hoje ou ainda cabe no limite do tier"""
+    reservado = await redis.eval(
+        SCRIPT_RESERVAR_DESTINATARIO, 1,
+        _chave_destinatarios(date.today()), formatar_telefone(telefone), limite_diario, TTL_DESTINATARIOS_S
+    )
+    return bool(int(reservado))
+
+
+def status_fila(redis=None) -> Dict[str, Any]:
+    """Tamanho das filas (síncrono, para endpoints/relatórios)"""
+    if redis is None:
+        from core.redis_config import redis_client as redis
+
+    return {
+        'pendentes': redis.llen(CHAVE_FILA),
+        'processando': redis.llen(CHAVE_PROCESSANDO),
+        'falhas': redis.llen(CHAVE_FALHAS),
+        'destinatarios_hoje': redis.scard(_chave_destinatarios(date.today()))
+    }
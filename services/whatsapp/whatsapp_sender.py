@@ -0,0 +1,138 @@
+"""
+Envio assíncrono para a WhatsApp Cloud API (Graph)
+
+- Um httpx.AsyncClient por sender: conexões HTTP/keep-alive reutilizadas
+- Token bucket limitando mensagens/s à vazão do número (tier do WhatsApp)
+- Retry com backoff exponencial + jitter em 429, 5xx e erros de rede,
+  respeitando Retry-After quando a Graph API envia
+"""
+
+import asyncio
+import random
+from typing import Dict, Any, Optional
+
+import httpx
+
+from core.logger import logger
+from utils.rate_limit import TokenBucket
+
+# Códigos que valem nova tentativa (limite de taxa e falhas do lado da Meta)
+STATUS_RETENTAVEIS = {429, 500, 502, 503, 504}
+
+
+def formatar_telefone(phone: str) -> str:
+    """Formatar número de telefone para WhatsApp (só dígitos, com DDI 55)"""
+    clean_phone = ''.join(filter(str.isdigit, phone))
+
+    # Adicionar código do país se necessário (Brasil = 55)
+    if len(clean_phone) == 11 and clean_phone.startswith('11'):
+        clean_phone = '55' + clean_phone
+    elif len(clean_phone) == 10:
+        clean_phone = '5511' + clean_phone
+
+    return clean_phone
+
+
+class WhatsAppSender:
+    """Sender assíncrono com pool de conexões, limite de taxa e retry"""
+
+    def __init__(
+        self,
+        token: str,
+        phone_id: str,
+        api_url: str = "https://graph.facebook.com/v18.0",
+        mensagens_por_segundo: float = 80,
+        max_conexoes: int = 20,
+        max_tentativas: int = 5,
+        backoff_base_s: float = 0.5,
+        timeout_s: float = 15
+    ):
+        self.url = f"{api_url.rstrip('/')}/{phone_id}/messages"
+        self.max_tentativas = max_tentativas
+        self.backoff_base_s = backoff_base_s
+        self.limitador = TokenBucket(mensagens_por_segundo)
+        self.client = httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=httpx.Timeout(timeout_s, connect=5),
+            limits=httpx.Limits(max_connections=max_conexoes, max_keepalive_connections=max_conexoes)
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def enviar_texto(self, telefone: str, mensagem: str) -> Dict[str, Any]:
+        """Enviar mensagem de texto; mesmo formato de retorno de WhatsAppService.send_message"""
+        numero = formatar_telefone(telefone)
+        payload = {
+            "messaging_product": "whatsapp",
+            "to": numero,
+            "type": "text",
+            "text": {"body": mensagem}
+        }
+
+        erro = None
+        for tentativa in range(1, self.max_tentativas + 1):
+            await self.limitador.adquirir()
+            espera = None
+            try:
+                response = await self.client.post(self.url, json=payload)
+                if response.status_code < 400:
+                    result = response.json()
+                    return {
+                        'status': 'success',
+                        'message_id': result.get('messages', [{}])[0].get('id'),
+                        'to': numero,
+                        'message': mensagem,
+                        'tentativas': tentativa
+                    }
+
+                erro = f"HTTP {response.status_code}: {response.text[:200]}"
+                if response.status_code not in STATUS_RETENTAVEIS:
+                    break
+                espera = _retry_after(response)
+
+            except httpx.TransportError as e:
+                erro = f"{type(e).__name__}: {e}"
+
+            if tentativa < self.max_tentativas:
+                espera = espera or self.backoff_base_s * (2 ** (tentativa - 1)) * random.uniform(0.5, 1.5)
+                await asyncio.sleep(espera)
+
+        logger.error(f"Erro ao enviar WhatsApp para {numero}: {erro}")
+        return {
+            'status': 'error',
+            'error': erro,
+            'to': numero,
+            'message': mensagem
+        }
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers['Retry-After'])
+    except (KeyError, ValueError):
+        return None
+
+
+def criar_whatsapp_sender() -> Optional[WhatsAppSender]:
+    """WhatsAppSender configurado pelo Settings (None se o WhatsApp não está configurado)"""
+    from core.config import get_settings
+
+    settings = get_settings()
+    if settings.whatsapp_token.startswith('your_') or settings.whatsapp_phone_id.startswith('your_'):
+        return None
+
+    return WhatsAppSender(
+        token=settings.whatsapp_token,
+        phone_id=settings.whatsapp_phone_id,
+        api_url=settings.whatsapp_api_url,
+        mensagens_por_segundo=settings.whatsapp_mensagens_por_segundo,
+        max_conexoes=settings.whatsapp_max_conexoes,
+        max_tentativas=settings.whatsapp_max_tentativas
+    )
@@ -6,6 +6,10 @@ import os
 import requests
 from typing import Dict, Any, Optional
 from core.logger import logger
+from services.whatsapp.whatsapp_sender import formatar_telefone
+
+# Timeout (conexão, leitura) das chamadas à Graph API
+TIMEOUT_REQUISICAO = (5, 15)
 
 
 class WhatsAppService:
@@ -18,6 +22,13 @@ class WhatsAppService:
         
         self.enabled = bool(self.whatsapp_token and self.whatsapp_phone_id)
         
+        # Sessão reutiliza a conexão HTTPS entre envios
+        self.http = requests.Session()
+        self.http.headers.update({
+            "Authorization": f"Bearer {self.whatsapp_token}",
+            "Content-Type": "application/json"
+        })
+        
         if self.enabled:
             logger.info("WhatsApp Business API configurado")
         else:
@@ -41,13 +52,8 @@ class WhatsAppService:
             }
         }
         
-        headers = {
-            "Authorization": f"Bearer {self.whatsapp_token}",
-            "Content-Type": "application/json"
-        }
-        
         try:
-            response = requests.post(self.base_url, json=payload, headers=headers)
+            response = self.http.post(self.base_url, json=payload, timeout=TIMEOUT_REQUISICAO)
             response.raise_for_status()
             
             result = response.json()
@@ -90,16 +96,7 @@ Gostaria de agendar uma visita?"""
     
     def _format_phone_number(self, phone: str) -> str:
         """Formatar número de telefone para WhatsApp"""
-        # Remover caracteres especiais
-        clean_phone = ''.join(filter(str.isdigit, phone))
-        
-        # Adicionar código do país se necessário (Brasil = 55)
-        if len(clean_phone) == 11 and clean_phone.startswith('11'):
-            clean_phone = '55' + clean_phone
-        elif len(clean_phone) == 10:
-            clean_phone = '5511' + clean_phone
-        
-        return clean_phone
+        return formatar_telefone(phone)
     
     def _simulate_send(self, to_number: str, message: str) -> Dict[str, Any]:
         """Simular envio de mensagem (modo desenvolvimento)"""
@@ -2,12 +2,21 @@
 Serviço principal de importação XML
 """
 
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterable, Optional, Tuple
 from datetime import datetime
+import hashlib
 import uuid
 import time
 from core.logger import logger
-from services.xml_importer.parser import XMLParser, XMLMapping
+from services.xml_importer.parser import XMLParser, XMLMapping, DownloadXML
+from services.ai_matching.amenidades import extrair_amenidades
+from services.ai_matching.esquema import garantir_colunas_matching
+
+# Imóveis por lote (linhas por INSERT ... ON CONFLICT e por UPDATE de remoção)
+TAMANHO_LOTE = 500
+
+# Colunas NOT NULL da tabela imoveis que vêm do XML
+CAMPOS_OBRIGATORIOS = ('titulo', 'tipo', 'preco', 'cidade', 'estado')
 
 
 class XMLImporter:
@@ -18,6 +27,7 @@ class XMLImporter:
         self.xml_url = xml_url
         self.xml_mapping = xml_mapping
         self.parser = XMLParser(xml_mapping)
+        self.tamanho_lote = TAMANHO_LOTE
         
     def import_imoveis(self) -> Dict[str, Any]:
         """Importar imóveis do XML"""
@@ -27,155 +37,470 @@ class XMLImporter:
         logger.info(f"Iniciando importação XML para cliente: {self.cliente_id}")
         
         try:
-            # Baixar e parsear XML
-            xml_content = self.parser.fetch_xml(self.xml_url)
-            imoveis_data = self.parser.parse_xml(xml_content)
+            # Baixar XML em streaming (requisição condicional se já houver importação anterior)
+            download, nao_modificado = self.baixar_feed()
+            try:
+                if nao_modificado:
+                    return self.registrar_nao_modificado(download, log_id, start_time)
+                
+                # Processar imóveis conforme são parseados
+                resultado = self._process_imoveis(self.parser.iter_lotes(download.arquivo, self.tamanho_lote))
+            finally:
+                download.close()
             
-            # Processar imóveis
-            resultado = self._process_imoveis(imoveis_data)
+            return self.concluir_importacao(download, resultado, log_id, start_time)
+                
+        except Exception as e:
+            return self.registrar_erro(e, log_id, start_time)
+    
+    def baixar_feed(self) -> Tuple[DownloadXML, bool]:
+        """Baixar o XML do cliente; retorna (download, nao_modificado)"""
+        estado = self._carregar_estado_feed()
+        download = self.parser.fetch_xml_stream(self.xml_url, validadores=estado)
+        
+        nao_modificado = self._feed_nao_modificado(download, estado)
+        if nao_modificado:
+            download.close()
+        return download, nao_modificado
+    
+    def registrar_nao_modificado(self, download: DownloadXML, log_id: str, start_time: float) -> Dict[str, Any]:
+        """Encerrar importação de um XML idêntico ao último processado"""
+        self._salvar_estado_feed(download, modificado=False)
+        
+        execution_time = time.time() - start_time
+        resultado = {
+            'total_imoveis': 0,
+            'imoveis_novos': 0,
+            'imoveis_atualizados': 0,
+            'imoveis_removidos': 0,
+            'erros': 0
+        }
+        self._registrar_log(log_id, 'nao_modificado', resultado, execution_time)
+        
+        logger.info(f"XML não modificado para cliente {self.cliente_id} - importação ignorada")
+        return {
+            'status': 'nao_modificado',
+            'log_id': log_id,
+            'tempo_execucao': execution_time,
+            **resultado
+        }
+    
+    def concluir_importacao(
+        self,
+        download: DownloadXML,
+        resultado: Dict[str, int],
+        log_id: str,
+        start_time: float
+    ) -> Dict[str, Any]:
+        """Persistir estado do feed, avisar o matching e registrar o log"""
+        # Guardar validadores só depois que o conteúdo foi gravado
+        self._salvar_estado_feed(download, modificado=True)
+        
+        # Índice semântico do matching precisa refletir as mudanças
+        if resultado.get('imoveis_novos') or resultado.get('imoveis_atualizados') or resultado.get('imoveis_removidos'):
+            self._notificar_indice_semantico()
+        
+        execution_time = time.time() - start_time
+        self._registrar_log(log_id, 'sucesso', resultado, execution_time)
+        
+        logger.info(f"Importação concluída: {resultado}")
+        return {
+            'status': 'sucesso',
+            'log_id': log_id,
+            'tempo_execucao': execution_time,
+            **resultado
+        }
+    
+    def registrar_erro(self, erro: Exception, log_id: str, start_time: float) -> Dict[str, Any]:
+        """Registrar falha da importação"""
+        execution_time = time.time() - start_time
+        error_msg = str(erro)
+        
+        logger.error(f"Erro na importação: {error_msg}")
+        self._registrar_log(log_id, 'erro', {}, execution_time, [error_msg])
+        
+        return {
+            'status': 'erro',
+            'log_id': log_id,
+            'erro': error_msg,
+            'tempo_execucao': execution_time
+        }
+    
+    # IMPORTAÇÃO PARTICIONADA (feeds grandes divididos em sub-tasks)
+    
+    def importar_parte(self, imoveis: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Gravar uma parte do XML (lista de imóveis do parser)
+        Retorna as estatísticas da parte e os IDs vistos, usados na remoção final
+        """
+        from core.database import get_db_session, engine
+        from models.imovel import Imovel
+        
+        garantir_colunas_matching(engine)
+        stats = self._stats_vazias()
+        stats['total_imoveis'] = len(imoveis)
+        xml_imovel_ids = set()
+        
+        ids_parte = [f"{self.cliente_id}_{imovel_data['id_xml']}" for imovel_data in imoveis if imovel_data.get('id_xml')]
+        
+        with get_db_session() as db:
+            existentes = {}
+            for inicio in range(0, len(ids_parte), self.tamanho_lote):
+                existentes.update({
+                    imovel_id: (hash_xml, status, sem_embedding)
+                    for imovel_id, hash_xml, status, sem_embedding in db.query(
+                        Imovel.id, Imovel.hash_xml, Imovel.status, Imovel.embedding.is_(None)
+                    ).filter(
+                        Imovel.cliente_id == self.cliente_id,
+                        Imovel.id.in_(ids_parte[inicio:inicio + self.tamanho_lote])
+                    )
+                })
             
-            execution_time = time.time() - start_time
+            data_importacao = datetime.utcnow()
+            for inicio in range(0, len(imoveis), self.tamanho_lote):
+                self._sincronizar_lote(
+                    db, imoveis[inicio:inicio + self.tamanho_lote],
+                    existentes, xml_imovel_ids, stats, data_importacao
+                )
+        
+        return {**stats, 'ids': sorted(xml_imovel_ids)}
+    
+    def finalizar_partes(
+        self,
+        partes: List[Dict[str, Any]],
+        download: DownloadXML,
+        log_id: str,
+        start_time: float
+    ) -> Dict[str, Any]:
+        """Somar resultados das partes, remover ausentes e concluir a importação"""
+        from core.database import get_db_session
+        from models.imovel import Imovel
+        
+        resultado = self._stats_vazias()
+        xml_imovel_ids = set()
+        for parte in partes:
+            for chave in resultado:
+                resultado[chave] += parte.get(chave, 0)
+            xml_imovel_ids.update(parte.get('ids', []))
+        
+        with get_db_session() as db:
+            ativos = db.query(Imovel.id).filter(
+                Imovel.cliente_id == self.cliente_id,
+                Imovel.status == 'ativo'
+            )
+            removidos = [imovel_id for (imovel_id,) in ativos if imovel_id not in xml_imovel_ids]
+            resultado['imoveis_removidos'] = self._remove_missing_imoveis(db, removidos)
+        
+        return self.concluir_importacao(download, resultado, log_id, start_time)
+    
+    def _hash_mapeamento(self) -> str:
+        """Hash do mapeamento de campos (mudança de mapeamento exige reprocessar)"""
+        return hashlib.sha256(repr(self.xml_mapping).encode('utf-8')).hexdigest()
+    
+    def _carregar_estado_feed(self) -> Optional[Dict[str, Any]]:
+        """Validadores do último XML processado, se ainda valem para esta URL e mapeamento"""
+        try:
+            from core.database import get_db_session
+            from models.imovel import EstadoFeedXML
             
-            logger.info(f"Importação concluída: {resultado}")
-            return {
-                'status': 'sucesso',
-                'log_id': log_id,
-                'tempo_execucao': execution_time,
-                **resultado
-            }
+            with get_db_session() as db:
+                estado = db.query(EstadoFeedXML).filter(
+                    EstadoFeedXML.cliente_id == self.cliente_id
+                ).first()
+                
+                if not estado or estado.url_xml != self.xml_url or estado.hash_mapeamento != self._hash_mapeamento():
+                    return None
                 
+                return {
+                    'etag': estado.etag,
+                    'last_modified': estado.last_modified,
+                    'hash_conteudo': estado.hash_conteudo
+                }
         except Exception as e:
-            execution_time = time.time() - start_time
-            error_msg = str(e)
+            logger.warning(f"Estado do feed indisponível, baixando XML completo: {e}")
+            return None
+    
+    def _feed_nao_modificado(self, download, estado: Optional[Dict[str, Any]]) -> bool:
+        """304 do servidor ou corpo idêntico (mesmo SHA-256) ao último processado"""
+        if download.nao_modificado:
+            return True
+        return bool(estado and estado.get('hash_conteudo') and estado['hash_conteudo'] == download.hash_conteudo)
+    
+    def _salvar_estado_feed(self, download, modificado: bool):
+        """Persistir ETag/Last-Modified e hash do XML do cliente"""
+        try:
+            from core.database import get_db_session
+            from models.imovel import EstadoFeedXML
             
-            logger.error(f"Erro na importação: {error_msg}")
+            agora = datetime.utcnow()
+            with get_db_session() as db:
+                estado = db.query(EstadoFeedXML).filter(
+                    EstadoFeedXML.cliente_id == self.cliente_id
+                ).first()
+                
+                if not estado:
+                    estado = EstadoFeedXML(cliente_id=self.cliente_id)
+                    db.add(estado)
+                
+                estado.url_xml = self.xml_url
+                if download.nao_modificado:
+                    # 304 pode omitir os validadores: mantém os anteriores
+                    estado.etag = download.etag or estado.etag
+                    estado.last_modified = download.last_modified or estado.last_modified
+                else:
+                    # 200: validadores da resposta atual, mesmo ausentes
+                    estado.etag = download.etag
+                    estado.last_modified = download.last_modified
+                estado.data_verificacao = agora
+                
+                if modificado:
+                    estado.hash_conteudo = download.hash_conteudo
+                    estado.hash_mapeamento = self._hash_mapeamento()
+                    estado.tamanho_bytes = download.tamanho_bytes
+                    estado.data_modificacao = agora
+        except Exception as e:
+            logger.warning(f"Não foi possível salvar estado do feed: {e}")
+    
+    def _registrar_log(
+        self,
+        log_id: str,
+        status: str,
+        resultado: Dict[str, Any],
+        tempo_execucao: float,
+        erros: List[str] = None
+    ):
+        """Gravar ImportacaoLog da execução"""
+        try:
+            from core.database import get_db_session
+            from models.imovel import ImportacaoLog
             
-            return {
-                'status': 'erro',
-                'log_id': log_id,
-                'erro': error_msg,
-                'tempo_execucao': execution_time
-            }
-    
-    def _process_imoveis(self, imoveis_data: List[Dict[str, Any]]) -> Dict[str, int]:
-        """Processar lista de imóveis"""
-        stats = {
-            'total_imoveis': len(imoveis_data),
+            with get_db_session() as db:
+                db.add(ImportacaoLog(
+                    id=log_id,
+                    cliente_id=self.cliente_id,
+                    status=status,
+                    total_imoveis=resultado.get('total_imoveis', 0),
+                    imoveis_novos=resultado.get('imoveis_novos', 0),
+                    imoveis_atualizados=resultado.get('imoveis_atualizados', 0),
+                    imoveis_removidos=resultado.get('imoveis_removidos', 0),
+                    tempo_execucao=tempo_execucao,
+                    erros=erros or [],
+                    url_xml=self.xml_url
+                ))
+        except Exception as e:
+            logger.warning(f"Não foi possível registrar log de importação: {e}")
+    
+    def _notificar_indice_semantico(self):
+        """Marcar índice semântico do cliente para sincronização incremental"""
+        try:
+            from services.ai_matching.indice_semantico import marcar_indice_semantico_desatualizado
+            marcar_indice_semantico_desatualizado(self.cliente_id)
+        except ImportError:
+            logger.debug("Índice semântico não disponível")
+    
+    def _stats_vazias(self) -> Dict[str, int]:
+        return {
+            'total_imoveis': 0,
             'imoveis_novos': 0,
             'imoveis_atualizados': 0,
             'imoveis_removidos': 0,
             'erros': 0
         }
+    
+    def _process_imoveis(self, lotes: Iterable[List[Dict[str, Any]]]) -> Dict[str, int]:
+        """
+        Sincronizar imóveis do XML com o banco em lote
+        
+        Lê (id, hash_xml, status, sem embedding) do cliente numa única consulta, classifica
+        cada imóvel do XML como novo / alterado / inalterado em memória e grava
+        novos e alterados com INSERT ... ON CONFLICT DO UPDATE por lote.
+        Imóveis ausentes do XML são marcados como removidos com UPDATE em massa.
+        """
+        stats = self._stats_vazias()
         
         try:
-            from core.database import get_db_session
+            from core.database import get_db_session, engine
             from models.imovel import Imovel
             
+            garantir_colunas_matching(engine)
             with get_db_session() as db:
+                # Estado atual do cliente: id -> (hash_xml, status, sem embedding)
+                existentes = {
+                    imovel_id: (hash_xml, status, sem_embedding)
+                    for imovel_id, hash_xml, status, sem_embedding in db.query(
+                        Imovel.id, Imovel.hash_xml, Imovel.status, Imovel.embedding.is_(None)
+                    ).filter(Imovel.cliente_id == self.cliente_id)
+                }
+                
                 # IDs dos imóveis no XML atual
                 xml_imovel_ids = set()
+                data_importacao = datetime.utcnow()
                 
-                for imovel_data in imoveis_data:
-                    try:
-                        imovel_id = f"{self.cliente_id}_{imovel_data['id']}"
-                        xml_imovel_ids.add(imovel_id)
-                        
-                        # Buscar imóvel existente
-                        existing_imovel = db.query(Imovel).filter(
-                            Imovel.id == imovel_id
-                        ).first()
-                        
-                        if existing_imovel:
-                            # Verificar se houve mudanças
-                            if existing_imovel.hash_xml != imovel_data['hash_xml']:
-                                self._update_imovel(existing_imovel, imovel_data)
-                                stats['imoveis_atualizados'] += 1
-                                logger.debug(f"Imóvel atualizado: {imovel_id}")
-                        else:
-                            # Criar novo imóvel
-                            self._create_imovel(db, imovel_id, imovel_data)
-                            stats['imoveis_novos'] += 1
-                            logger.debug(f"Novo imóvel criado: {imovel_id}")
-                            
-                    except Exception as e:
-                        stats['erros'] += 1
-                        logger.error(f"Erro ao processar imóvel {imovel_data.get('id', 'unknown')}: {e}")
+                for lote in lotes:
+                    stats['total_imoveis'] += len(lote)
+                    self._sincronizar_lote(db, lote, existentes, xml_imovel_ids, stats, data_importacao)
                 
                 # Remover imóveis que não estão mais no XML
-                stats['imoveis_removidos'] = self._remove_missing_imoveis(db, xml_imovel_ids)
+                removidos = [
+                    imovel_id for imovel_id, (_, status, _) in existentes.items()
+                    if status == 'ativo' and imovel_id not in xml_imovel_ids
+                ]
+                stats['imoveis_removidos'] = self._remove_missing_imoveis(db, removidos)
                 
         except ImportError:
             logger.warning("Banco de dados não disponível - simulando processamento")
-            stats['imoveis_novos'] = len(imoveis_data)
+            stats['imoveis_novos'] = stats['total_imoveis']
         
         return stats
     
-    def _create_imovel(self, db, imovel_id: str, imovel_data: Dict[str, Any]):
-        """Criar novo imóvel"""
+    def _sincronizar_lote(
+        self,
+        db,
+        lote: List[Dict[str, Any]],
+        existentes: Dict[str, Tuple[Optional[str], Optional[str], bool]],
+        xml_imovel_ids: set,
+        stats: Dict[str, int],
+        data_importacao: datetime
+    ):
+        """
+        Classificar um lote contra o estado atual e gravar novos/alterados
+        Inalterados ainda sem embedding (importados antes do vetor ou com falha
+        no cálculo) recebem só o vetor
+        """
+        registros = []
+        sem_embedding = []
+        
+        for imovel_data in lote:
+            try:
+                imovel_id = f"{self.cliente_id}_{imovel_data['id_xml']}"
+                if imovel_id in xml_imovel_ids:
+                    logger.debug(f"Imóvel duplicado no XML ignorado: {imovel_id}")
+                    continue
+                xml_imovel_ids.add(imovel_id)
+                
+                atual = existentes.get(imovel_id)
+                if atual is None:
+                    registros.append(self._montar_registro(imovel_id, imovel_data, data_importacao))
+                    stats['imoveis_novos'] += 1
+                elif atual[0] != imovel_data['hash_conteudo'] or atual[1] == 'removido':
+                    registros.append(self._montar_registro(imovel_id, imovel_data, data_importacao))
+                    stats['imoveis_atualizados'] += 1
+                elif atual[2]:
+                    sem_embedding.append({
+                        'id': imovel_id,
+                        'titulo': imovel_data.get('titulo'),
+                        'descricao': imovel_data.get('descricao')
+                    })
+                    
+            except Exception as e:
+                stats['erros'] += 1
+                logger.error(f"Erro ao processar imóvel {imovel_data.get('id_xml', 'unknown')}: {e}")
+        
+        if registros:
+            self._calcular_embeddings(registros)
+            self._upsert_imoveis(db, registros)
+        
+        if sem_embedding:
+            self._calcular_embeddings(sem_embedding)
+            self._preencher_embeddings(db, [r for r in sem_embedding if r['embedding'] is not None])
+    
+    def _calcular_embeddings(self, registros: List[Dict[str, Any]]):
+        """Vetor semântico de título/descrição de cada registro (um lote por chamada)"""
+        try:
+            from services.ai_matching.embeddings import embeddings_imoveis
+            for registro, embedding in zip(registros, embeddings_imoveis(registros)):
+                registro['embedding'] = embedding
+        except Exception as e:
+            logger.warning(f"Embeddings não calculados para o lote: {e}")
+            for registro in registros:
+                registro['embedding'] = None
+    
+    def _montar_registro(self, imovel_id: str, imovel_data: Dict[str, Any], data_importacao: datetime) -> Dict[str, Any]:
+        """Montar linha da tabela imoveis a partir dos dados do parser"""
+        faltando = [campo for campo in CAMPOS_OBRIGATORIOS if imovel_data.get(campo) is None]
+        if faltando:
+            raise ValueError(f"campos obrigatórios ausentes: {', '.join(faltando)}")
+        
+        return {
+            'id': imovel_id,
+            'cliente_id': self.cliente_id,
+            'codigo_imovel': imovel_data.get('codigo_imovel') or imovel_data['id_xml'],
+            'titulo': imovel_data['titulo'],
+            'tipo': imovel_data['tipo'],
+            'categoria': imovel_data.get('categoria'),
+            'preco': imovel_data['preco'],
+            'endereco': imovel_data.get('endereco'),
+            'bairro': imovel_data.get('bairro'),
+            'cidade': imovel_data['cidade'],
+            'estado': imovel_data['estado'],
+            'cep': imovel_data.get('cep'),
+            'area_total': imovel_data.get('area_total'),
+            'quartos': imovel_data.get('quartos'),
+            'banheiros': imovel_data.get('banheiros'),
+            'vagas_garagem': imovel_data.get('vagas_garagem'),
+            'descricao': imovel_data.get('descricao'),
+            'amenidades': extrair_amenidades(imovel_data['titulo'], imovel_data.get('descricao')),
+            'fotos': imovel_data.get('fotos', []),
+            'status': imovel_data.get('status', 'ativo'),
+            'hash_xml': imovel_data['hash_conteudo'],
+            'data_ultima_importacao': data_importacao
+        }
+    
+    def _upsert_imoveis(self, db, registros: List[Dict[str, Any]]):
+        """Gravar lote de imóveis com INSERT ... ON CONFLICT (id) DO UPDATE"""
+        from sqlalchemy import func
+        from sqlalchemy.dialects.postgresql import insert
         from models.imovel import Imovel
         
-        imovel = Imovel(
-            id=imovel_id,
-            cliente_id=self.cliente_id,
-            codigo_imovel=imovel_data['codigo_imovel'],
-            titulo=imovel_data['titulo'],
-            tipo=imovel_data['tipo'],
-            categoria=imovel_data.get('categoria'),
-            preco=imovel_data['preco'],
-            endereco=imovel_data.get('endereco'),
-            bairro=imovel_data.get('bairro'),
-            cidade=imovel_data['cidade'],
-            estado=imovel_data['estado'],
-            cep=imovel_data.get('cep'),
-            area_total=imovel_data.get('area_total'),
-            quartos=imovel_data.get('quartos'),
-            banheiros=imovel_data.get('banheiros'),
-            vagas_garagem=imovel_data.get('vagas_garagem'),
-            descricao=imovel_data.get('descricao'),
-            fotos=imovel_data.get('fotos', []),
-            status=imovel_data.get('status', 'ativo'),
-            hash_xml=imovel_data['hash_xml'],
-            data_ultima_importacao=imovel_data['data_ultima_importacao']
-        )
+        stmt = insert(Imovel.__table__).values(registros)
+        colunas_atualizadas = {
+            coluna: stmt.excluded[coluna]
+            for coluna in registros[0]
+            if coluna not in ('id', 'cliente_id')
+        }
+        # onupdate do modelo não é aplicado em ON CONFLICT
+        colunas_atualizadas['data_atualizacao'] = func.now()
         
-        db.add(imovel)
-    
-    def _update_imovel(self, imovel, imovel_data: Dict[str, Any]):
-        """Atualizar imóvel existente"""
-        imovel.titulo = imovel_data['titulo']
-        imovel.tipo = imovel_data['tipo']
-        imovel.categoria = imovel_data.get('categoria')
-        imovel.preco = imovel_data['preco']
-        imovel.endereco = imovel_data.get('endereco')
-        imovel.bairro = imovel_data.get('bairro')
-        imovel.cidade = imovel_data['cidade']
-        imovel.estado = imovel_data['estado']
-        imovel.cep = imovel_data.get('cep')
-        imovel.area_total = imovel_data.get('area_total')
-        imovel.quartos = imovel_data.get('quartos')
-        imovel.banheiros = imovel_data.get('banheiros')
-        imovel.vagas_garagem = imovel_data.get('vagas_garagem')
-        imovel.descricao = imovel_data.get('descricao')
-        imovel.fotos = imovel_data.get('fotos', [])
-        imovel.status = imovel_data.get('status', 'ativo')
-        imovel.hash_xml = imovel_data['hash_xml']
-        imovel.data_ultima_importacao = imovel_data['data_ultima_importacao']
-    
-    def _remove_missing_imoveis(self, db, xml_imovel_ids: set) -> int:
-        """Remover imóveis que não estão mais no XML"""
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[Imovel.__table__.c.id],
+            set_=colunas_atualizadas
+        ))
+        logger.debug(f"Lote gravado: {len(registros)} imóveis")
+    
+    def _preencher_embeddings(self, db, registros: List[Dict[str, Any]]):
+        """Gravar o vetor de imóveis inalterados (data_atualizacao avisa o índice semântico)"""
+        if not registros:
+            return
+        from sqlalchemy import bindparam, func, update
         from models.imovel import Imovel
         
-        # Buscar todos os imóveis ativos do cliente
-        existing_imoveis = db.query(Imovel).filter(
-            Imovel.cliente_id == self.cliente_id,
-            Imovel.status == 'ativo'
-        ).all()
+        tabela = Imovel.__table__
+        db.execute(
+            update(tabela).where(tabela.c.id == bindparam('b_id')).values(
+                embedding=bindparam('b_embedding'),
+                data_atualizacao=func.now()
+            ),
+            [{'b_id': r['id'], 'b_embedding': r['embedding']} for r in registros]
+        )
+        logger.debug(f"Embeddings preenchidos: {len(registros)} imóveis inalterados")
+    
+    def _remove_missing_imoveis(self, db, imovel_ids: List[str]) -> int:
+        """Marcar como removidos os imóveis que não estão mais no XML"""
+        from sqlalchemy import func
+        from models.imovel import Imovel
         
         removed_count = 0
-        for imovel in existing_imoveis:
-            if imovel.id not in xml_imovel_ids:
-                imovel.status = 'removido'
-                removed_count += 1
-                logger.debug(f"Imóvel removido: {imovel.id}")
+        for inicio in range(0, len(imovel_ids), self.tamanho_lote):
+            lote = imovel_ids[inicio:inicio + self.tamanho_lote]
+            removed_count += db.query(Imovel).filter(
+                Imovel.cliente_id == self.cliente_id,
+                Imovel.status == 'ativo',
+                Imovel.id.in_(lote)
+            ).update(
+                {Imovel.status: 'removido', Imovel.data_atualizacao: func.now()},
+                synchronize_session=False
+            )
         
+        if removed_count:
+            logger.debug(f"Imóveis removidos: {removed_count}")
         return removed_count
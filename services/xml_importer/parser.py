@@ -4,11 +4,21 @@ Parser XML para importação de imóveis
 
 import xml.etree.ElementTree as ET
 import requests
-from typing import List, Dict, Any, Optional
+import tempfile
+from typing import List, Dict, Any, Optional, Iterator, IO
 from dataclasses import dataclass
 from core.logger import logger
 import hashlib
 
+# Tags aceitas como elemento de imóvel (mesma ordem de parse_xml)
+ITEM_TAGS = ('imovel', 'property', 'item')
+
+# Até esse tamanho o download fica em memória; acima vai para disco
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+# Tamanho dos blocos lidos do corpo HTTP
+CHUNK_BYTES = 64 * 1024
+
 
 @dataclass
 class XMLMapping:
@@ -32,11 +42,127 @@ class XMLMapping:
     status_field: str = "status"
 
 
+# Campos que entram no hash de conteúdo (ordem alfabética, como no hash original)
+CAMPOS_HASH = tuple(sorted({
+    'codigo_imovel', 'titulo', 'tipo', 'categoria', 'preco',
+    'endereco', 'cidade', 'estado', 'bairro', 'area_total',
+    'quartos', 'banheiros', 'vagas_garagem', 'descricao', 'status'
+}))
+
+
+class PlanoExtracao:
+    """
+    XMLMapping compilado uma vez por parser
+    
+    Os campos são separados por tipo de acesso na compilação: filhos diretos
+    (lidos de um dicionário tag -> texto montado numa única passada pelos
+    filhos), atributos e caminhos XPath (element.find, como antes). Cada
+    campo já leva seu conversor (float, int, fotos) associado.
+    """
+    
+    def __init__(self, mapping: XMLMapping, conversores: Dict[str, Any]):
+        campos = [
+            ('codigo_imovel', mapping.codigo_field, None, None),
+            ('titulo', mapping.titulo_field, None, None),
+            ('tipo', mapping.tipo_field, None, None),
+            ('categoria', mapping.categoria_field, 'venda', None),
+            ('preco', mapping.preco_field, None, 'float'),
+            ('endereco', mapping.endereco_field, None, None),
+            ('cidade', mapping.cidade_field, None, None),
+            ('estado', mapping.estado_field, None, None),
+            ('bairro', mapping.bairro_field, None, None),
+            ('area_total', mapping.area_total_field, None, 'float'),
+            ('quartos', mapping.quartos_field, None, 'int'),
+            ('banheiros', mapping.banheiros_field, None, 'int'),
+            ('vagas_garagem', mapping.vagas_field, None, 'int'),
+            ('descricao', mapping.descricao_field, None, None),
+            ('fotos', mapping.fotos_field, None, 'fotos'),
+            ('status', mapping.status_field, 'ativo', None)
+        ]
+        
+        self.filhos = []
+        self.atributos = []
+        self.caminhos = []
+        for nome, caminho, default, tipo in campos:
+            acesso, chave = self._compilar(caminho)
+            destino = {'filho': self.filhos, 'atributo': self.atributos, 'caminho': self.caminhos}[acesso]
+            destino.append((nome, chave, default, conversores.get(tipo)))
+        
+        self.id_acesso, self.id_chave = self._compilar(mapping.id_field)
+        self.usa_filhos = bool(self.filhos) or self.id_acesso == 'filho'
+        
+        # Ordem das chaves igual à da extração campo a campo
+        self.modelo = dict.fromkeys(['id_xml'] + [nome for nome, _, _, _ in campos])
+    
+    @staticmethod
+    def _compilar(caminho: str):
+        if caminho.startswith('@'):
+            return 'atributo', caminho[1:]
+        if any(c in caminho for c in '/.*[@{'):
+            return 'caminho', caminho
+        return 'filho', caminho
+    
+    def extrair(self, element: ET.Element) -> Optional[Dict[str, Any]]:
+        """Extrair dados do elemento; None se não houver ID"""
+        # tag -> texto do primeiro filho com a tag (mesma escolha de element.find)
+        textos = {filho.tag: filho.text for filho in reversed(element)} if self.usa_filhos else {}
+        
+        if self.id_acesso == 'filho':
+            texto = textos.get(self.id_chave)
+            imovel_id = texto.strip() if texto else None
+        elif self.id_acesso == 'atributo':
+            imovel_id = element.get(self.id_chave)
+        else:
+            filho = element.find(self.id_chave)
+            imovel_id = filho.text.strip() if filho is not None and filho.text else None
+        if not imovel_id:
+            return None
+        
+        data = self.modelo.copy()
+        data['id_xml'] = imovel_id
+        
+        for nome, tag, default, conversor in self.filhos:
+            texto = textos.get(tag)
+            valor = texto.strip() if texto else default
+            data[nome] = conversor(valor) if conversor else valor
+        
+        for nome, atributo, default, conversor in self.atributos:
+            valor = element.get(atributo, default)
+            data[nome] = conversor(valor) if conversor else valor
+        
+        for nome, caminho, default, conversor in self.caminhos:
+            filho = element.find(caminho)
+            valor = filho.text.strip() if filho is not None and filho.text else default
+            data[nome] = conversor(valor) if conversor else valor
+        
+        return data
+
+
+@dataclass
+class DownloadXML:
+    """Resultado de fetch_xml_stream"""
+    arquivo: Optional[IO[bytes]] = None
+    nao_modificado: bool = False
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    hash_conteudo: Optional[str] = None  # SHA-256 do corpo
+    tamanho_bytes: int = 0
+    
+    def close(self):
+        if self.arquivo is not None:
+            self.arquivo.close()
+
+
 class XMLParser:
     """Parser XML configurável para diferentes formatos de CRM"""
     
     def __init__(self, mapping: XMLMapping):
         self.mapping = mapping
+        self.plano = PlanoExtracao(mapping, {
+            'float': self._parse_float,
+            'int': self._parse_int,
+            'fotos': self._parse_fotos
+        })
         
     def fetch_xml(self, url: str, timeout: int = 30) -> str:
         """Baixar XML de uma URL"""
@@ -63,6 +189,138 @@ class XMLParser:
             logger.error(f"Erro inesperado ao baixar XML: {e}")
             raise
     
+    def fetch_xml_stream(
+        self,
+        url: str,
+        timeout: int = 30,
+        validadores: Optional[Dict[str, Any]] = None
+    ) -> "DownloadXML":
+        """
+        Baixar XML em streaming para um arquivo temporário
+        
+        O corpo nunca é carregado inteiro em memória e o SHA-256 é calculado
+        durante o download. validadores (etag/last_modified de uma importação
+        anterior) viram If-None-Match/If-Modified-Since; se o servidor
+        responder 304 o resultado vem com nao_modificado=True e sem arquivo.
+        O chamador fecha download.arquivo.
+        """
+        try:
+            logger.info(f"Baixando XML (streaming) de: {url}")
+            
+            headers = {
+                'User-Agent': 'Mozilla/5.0 (compatible; ImobiAI/1.0)',
+                'Accept': 'application/xml, text/xml, */*'
+            }
+            if validadores:
+                if validadores.get('etag'):
+                    headers['If-None-Match'] = validadores['etag']
+                if validadores.get('last_modified'):
+                    headers['If-Modified-Since'] = validadores['last_modified']
+            
+            arquivo = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+            try:
+                with requests.get(url, headers=headers, timeout=timeout, stream=True) as response:
+                    if response.status_code == 304:
+                        arquivo.close()
+                        logger.info("XML não modificado desde a última importação (HTTP 304)")
+                        return DownloadXML(
+                            arquivo=None,
+                            nao_modificado=True,
+                            etag=response.headers.get('ETag') or validadores.get('etag'),
+                            last_modified=response.headers.get('Last-Modified') or validadores.get('last_modified')
+                        )
+                    
+                    response.raise_for_status()
+                    
+                    digest = hashlib.sha256()
+                    tamanho = 0
+                    for chunk in response.iter_content(chunk_size=CHUNK_BYTES):
+                        if chunk:
+                            arquivo.write(chunk)
+                            digest.update(chunk)
+                            tamanho += len(chunk)
+                    
+                    etag = response.headers.get('ETag')
+                    last_modified = response.headers.get('Last-Modified')
+            except Exception:
+                arquivo.close()
+                raise
+            
+            arquivo.seek(0)
+            logger.info(f"XML baixado com sucesso. Tamanho: {tamanho} bytes")
+            
+            return DownloadXML(
+                arquivo=arquivo,
+                etag=etag,
+                last_modified=last_modified,
+                hash_conteudo=digest.hexdigest(),
+                tamanho_bytes=tamanho
+            )
+            
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Erro ao baixar XML: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Erro inesperado ao baixar XML: {e}")
+            raise
+    
+    def iter_imoveis(self, source) -> Iterator[Dict[str, Any]]:
+        """
+        Parsear XML incrementalmente (iterparse), um imóvel por vez
+        
+        source: caminho ou arquivo binário. Cada elemento de imóvel é
+        descartado da árvore logo após a extração, então a memória fica
+        constante independente do tamanho do feed. A tag do item é a primeira
+        de ITEM_TAGS encontrada no documento.
+        """
+        item_tag = None
+        pilha = []
+        total = 0
+        validos = 0
+        
+        try:
+            for evento, elemento in ET.iterparse(source, events=('start', 'end')):
+                if evento == 'start':
+                    pilha.append(elemento)
+                    if item_tag is None and elemento.tag in ITEM_TAGS:
+                        item_tag = elemento.tag
+                    continue
+                
+                pilha.pop()
+                if elemento.tag != item_tag:
+                    continue
+                
+                total += 1
+                try:
+                    imovel_data = self._extract_imovel_data(elemento)
+                    if imovel_data:
+                        validos += 1
+                        yield imovel_data
+                except Exception as e:
+                    logger.warning(f"Erro ao processar imóvel: {e}")
+                
+                # Liberar o elemento já processado
+                elemento.clear()
+                if pilha:
+                    pilha[-1].remove(elemento)
+            
+            logger.info(f"Parseados {validos} imóveis válidos de {total} encontrados no XML")
+            
+        except ET.ParseError as e:
+            logger.error(f"Erro ao parsear XML: {e}")
+            raise
+    
+    def iter_lotes(self, source, tamanho_lote: int = 500) -> Iterator[List[Dict[str, Any]]]:
+        """Agrupar iter_imoveis em lotes de tamanho limitado"""
+        lote = []
+        for imovel_data in self.iter_imoveis(source):
+            lote.append(imovel_data)
+            if len(lote) >= tamanho_lote:
+                yield lote
+                lote = []
+        if lote:
+            yield lote
+    
     def parse_xml(self, xml_content: str) -> List[Dict[str, Any]]:
         """Parsear XML e extrair dados dos imóveis"""
         try:
@@ -101,32 +359,11 @@ class XMLParser:
     def _extract_imovel_data(self, element: ET.Element) -> Optional[Dict[str, Any]]:
         """Extrair dados de um elemento imóvel"""
         try:
-            # ID único (obrigatório)
-            imovel_id = self._get_field_value(element, self.mapping.id_field)
-            if not imovel_id:
+            # Campos extraídos pelo plano compilado (ID único é obrigatório)
+            data = self.plano.extrair(element)
+            if data is None:
                 return None
             
-            # Extrair todos os campos
-            data = {
-                'id_xml': imovel_id,
-                'codigo_imovel': self._get_field_value(element, self.mapping.codigo_field),
-                'titulo': self._get_field_value(element, self.mapping.titulo_field),
-                'tipo': self._get_field_value(element, self.mapping.tipo_field),
-                'categoria': self._get_field_value(element, self.mapping.categoria_field, 'venda'),
-                'preco': self._parse_float(self._get_field_value(element, self.mapping.preco_field)),
-                'endereco': self._get_field_value(element, self.mapping.endereco_field),
-                'cidade': self._get_field_value(element, self.mapping.cidade_field),
-                'estado': self._get_field_value(element, self.mapping.estado_field),
-                'bairro': self._get_field_value(element, self.mapping.bairro_field),
-                'area_total': self._parse_float(self._get_field_value(element, self.mapping.area_total_field)),
-                'quartos': self._parse_int(self._get_field_value(element, self.mapping.quartos_field)),
-                'banheiros': self._parse_int(self._get_field_value(element, self.mapping.banheiros_field)),
-                'vagas_garagem': self._parse_int(self._get_field_value(element, self.mapping.vagas_field)),
-                'descricao': self._get_field_value(element, self.mapping.descricao_field),
-                'fotos': self._parse_fotos(self._get_field_value(element, self.mapping.fotos_field)),
-                'status': self._get_field_value(element, self.mapping.status_field, 'ativo')
-            }
-            
             # Gerar hash para detecção de mudanças
             data['hash_conteudo'] = self._generate_content_hash(data)
             
@@ -192,20 +429,12 @@ class XMLParser:
     def _generate_content_hash(self, data: Dict[str, Any]) -> str:
         """Gerar hash MD5 do conteúdo para detecção de mudanças"""
         try:
-            # Campos relevantes para hash (excluir campos de controle)
-            relevant_fields = {
-                'codigo_imovel', 'titulo', 'tipo', 'categoria', 'preco',
-                'endereco', 'cidade', 'estado', 'bairro', 'area_total',
-                'quartos', 'banheiros', 'vagas_garagem', 'descricao', 'status'
-            }
-            
-            hash_data = {}
-            for field in relevant_fields:
-                if field in data and data[field] is not None:
-                    hash_data[field] = str(data[field])
-            
-            # Criar string ordenada para hash consistente
-            hash_string = '|'.join(f"{k}:{v}" for k, v in sorted(hash_data.items()))
+            # Campos relevantes em ordem fixa (excluir campos de controle e vazios)
+            hash_string = '|'.join([
+                f"{campo}:{valor}"
+                for campo, valor in zip(CAMPOS_HASH, map(data.get, CAMPOS_HASH))
+                if valor is not None
+            ])
             
             return hashlib.md5(hash_string.encode('utf-8')).hexdigest()
             
@@ -0,0 +1,35 @@
+"""
+Limitadores de taxa
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Limitador de taxa assíncrono (taxa tokens/s, rajada até capacidade)"""
+
+    def __init__(self, taxa_por_segundo: float, capacidade: Optional[float] = None):
+        self.taxa = taxa_por_segundo
+        self.capacidade = capacidade or taxa_por_segundo
+        self.tokens = self.capacidade
+        self.atualizado_em = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def adquirir(self, quantidade: float = 1):
+        """Esperar até haver `quantidade` tokens disponíveis (limitada à capacidade)"""
+        quantidade = min(quantidade, self.capacidade)
+        async with self._lock:
+            while True:
+                agora = time.monotonic()
+                self.tokens = min(self.capacidade, self.tokens + (agora - self.atualizado_em) * self.taxa)
+                self.atualizado_em = agora
+                if self.tokens >= quantidade:
+                    self.tokens -= quantidade
+                    return
+                await asyncio.sleep((quantidade - self.tokens) / self.taxa)
+
+    def ajustar(self, quantidade: float):
+        """Descontar tokens consumidos além do adquirido (negativa devolve); chamar no event loop"""
+        self.tokens = min(self.capacidade, self.tokens - quantidade)